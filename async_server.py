@@ -0,0 +1,340 @@
+# async_server.py
+"""
+Asynchronous front end for the compiler.
+
+An asyncio HTTP server accepts connections and hands each /run_code compile to a bounded
+pool of pre-warmed worker processes, so a slow compile never blocks the event loop.
+Identical sources compiled at the same time share one compile (see coalesce.py). When too
+many compiles are queued it answers 503 (backpressure), and on SIGINT/SIGTERM it stops
+accepting connections and drains the compiles in flight before exiting. With --fork-server,
+workers are forked on demand from a pre-warmed template process and replaced after
+--max-requests compiles (see forkserver.py).
+
+Usage:
+    python async_server.py [--host HOST] [--port PORT] [--workers N] [--max-pending N]
+                           [--fork-server [--max-requests N]]
+"""
+import argparse
+import asyncio
+import json
+import mimetypes
+import os
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from coalesce import AsyncSingleFlight, render_metrics, source_key
+from forkserver import DEFAULT_MAX_REQUESTS, ForkServerExecutor, WorkerCrashed
+from limits import CompileLimits
+from logsetup import configure_logging
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MAX_HEADER_LINES = 100
+
+STATUS_TEXT = {
+    200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+    413: 'Payload Too Large', 503: 'Service Unavailable',
+}
+
+WARM_UP_SOURCE = "int main() { int x = 1; for (int i = 0; i < 2; i = i + 1) { x = x * 2; } return x; }"
+
+
+_worker_cache = None  # The compile cache of a worker process (configured by COMPILE_CACHE_PATH)
+
+
+def _warm_worker():
+    """
+    Process pool initializer (or fork server warm-up): imports the pipeline (building the
+    PLY lexer and parser tables) and compiles a small program so the first real request runs warm.
+    """
+    global _worker_cache
+    # Ctrl-C is sent to the whole process group; the server drains and then shuts the pool down.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from compile_cache import CompileCache
+    from pipeline import run_code
+    run_code(WARM_UP_SOURCE, 1)
+    _worker_cache = CompileCache.from_env()
+
+
+def _compile_job(code, line_count, limits, token_format, execute=False):
+    """
+    Runs one compile in a worker process.
+    """
+    from pipeline import run_code
+    return run_code(code, line_count, limits, _worker_cache, token_format, execute)
+
+
+def _ping():
+    return os.getpid()
+
+
+class HTTPError(Exception):
+    """
+    Raised while handling a request to send an error status to the client.
+    """
+    def __init__(self, status, message=None):
+        super().__init__(message or STATUS_TEXT.get(status, ''))
+        self.status = status
+
+
+class AsyncCompileServer:
+    """
+    HTTP server that runs compiles in a process pool.
+    """
+    def __init__(self, host='127.0.0.1', port=5000, workers=None, max_pending=None, limits=None, fork_server=False,
+                 max_requests=DEFAULT_MAX_REQUESTS):
+        """
+        Initializes the server.
+
+        Args:
+            host (str): The address to listen on.
+            port (int): The port to listen on (0 picks a free port).
+            workers (int, optional): Number of worker processes. Defaults to the CPU count.
+            max_pending (int, optional): Maximum number of compiles running or queued before
+                new requests get a 503. Defaults to four per worker.
+            limits (CompileLimits, optional): Per-compile resource limits. Defaults to CompileLimits.from_env().
+            fork_server (bool, optional): Fork the workers from a pre-warmed fork server
+                instead of using a ProcessPoolExecutor. Defaults to False.
+            max_requests (int, optional): With fork_server, compiles a worker runs before it
+                is replaced (None or 0 for never). Defaults to DEFAULT_MAX_REQUESTS.
+        """
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = self.workers * 4 if max_pending is None else max_pending
+        self.limits = limits or CompileLimits.from_env()
+        self.fork_server = fork_server
+        self.max_requests = max_requests
+        self.pending = 0  # Compiles submitted to the pool and not finished yet
+        self.flight = AsyncSingleFlight()  # Coalesces identical in-flight compiles
+        self.executor = None
+        self.server = None
+        self._idle = None  # Set whenever no compile is pending
+        self._connections = set()
+
+    async def start(self):
+        """
+        Starts the worker pool (waiting until every worker is warm) and begins listening.
+        """
+        import pipeline  # Build the parser tables once in the parent; forked workers inherit them.
+        loop = asyncio.get_running_loop()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.executor = self._new_executor()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, _ping) for _ in range(self.workers)))
+        self.server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    def _new_executor(self):
+        if self.fork_server:
+            return ForkServerExecutor(self.workers, self.max_requests, preload=('pipeline',), warm_up=_warm_worker)
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker)
+
+    async def drain(self, timeout=30.0):
+        """
+        Stops accepting connections, waits for the compiles in flight and shuts the pool down.
+
+        Args:
+            timeout (float): Maximum number of seconds to wait for pending compiles.
+        """
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        for writer in list(self._connections):
+            writer.close()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+    async def serve_forever(self):
+        """
+        Runs the server until SIGINT or SIGTERM, then drains it.
+        """
+        await self.start()
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signal_number, stop.set)
+        print(f"Serving on http://{self.host}:{self.port} with {self.workers} workers")
+        await stop.wait()
+        print("Draining pending compiles...")
+        await self.drain()
+
+    async def compile(self, code, line_count, token_format='objects', execute=False):
+        """
+        Runs a compile in the pool, applying backpressure. A request for a source that is
+        already being compiled waits for that compile instead (and never gets a 503).
+
+        Returns:
+            dict: The /run_code response.
+
+        Raises:
+            HTTPError: 503 if too many compiles are already pending, or if the worker
+                running the compile died.
+        """
+        key = source_key(code, line_count, token_format, execute)
+        return await self.flight.do(key, lambda: self._submit(code, line_count, token_format, execute))
+
+    async def _submit(self, code, line_count, token_format, execute=False):
+        if self.pending >= self.max_pending:
+            raise HTTPError(503, "Too many pending compiles, retry later")
+        self.pending += 1
+        self._idle.clear()
+        executor = self.executor
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, _compile_job, code, line_count, self.limits, token_format,
+                                              execute)
+        except (BrokenProcessPool, WorkerCrashed):
+            # A worker was killed (e.g. by the OOM killer). A broken process pool never
+            # recovers, so later requests get a new one; the fork server replaces its own workers.
+            if isinstance(executor, ProcessPoolExecutor) and self.executor is executor:
+                self.executor = self._new_executor()
+                executor.shutdown(wait=False, cancel_futures=True)
+            raise HTTPError(503, "A compile worker died, retry later")
+        finally:
+            self.pending -= 1
+            if self.pending == 0:
+                self._idle.set()
+
+    async def _handle_connection(self, reader, writer):
+        self._connections.add(writer)
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as error:
+                    await self._send_json(writer, error.status, {'error': str(error)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                try:
+                    status, content_type, payload, extra = await self._route(method, path, headers, body)
+                except HTTPError as error:
+                    status, content_type, extra = error.status, 'application/json', {}
+                    payload = json.dumps({'error': str(error)}).encode('utf-8')
+                    if error.status == 503:
+                        extra = {'Retry-After': '1'}
+                await self._send(writer, status, content_type, payload, keep_alive, extra)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    async def _read_request(self, reader):
+        """
+        Reads one HTTP/1.1 request.
+
+        Returns:
+            tuple or None: (method, path, headers, body), or None when the client closed the connection.
+        """
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, path, _ = request_line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            raise HTTPError(400)
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise HTTPError(400, "Too many headers")
+        length = headers.get('content-length') or '0'
+        if not (length.isascii() and length.isdigit()):
+            raise HTTPError(400, "Invalid Content-Length")
+        length = int(length)
+        limit = self.limits.max_source_bytes
+        if limit and length > limit * 2 + 4096:
+            raise HTTPError(413)
+        body = await reader.readexactly(length) if length else b''
+        return method, path.split('?', 1)[0], headers, body
+
+    async def _route(self, method, path, headers, body):
+        if path == '/run_code':
+            if method != 'POST':
+                raise HTTPError(405)
+            try:
+                request = json.loads(body)
+                code, line_count = request['code'], request['lineCount']
+                token_format = 'columnar' if request.get('format') == 'columnar' else 'objects'
+                execute = request.get('run') is True
+            except (ValueError, KeyError, TypeError, AttributeError):
+                raise HTTPError(400, "Expected a JSON body with 'code' and 'lineCount'")
+            result = await self.compile(code, line_count, token_format, execute)
+            if token_format == 'objects':
+                return 200, 'application/json', json.dumps(result).encode('utf-8'), {}
+            from pipeline import encode_response  # Already imported by start()
+            payload, encoding = encode_response(result, headers.get('accept-encoding', ''))
+            extra = {'Vary': 'Accept-Encoding'}
+            if encoding:
+                extra['Content-Encoding'] = encoding
+            return 200, 'application/json', payload, extra
+        if method != 'GET':
+            raise HTTPError(405)
+        if path == '/metrics':
+            return 200, 'text/plain; version=0.0.4', render_metrics(self.flight).encode('utf-8'), {}
+        if path == '/':
+            return self._static_file(os.path.join(BASE_DIR, 'templates', 'index.html'))
+        if path.startswith('/static/'):
+            static_dir = os.path.join(BASE_DIR, 'static')
+            file_path = os.path.normpath(os.path.join(static_dir, path[len('/static/'):]))
+            if os.path.dirname(file_path) == static_dir:
+                return self._static_file(file_path)
+        raise HTTPError(404)
+
+    def _static_file(self, file_path):
+        if not os.path.isfile(file_path):
+            raise HTTPError(404)
+        with open(file_path, 'rb') as file:
+            content = file.read()
+        content_type = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+        return 200, content_type, content, {}
+
+    async def _send_json(self, writer, status, data, keep_alive=True):
+        await self._send(writer, status, 'application/json', json.dumps(data).encode('utf-8'), keep_alive, {})
+
+    async def _send(self, writer, status, content_type, payload, keep_alive, extra):
+        lines = [
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(payload)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        lines.extend(f"{name}: {value}" for name, value in extra.items())
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + payload)
+        await writer.drain()
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description="Asynchronous compile server.")
+    argument_parser.add_argument('--host', default='127.0.0.1')
+    argument_parser.add_argument('--port', type=int, default=5000)
+    argument_parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count).")
+    argument_parser.add_argument('--max-pending', type=int, default=None, help="Pending compiles before answering 503.")
+    argument_parser.add_argument('--fork-server', action='store_true',
+                                 help="Fork workers on demand from a pre-warmed process (see forkserver.py).")
+    argument_parser.add_argument('--max-requests', type=int, default=DEFAULT_MAX_REQUESTS,
+                                 help="With --fork-server, compiles per worker before it is replaced (0: never).")
+    args = argument_parser.parse_args()
+    configure_logging()
+    server = AsyncCompileServer(args.host, args.port, args.workers, args.max_pending, fork_server=args.fork_server,
+                                max_requests=args.max_requests)
+    asyncio.run(server.serve_forever())
+
+
+if __name__ == '__main__':
+    main()
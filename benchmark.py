@@ -0,0 +1,288 @@
+# benchmark.py
+"""
+Benchmarks for the compiler pipeline on large generated programs.
+
+Usage:
+    python benchmark.py flat_ast [--functions N]
+    python benchmark.py hashcons [--functions N]
+    python benchmark.py lexer [--size N]
+    python benchmark.py parser [--functions N]
+    python benchmark.py relex [--functions N]
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+
+def generate_program(functions=200, statements=20):
+    """
+    Generates a large, valid program in the supported C subset.
+
+    Args:
+        functions (int): The number of functions to generate (plus a 'main').
+        statements (int): The number of loop statements inside each function.
+
+    Returns:
+        str: The source code.
+    """
+    lines = ["int counter = 0;"]
+    for index in range(functions):
+        lines.append(f"int f{index}(int a, int b) {{")
+        lines.append("    int total = 0;")
+        for step in range(statements):
+            lines.append(f"    for (int i = 0; i < {step + 2}; i = i + 1) {{")
+            lines.append(f"        if (a > b) {{ total = total + a * {step}; }} else {{ total = total - b; }}")
+            lines.append("    }")
+        lines.append("    while (total > 100) { total = total / 2; }")
+        lines.append("    return total;")
+        lines.append("}")
+    lines.append("int main() {")
+    lines.append("    int result = 0;")
+    for index in range(min(functions, 50)):
+        lines.append(f"    result = f{index}(result, {index});")
+    lines.append("    return result;")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def worst_case_lexer_inputs(size):
+    """
+    Builds inputs of roughly 'size' characters that are hard on comment and literal scanning.
+
+    Args:
+        size (int): The approximate length of each input.
+
+    Returns:
+        dict: Maps a case name to its source text.
+    """
+    return {
+        'unterminated_openers': '/* ' * (size // 3),
+        'unterminated_comment': '/*' + 'a\n' * (size // 2),
+        'long_comment': '/*' + '*' * size + '*/',
+        'star_slash_pairs': 'int x; /* ' + '* /' * (size // 3) + ' */',
+        'line_comments': '// /* x\n' * (size // 8),
+        'stray_quotes': "'" * size,
+        'quote_backslashes': "'\\" * (size // 2),
+        'char_literals': "'a' '\\n' " * (size // 10),
+        'slashes': 'a / ' * (size // 4),
+    }
+
+
+def lex_count(code, lexer=None):
+    """
+    Tokenizes code with a fresh clone of the lexer and returns the number of tokens.
+    """
+    from lexer import lexer as module_lexer, reset_lexer
+    lexer = (lexer or module_lexer).clone()
+    reset_lexer(lexer)
+    lexer.input(code)
+    count = 0
+    while lexer.token():
+        count += 1
+    return count
+
+
+def measure(function, repeat=3):
+    """
+    Runs a function several times and returns the best wall-clock time and its last result.
+    """
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def retained_memory(function):
+    """
+    Returns the number of bytes still allocated after function() returns, together with its
+    result (which is kept alive while measuring).
+    """
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    result = function()
+    gc.collect()
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return current - baseline, result
+
+
+def walk_objects(program):
+    """
+    Visits every node of an object AST without recursion and returns the node count.
+    """
+    from syntax_tree import Node
+    count = 0
+    stack = [program]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+            continue
+        count += 1
+        for value in vars(node).values():
+            if isinstance(value, (list, Node)):
+                stack.append(value)
+    return count
+
+
+def bench_flat_ast(args):
+    """
+    Compares the object AST and the flat AST for memory use and traversal speed.
+    """
+    from lexer import lexer
+    from parser import parser
+    from flat_ast import parse_flat
+
+    code = generate_program(args.functions)
+    print(f"Source: {len(code)} bytes, {code.count(chr(10))} lines")
+
+    object_bytes, program = retained_memory(lambda: parser.parse(code, lexer=lexer))
+    flat_bytes, flat = retained_memory(lambda: parse_flat(code, lexer=lexer))
+    print(f"Memory   object AST: {object_bytes / 1024:10.1f} KiB")
+    print(f"Memory   flat AST:   {flat_bytes / 1024:10.1f} KiB ({len(flat)} nodes)")
+
+    object_time, object_nodes = measure(lambda: walk_objects(program))
+    flat_time, flat_nodes = measure(lambda: sum(1 for _ in flat.walk()))
+    print(f"Traverse object AST: {object_time * 1000:10.2f} ms ({object_nodes} nodes)")
+    print(f"Traverse flat AST:   {flat_time * 1000:10.2f} ms ({flat_nodes} nodes)")
+
+
+def bench_hashcons(args):
+    """
+    Compares the object AST and the hash-consed AST for memory use and parse time.
+    """
+    from lexer import lexer, reset_lexer
+    from parser import parser
+    from hashcons import parse_hash_consed
+
+    code = generate_program(args.functions)
+    print(f"Source: {len(code)} bytes, {code.count(chr(10))} lines")
+
+    def parse_objects():
+        reset_lexer(lexer)
+        return parser.parse(code, lexer=lexer)
+
+    def parse_consed():
+        reset_lexer(lexer)
+        return parse_hash_consed(code, lexer=lexer)
+
+    object_bytes, program = retained_memory(parse_objects)
+    consed_bytes, (_, factory) = retained_memory(parse_consed)
+    print(f"Memory   object AST:      {object_bytes / 1024:10.1f} KiB")
+    print(f"Memory   hash-consed AST: {consed_bytes / 1024:10.1f} KiB "
+          f"({factory.built} of {factory.requested} nodes built, positions included)")
+    del program
+
+    object_time, _ = measure(parse_objects)
+    consed_time, _ = measure(parse_consed)
+    print(f"Parse    object AST:      {object_time * 1000:10.2f} ms")
+    print(f"Parse    hash-consed AST: {consed_time * 1000:10.2f} ms")
+
+
+def bench_lexer(args):
+    """
+    Lexes the worst-case corpus at doubling sizes; the time ratio between sizes stays
+    close to 2 when scanning is linear.
+    """
+    sizes = [args.size * 2 ** step for step in range(4)]
+    for name in worst_case_lexer_inputs(1):
+        timings = []
+        for size in sizes:
+            code = worst_case_lexer_inputs(size)[name]
+            elapsed, _ = measure(lambda: lex_count(code), repeat=1)
+            timings.append(elapsed)
+        ratios = ' '.join(f"{later / max(earlier, 1e-9):5.2f}" for earlier, later in zip(timings, timings[1:]))
+        print(f"{name:24} {timings[-1] * 1000:9.2f} ms at {sizes[-1]} chars, doubling ratios: {ratios}")
+
+
+def bench_parser(args):
+    """
+    Compares the parser backends on the same token stream (lexed once, so only parsing is
+    timed) and checks that they build the same AST.
+    """
+    from lexer import lexer, reset_lexer
+    from parser import PARSER_BACKENDS, get_parser
+    from syntax_tree import to_dict
+
+    code = generate_program(args.functions)
+    print(f"Source: {len(code)} bytes, {code.count(chr(10))} lines")
+    reset_lexer(lexer)
+    lexer.input(code)
+    tokens = list(iter(lexer.token, None))
+    results = {}
+    for backend in PARSER_BACKENDS:
+        parser = get_parser(backend)
+        elapsed, results[backend] = measure(lambda: parser.parse(lexer=lexer, tokenfunc=_token_feed(tokens)))
+        print(f"Parse {backend:8}: {elapsed * 1000:10.2f} ms ({len(tokens)} tokens)")
+    trees = [to_dict(tree) for tree in results.values()]
+    print("ASTs identical:", all(tree == trees[0] for tree in trees))
+
+
+def bench_relex(args):
+    """
+    Types a statement into the middle of a generated program one character at a time and
+    compares updating the tokens incrementally with re-tokenizing the whole buffer.
+    """
+    from incremental_lexer import IncrementalLexer
+
+    code = generate_program(args.functions)
+    typed = "x = (x + 1); /* note */ "
+    offset = code.index('{', len(code) // 2) + 1
+    print(f"Source: {len(code)} bytes, typing {len(typed)} characters at offset {offset}")
+
+    def incremental():
+        buffer = IncrementalLexer(code)
+        start = time.perf_counter()
+        for index, char in enumerate(typed):
+            buffer.edit(offset + index, 0, char)
+        return time.perf_counter() - start, buffer
+
+    def full():
+        start = time.perf_counter()
+        for index in range(len(typed)):
+            IncrementalLexer(code[:offset] + typed[:index + 1] + code[offset:])
+        return time.perf_counter() - start
+
+    incremental_time, buffer = min((incremental() for _ in range(3)), key=lambda result: result[0])
+    full_time = min(full() for _ in range(3))
+    print(f"Incremental: {incremental_time * 1000 / len(typed):8.3f} ms per keystroke")
+    print(f"Full relex : {full_time * 1000 / len(typed):8.3f} ms per keystroke")
+    same = [(t.type, t.value, t.lexpos) for t in buffer.tokens] == \
+        [(t.type, t.value, t.lexpos) for t in IncrementalLexer(buffer.text).tokens]
+    print("Tokens identical:", same)
+
+
+def _token_feed(tokens):
+    """
+    Returns a token function over a list of tokens.
+    """
+    iterator = iter(tokens)
+    return lambda: next(iterator, None)
+
+
+BENCHMARKS = {
+    'flat_ast': bench_flat_ast,
+    'hashcons': bench_hashcons,
+    'lexer': bench_lexer,
+    'parser': bench_parser,
+    'relex': bench_relex,
+}
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description="Benchmarks for the compiler pipeline.")
+    argument_parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    argument_parser.add_argument('--functions', type=int, default=200, help="Number of functions in the generated program.")
+    argument_parser.add_argument('--size', type=int, default=50000, help="Smallest input size for the lexer benchmark.")
+    args = argument_parser.parse_args()
+    BENCHMARKS[args.benchmark](args)
+
+
+if __name__ == '__main__':
+    main()
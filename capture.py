@@ -0,0 +1,249 @@
+# capture.py
+import gzip
+import json
+import os
+import random
+import re
+import threading
+import time
+
+import lexer as lexer_module
+from lexer import InternTable, lexical_errors, lexical_warnings
+
+# --- Traffic Capture ---
+#
+# An opt-in record of the sources sent to /run_code, replayed by replay.py to test
+# performance changes against real programs. Each process appends JSON lines
+# ({'time', 'code', 'lineCount', 'format', 'run'}) to its own gzip segment in the capture
+# directory. Records are buffered and written as one gzip member per batch (a gzip file may
+# hold several members), so a crash loses at most one batch and never corrupts the earlier
+# ones. A segment that reaches max_file_bytes is closed, and the oldest segments beyond
+# max_files are deleted.
+#
+# With anonymize=True, identifiers are renamed v1, v2, ... in order of first use ('main'
+# is kept) and the text of comments is removed, keeping the line structure, token types and
+# lexical diagnostics of the source.
+
+SEGMENT_PATTERN = re.compile(r'capture-\d{8}T\d{6}-\d+-\d+\.jsonl\.gz$')
+DEFAULT_MAX_FILE_BYTES = 8 * 1024 * 1024
+DEFAULT_MAX_FILES = 16
+FLUSH_RECORDS = 100  # Buffered records written at once
+FLUSH_BYTES = 256 * 1024  # Buffered source bytes written at once
+FLUSH_SECONDS = 30.0  # A record older than this is written with the next one
+
+COMMENT = re.compile(r'//[^\n]*|/\*.*?(?:\*/|\Z)', re.DOTALL)
+KEPT_NAMES = frozenset(['main'])
+
+
+def _blank_comment(match):
+    # Keep the delimiters (so the comment still separates tokens, and an unterminated one is
+    # still reported) and the newlines (so the lines after it keep their numbers).
+    comment = match.group()
+    if comment.startswith('//'):
+        return '//'
+    return '/*' + '\n' * comment.count('\n') + ('*/' if comment.endswith('*/') and len(comment) >= 4 else '')
+
+
+def _blank_comments(text):
+    return COMMENT.sub(_blank_comment, text)
+
+
+def anonymize_source(code, lexer=None):
+    """
+    Renames the identifiers of a source and blanks its comments (see the notes above).
+
+    Args:
+        code (str): The source code.
+        lexer: The PLY lexer to clone. Defaults to the module-level lexer from lexer.py.
+
+    Returns:
+        str: The anonymized source.
+    """
+    inner = (lexer or lexer_module.lexer).clone()
+    inner.lineno = 1
+    inner.intern_table = InternTable()
+    # Lexing reports diagnostics in the shared lists; drop ours afterwards.
+    errors_before, warnings_before = len(lexical_errors), len(lexical_warnings)
+    names = {}
+    pieces = []
+    last = 0
+    try:
+        inner.input(code)
+        for token in iter(inner.token, None):
+            start, end = token.lexpos, inner.lexpos
+            pieces.append(_blank_comments(code[last:start]))
+            text = code[start:end]
+            if token.type == 'ID' and token.value not in KEPT_NAMES:
+                text = names.setdefault(token.value, f"v{len(names) + 1}")
+            pieces.append(text)
+            last = end
+        pieces.append(_blank_comments(code[last:]))
+    finally:
+        del lexical_errors[errors_before:]
+        del lexical_warnings[warnings_before:]
+    return ''.join(pieces)
+
+
+class TrafficCapture:
+    """
+    Appends /run_code requests to a compressed, rotating corpus (see the notes above). It can
+    be shared by the threads of a process; forked processes start their own segments.
+    """
+    def __init__(self, directory, anonymize=False, sample_rate=1.0, max_file_bytes=DEFAULT_MAX_FILE_BYTES,
+                 max_files=DEFAULT_MAX_FILES):
+        """
+        Initializes the capture. The directory is created on the first write.
+
+        Args:
+            directory (str): Where the segments are written.
+            anonymize (bool, optional): Whether to anonymize the sources. Defaults to False.
+            sample_rate (float, optional): The fraction of requests recorded. Defaults to 1.
+            max_file_bytes (int, optional): Compressed size at which a segment is closed.
+                Defaults to 8 MB.
+            max_files (int, optional): Segments kept (None keeps all). Defaults to 16.
+        """
+        self.directory = directory
+        self.anonymize = anonymize
+        self.sample_rate = sample_rate
+        self.max_file_bytes = max_file_bytes
+        self.max_files = max_files
+        self.recorded = 0
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._buffer = []
+        self._buffered_bytes = 0
+        self._first_buffered = None
+        self._segment = None  # Path of the segment being written
+        self._sequence = 0
+
+    @classmethod
+    def from_env(cls, environ=None):
+        """
+        Creates the capture configured by COMPILE_CAPTURE_DIR (capture is off when it is unset
+        or empty), COMPILE_CAPTURE_ANONYMIZE (1 to anonymize), COMPILE_CAPTURE_SAMPLE,
+        COMPILE_CAPTURE_MAX_FILE_BYTES and COMPILE_CAPTURE_MAX_FILES (0 keeps all segments).
+
+        Args:
+            environ (dict, optional): The environment to read. Defaults to os.environ.
+
+        Returns:
+            TrafficCapture or None: The capture, or None if it is off.
+        """
+        environ = os.environ if environ is None else environ
+        directory = environ.get('COMPILE_CAPTURE_DIR', '').strip()
+        if not directory:
+            return None
+        return cls(directory,
+                   anonymize=environ.get('COMPILE_CAPTURE_ANONYMIZE', '').strip().lower() in ('1', 'true', 'yes'),
+                   sample_rate=float(environ.get('COMPILE_CAPTURE_SAMPLE', 1.0)),
+                   max_file_bytes=int(environ.get('COMPILE_CAPTURE_MAX_FILE_BYTES', DEFAULT_MAX_FILE_BYTES)),
+                   max_files=int(environ.get('COMPILE_CAPTURE_MAX_FILES', DEFAULT_MAX_FILES)) or None)
+
+    def record(self, code, line_count, token_format='objects', execute=False):
+        """
+        Records a request (subject to the sample rate).
+
+        Args:
+            code (str): The source code.
+            line_count (int): The number of lines in the editor.
+            token_format (str, optional): The requested token format. Defaults to 'objects'.
+            execute (bool, optional): Whether the program was to be run. Defaults to False.
+
+        Returns:
+            bool: True if the request was recorded.
+        """
+        if self.sample_rate < 1 and self._random.random() >= self.sample_rate:
+            return False
+        if self.anonymize:
+            code = anonymize_source(code)
+        now = time.time()
+        line = json.dumps({'time': now, 'code': code, 'lineCount': line_count, 'format': token_format,
+                           'run': execute}) + '\n'
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()  # Records buffered by the parent process are its own
+            self._buffer.append(line)
+            self._buffered_bytes += len(line)
+            if self._first_buffered is None:
+                self._first_buffered = now
+            self.recorded += 1
+            if (len(self._buffer) >= FLUSH_RECORDS or self._buffered_bytes >= FLUSH_BYTES
+                    or now - self._first_buffered >= FLUSH_SECONDS):
+                self._flush()
+        return True
+
+    def flush(self):
+        """
+        Writes the buffered records.
+        """
+        with self._lock:
+            if self._pid == os.getpid():
+                self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        data = gzip.compress(''.join(self._buffer).encode('utf-8', 'surrogatepass'))
+        self._buffer, self._buffered_bytes, self._first_buffered = [], 0, None
+        if self._segment is None:
+            os.makedirs(self.directory, exist_ok=True)
+            stamp = time.strftime('%Y%m%dT%H%M%S', time.gmtime())
+            self._segment = os.path.join(self.directory, f"capture-{stamp}-{self._pid}-{self._sequence:04d}.jsonl.gz")
+            self._sequence += 1
+        with open(self._segment, 'ab') as file:
+            file.write(data)
+            size = file.tell()
+        if size >= self.max_file_bytes:
+            self._segment = None
+            self._prune()
+
+    def _prune(self):
+        if not self.max_files:
+            return
+        for name in segment_names(self.directory)[:-self.max_files]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass  # Removed by another process
+
+
+def segment_names(directory):
+    """
+    Returns the names of the capture segments in a directory, oldest first.
+    """
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    # Names start with the creation time, then the process id and sequence number.
+    return sorted((name for name in names if SEGMENT_PATTERN.match(name)),
+                  key=lambda name: (name.split('-')[1], int(name.split('-')[2]), name.split('-')[3]))
+
+
+def read_corpus(path):
+    """
+    Reads the records of a capture directory (or of a single segment), in recorded order.
+    A segment cut short by a crash yields the records written before the cut.
+
+    Args:
+        path (str): A capture directory or a segment file.
+
+    Returns:
+        list: The record dicts, sorted by time.
+    """
+    files = [path] if os.path.isfile(path) else [os.path.join(path, name) for name in segment_names(path)]
+    records = []
+    for file_path in files:
+        with gzip.open(file_path, 'rt', encoding='utf-8', errors='surrogatepass') as file:
+            try:
+                for line in file:
+                    if line.endswith('\n'):  # The last line of a cut batch may be incomplete
+                        records.append(json.loads(line))
+            except (EOFError, gzip.BadGzipFile):
+                pass
+    records.sort(key=lambda record: record['time'])
+    return records
@@ -0,0 +1,484 @@
+# cfg.py
+import heapq
+
+from syntax_tree import Block, Declaration, Assignment, ReturnStatement, IfStatement, ForStatement, WhileStatement, \
+    BinaryExpression, Identifier, Literal, CallExpression
+
+# --- Control-Flow Graphs ---
+#
+# A function body is lowered to a graph of basic blocks. Each block holds the events of its
+# statements in evaluation order: a USE of a local variable, a DEF (a parameter, an
+# initialized declaration or an assignment) or a DECL (a declaration without initializer,
+# after which the variable holds no value). Local variables are numbered per declaration, so
+# variables of the same name in disjoint blocks are different variables; names that do not resolve
+# to a parameter or local declaration (globals, undeclared names) are not tracked.
+#
+# Data-flow problems are solved by a worklist over the blocks, in reverse postorder for
+# forward problems and postorder for backward ones (always taking the earliest pending
+# block), with sets of variables or definitions
+# represented as integer bitsets. Each block is revisited only when the value flowing into
+# it changes, so the analyses run in near-linear time for the structured flow of this language.
+
+USE, DEF, DECL = 'use', 'def', 'decl'
+
+
+class BasicBlock:
+    """
+    A straight-line sequence of events with edges to the blocks that may run next.
+    """
+    def __init__(self, index):
+        """
+        Initializes an empty block.
+
+        Args:
+            index (int): The position of the block in ControlFlowGraph.blocks.
+        """
+        self.index = index
+        self.events = []  # (kind, variable, node, definition) in evaluation order
+        self.successors = []
+        self.predecessors = []
+
+
+class ControlFlowGraph:
+    """
+    The control-flow graph of a function definition.
+    """
+    def __init__(self, function):
+        """
+        Builds the graph of a function.
+
+        Args:
+            function (FunctionDefinition): The function.
+        """
+        self.function = function
+        self.blocks = []
+        self.variables = []  # Parameter and Declaration nodes, indexed by variable number
+        self.definitions = []  # (variable, node) of each DEF event, indexed by definition number
+        self.returns = []  # (block, ReturnStatement) in source order, including unreachable ones
+        self.entry = self.new_block()
+        self.exit = self.new_block()
+
+        scopes = [{}]
+        for param in function.params:
+            self.define(self.entry, self.declare(param, scopes), param)
+        self.end = self.statement(function.body, self.entry, scopes)  # Where the body falls through
+        self.add_edge(self.end, self.exit)
+
+    def new_block(self):
+        block = BasicBlock(len(self.blocks))
+        self.blocks.append(block)
+        return block
+
+    def add_edge(self, source, target):
+        source.successors.append(target)
+        target.predecessors.append(source)
+
+    def declare(self, node, scopes):
+        """
+        Adds a local variable to the innermost scope and returns its number.
+        """
+        variable = len(self.variables)
+        self.variables.append(node)
+        scopes[-1][node.name] = variable
+        return variable
+
+    def lookup(self, name, scopes):
+        """
+        Returns the number of the local variable a name refers to, or None.
+        """
+        for scope in reversed(scopes):
+            if name in scope:
+                return scope[name]
+        return None
+
+    def define(self, block, variable, node):
+        if variable is not None:
+            block.events.append((DEF, variable, node, len(self.definitions)))
+            self.definitions.append((variable, node))
+
+    def statement(self, node, block, scopes):
+        """
+        Adds a statement to the graph.
+
+        Args:
+            node: The statement.
+            block (BasicBlock): The block in which the statement starts.
+            scopes (list): The enclosing scopes, innermost last (name: variable).
+
+        Returns:
+            BasicBlock: The block in which control continues after the statement.
+        """
+        if isinstance(node, Block):
+            scopes.append({})
+            for statement in node.statements or []:
+                block = self.statement(statement, block, scopes)
+            scopes.pop()
+        elif isinstance(node, Declaration):
+            variable = self.lookup(node.name, scopes)
+            if variable is None:
+                # The variable is in scope in its own initializer, as in the semantic analysis.
+                variable = self.declare(node, scopes)
+                if node.initializer is None:
+                    block.events.append((DECL, variable, node, None))
+            # A redeclaration is reported by the semantic analysis, which keeps the earlier variable.
+            if node.initializer is not None:
+                block = self.expression(node.initializer, block, scopes)
+                self.define(block, variable, node)
+        elif isinstance(node, ReturnStatement):
+            if node.value is not None:
+                block = self.expression(node.value, block, scopes)
+            self.returns.append((block, node))
+            self.add_edge(block, self.exit)
+            block = self.new_block()  # Statements after a return are unreachable
+        elif isinstance(node, IfStatement):
+            block = self.expression(node.condition, block, scopes)
+            value = constant_condition(node.condition)
+            after = self.new_block()
+            for branch, taken in ((node.then_block, True), (node.else_block, False)):
+                if value is not None and value != taken:
+                    continue
+                if branch is None:
+                    self.add_edge(block, after)
+                    continue
+                start = self.new_block()
+                self.add_edge(block, start)
+                self.add_edge(self.statement(branch, start, scopes), after)
+            block = after
+        elif isinstance(node, WhileStatement):
+            block = self.loop(block, None, node.condition, None, node.body, scopes)
+        elif isinstance(node, ForStatement):
+            # The initialization is declared in the enclosing scope, as in the semantic analysis.
+            block = self.loop(block, node.init, node.condition, node.increment, node.body, scopes)
+        elif node is not None:
+            # Expression statements; empty statements have no events.
+            block = self.expression(node, block, scopes)
+        return block
+
+    def loop(self, block, init, condition, increment, body, scopes):
+        """
+        Adds a while or for loop to the graph and returns the block after it.
+        """
+        if init is not None:
+            block = self.statement(init, block, scopes)
+        header = self.new_block()
+        self.add_edge(block, header)
+        value = True if condition is None else constant_condition(condition)
+        test = self.expression(condition, header, scopes) if condition is not None else header
+        after = self.new_block()
+        if value is not True:
+            # The exit edge comes first, so that the depth-first search of reachable() finishes the
+            # code after the loop first and the reverse postorder puts the body right after the header.
+            self.add_edge(test, after)
+        if value is not False:
+            start = self.new_block()
+            self.add_edge(test, start)
+            end = self.statement(body, start, scopes)
+            if increment is not None:
+                end = self.expression(increment, end, scopes)
+            self.add_edge(end, header)
+        return after
+
+    def expression(self, node, block, scopes):
+        """
+        Adds the events of an expression, in evaluation order, and returns the block in which
+        control continues (the right operand of '&&' and '||' is evaluated conditionally).
+        """
+        if isinstance(node, Identifier):
+            variable = self.lookup(node.name, scopes)
+            if variable is not None:
+                block.events.append((USE, variable, node, None))
+        elif isinstance(node, BinaryExpression):
+            block = self.expression(node.left, block, scopes)
+            if node.op in ('&&', '||'):
+                right = self.new_block()
+                after = self.new_block()
+                self.add_edge(block, right)
+                self.add_edge(block, after)
+                self.add_edge(self.expression(node.right, right, scopes), after)
+                block = after
+            else:
+                block = self.expression(node.right, block, scopes)
+        elif isinstance(node, Assignment):
+            block = self.expression(node.rvalue, block, scopes)
+            # Statement-level assignments have an Identifier target, nested ones a plain name.
+            name = node.lvalue.name if isinstance(node.lvalue, Identifier) else node.lvalue
+            self.define(block, self.lookup(name, scopes), node)
+        elif isinstance(node, CallExpression):
+            for argument in node.arguments or []:
+                block = self.expression(argument, block, scopes)
+        return block
+
+    def reachable(self):
+        """
+        Returns the blocks reachable from the entry, in reverse postorder.
+        """
+        return reverse_postorder(self.entry)
+
+
+def reverse_postorder(entry):
+    """
+    Returns the blocks reachable from a block, in reverse postorder (each block comes before
+    its successors, except along back edges). Blocks only need a 'successors' list and an 'index'.
+
+    Args:
+        entry: The first block.
+
+    Returns:
+        list: The blocks.
+    """
+    order = []
+    visited = {entry.index}
+    stack = [(entry, iter(entry.successors))]
+    while stack:
+        block, successors = stack[-1]
+        for successor in successors:
+            if successor.index not in visited:
+                visited.add(successor.index)
+                stack.append((successor, iter(successor.successors)))
+                break
+        else:
+            stack.pop()
+            order.append(block)
+    order.reverse()
+    return order
+
+
+def constant_condition(condition):
+    """
+    Returns the value of a condition that is a boolean literal, or None.
+    """
+    if isinstance(condition, Literal) and condition.type == 'bool':
+        return bool(condition.value)
+    return None
+
+
+def build_cfg(function):
+    """
+    Builds the control-flow graph of a function definition.
+
+    Args:
+        function (FunctionDefinition): The function.
+
+    Returns:
+        ControlFlowGraph: The graph.
+    """
+    return ControlFlowGraph(function)
+
+
+# --- Data-Flow Analyses ---
+
+def solve(cfg, gen, kill, forward=True, intersect=False, boundary=0, universe=0):
+    """
+    Solves a bitset data-flow problem with a worklist.
+
+    Args:
+        cfg (ControlFlowGraph): The graph (or any graph with 'blocks', 'entry', 'exit' and
+            'reachable()', such as an ir.Function, whose exit is None).
+        gen (list): The bits generated by each block (indexed like cfg.blocks).
+        kill (list): The bits killed by each block.
+        forward (bool, optional): Whether facts flow from the entry to the exit. Defaults to True.
+        intersect (bool, optional): Whether facts meet by intersection (must) instead of union (may). Defaults to False.
+        boundary (int, optional): The facts flowing into the entry (or out of the exit). Defaults to 0.
+        universe (int, optional): All bits, the initial value of an intersection problem. Defaults to 0.
+
+    Returns:
+        tuple: (ins, outs), the facts at the start and at the end of each block.
+    """
+    count = len(cfg.blocks)
+    start = cfg.entry if forward else cfg.exit
+    initial = universe if intersect else 0
+    ins = [initial] * count
+    outs = [initial] * count
+
+    order = cfg.reachable()
+    if not forward:
+        order.reverse()
+    # Unreachable blocks keep the initial value (vacuously true for an intersection problem).
+    position = {block.index: i for i, block in enumerate(order)}
+    # The worklist is ordered by position, so inner loops settle before later blocks are revisited.
+    pending = list(range(len(order)))
+    queued = set(pending)
+    while pending:
+        block = order[heapq.heappop(pending)]
+        queued.discard(position[block.index])
+        sources = block.predecessors if forward else block.successors
+        sources = [source for source in sources if source.index in position]
+        if block is start:
+            value = boundary
+        elif not sources:
+            value = initial
+        elif intersect:
+            value = universe
+            for source in sources:
+                value &= (outs if forward else ins)[source.index]
+        else:
+            value = 0
+            for source in sources:
+                value |= (outs if forward else ins)[source.index]
+        result = gen[block.index] | (value & ~kill[block.index])
+        if forward:
+            ins[block.index] = value
+            changed = outs[block.index] != result
+            outs[block.index] = result
+        else:
+            outs[block.index] = value
+            changed = ins[block.index] != result
+            ins[block.index] = result
+        if changed:
+            for target in (block.successors if forward else block.predecessors):
+                target_position = position.get(target.index)
+                if target_position is not None and target_position not in queued:
+                    queued.add(target_position)
+                    heapq.heappush(pending, target_position)
+    return ins, outs
+
+
+def variable_definitions(cfg):
+    """
+    Returns, for each variable, the bitset of its definitions.
+    """
+    masks = [0] * len(cfg.variables)
+    for definition, (variable, _) in enumerate(cfg.definitions):
+        masks[variable] |= 1 << definition
+    return masks
+
+
+def reaching_definitions(cfg):
+    """
+    Computes the definitions (bits of cfg.definitions) that may reach each block.
+
+    Returns:
+        tuple: (ins, outs) as returned by solve.
+    """
+    masks = variable_definitions(cfg)
+    gen, kill = [], []
+    for block in cfg.blocks:
+        generated = killed = 0
+        for kind, variable, _, definition in block.events:
+            if kind != USE:
+                generated &= ~masks[variable]
+                killed |= masks[variable]
+                if kind == DEF:
+                    generated |= 1 << definition
+        gen.append(generated)
+        kill.append(killed)
+    return solve(cfg, gen, kill)
+
+
+def live_variables(cfg):
+    """
+    Computes the variables (bits of cfg.variables) that may be read before being redefined.
+
+    Returns:
+        tuple: (ins, outs) as returned by solve, live at the start and at the end of each block.
+    """
+    gen, kill = [], []
+    for block in cfg.blocks:
+        generated = killed = 0
+        for kind, variable, _, _ in reversed(block.events):
+            bit = 1 << variable
+            if kind == USE:
+                generated |= bit
+            else:
+                generated &= ~bit
+                killed |= bit
+        gen.append(generated)
+        kill.append(killed)
+    return solve(cfg, gen, kill, forward=False)
+
+
+def definitely_assigned(cfg):
+    """
+    Computes the variables (bits of cfg.variables) that hold a value on every path to each block.
+
+    Returns:
+        tuple: (ins, outs) as returned by solve.
+    """
+    gen, kill = [], []
+    for block in cfg.blocks:
+        generated = killed = 0
+        for kind, variable, _, _ in block.events:
+            bit = 1 << variable
+            if kind == DEF:
+                generated |= bit
+                killed &= ~bit
+            elif kind == DECL:
+                generated &= ~bit
+                killed |= bit
+        gen.append(generated)
+        kill.append(killed)
+    return solve(cfg, gen, kill, intersect=True, universe=(1 << len(cfg.variables)) - 1)
+
+
+# --- Diagnostics ---
+
+def check_returns(cfg):
+    """
+    Checks the return statements of a function.
+
+    Args:
+        cfg (ControlFlowGraph): The graph of the function.
+
+    Returns:
+        list: The error messages.
+    """
+    function = cfg.function
+    errors = []
+    if function.return_type != 'void':
+        if not any(node.value is not None for _, node in cfg.returns):
+            errors.append(f"Semantic Error: Non-void function '{function.name}' must return a value.")
+        else:
+            # Control reaches the exit without a value by falling through the body or from 'return;'.
+            reachable = {block.index for block in cfg.reachable()}
+            if cfg.end.index in reachable or \
+                    any(node.value is None and block.index in reachable for block, node in cfg.returns):
+                errors.append(f"Semantic Error: Not all paths of non-void function '{function.name}' return a value.")
+    elif function.name == 'main':
+        for _, node in cfg.returns:
+            if node.value is not None:
+                errors.append(f"Semantic Error: Function 'main' must have return type 'int'.")
+    return errors
+
+
+def check_assignments(cfg):
+    """
+    Reports local variables that are read on a path where they have not been assigned.
+
+    Args:
+        cfg (ControlFlowGraph): The graph of the function.
+
+    Returns:
+        list: The error messages, one per variable.
+    """
+    assigned, _ = definitely_assigned(cfg)
+    unassigned = {}  # Maps each reported variable to its first unassigned use: (block, event position)
+    for block in cfg.reachable():
+        state = assigned[block.index]
+        for position, (kind, variable, _, _) in enumerate(block.events):
+            bit = 1 << variable
+            if kind == DEF:
+                state |= bit
+            elif kind == DECL:
+                state &= ~bit
+            elif not state & bit and variable not in unassigned:
+                unassigned[variable] = (block, position)
+    if not unassigned:
+        return []
+
+    # A use that no definition reaches is never assigned; otherwise only some paths assign it.
+    reaching, _ = reaching_definitions(cfg)
+    masks = variable_definitions(cfg)
+    errors = []
+    for variable, (block, position) in unassigned.items():
+        definitions = reaching[block.index]
+        for kind, defined, _, definition in block.events[:position]:
+            if kind != USE:
+                definitions &= ~masks[defined]
+                if kind == DEF:
+                    definitions |= 1 << definition
+        name = cfg.variables[variable].name
+        if definitions & masks[variable]:
+            errors.append(f"Semantic Error: '{name}' may be used before it is assigned.")
+        else:
+            errors.append(f"Semantic Error: '{name}' is used before it is assigned.")
+    return errors
@@ -0,0 +1,466 @@
+# cgen.py
+import hashlib
+import math
+import os
+import shutil
+import signal
+import subprocess
+import tempfile
+
+from diagnostics import logger
+from ir import CONST, COPY, CAST, ADD, SUB, MUL, DIV, EQ, NE, LT, GT, LE, GE, GET_GLOBAL, SET_GLOBAL, CALL, \
+    JUMP, BRANCH, RETURN, FLOATING_TYPES, ExecutionError, IRError, build_ir, execute
+
+# --- Native Code Generation ---
+#
+# A checked program is lowered to the optimized IR (see ir.py), emitted as C99 and compiled
+# with the system C compiler ($CC, cc or gcc). The generated C follows the semantics of
+# ir.fold, so native runs give the same results as the IR evaluator: integer arithmetic is
+# done in 64 bits and wrapped to 32, integer division by zero and invalid conversions stop
+# the program with a message, and 'float' is computed as 'double'.
+#
+# Binaries are cached on disk by a hash of the C source and the compiler command, and run
+# under 'ulimit' CPU time and memory limits plus a wall-clock timeout. When no compiler is
+# available, programs run on the IR evaluator instead.
+
+C_TYPES = {'int': 'int32_t', 'char': 'int32_t', 'bool': 'int32_t', 'float': 'double', 'double': 'double', 'void': 'void'}
+C_OPERATORS = {ADD: '+', SUB: '-', MUL: '*', EQ: '==', NE: '!=', LT: '<', GT: '>', LE: '<=', GE: '>='}
+CFLAGS = ('-std=c99', '-O2', '-w')
+TRAP_STATUS = 70  # Exit status of a program stopped by a runtime error
+
+PRELUDE = r"""#include <math.h>
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+
+static void trap(const char *message) {
+    fprintf(stderr, "%s\n", message);
+    exit(70);
+}
+
+static int32_t wrap(int64_t value, int bits) {
+    uint64_t mask = bits == 8 ? 0xffu : 0xffffffffu;
+    uint64_t bit = bits == 8 ? 0x80u : 0x80000000u;
+    uint64_t u = (uint64_t)value & mask;
+    return (int32_t)(u & bit ? (int64_t)u - (int64_t)(mask + 1) : (int64_t)u);
+}
+
+static int32_t truncate_to(double value, int bits, const char *type) {
+    if (!isfinite(value)) {
+        fprintf(stderr, "Cannot convert %s to '%s'\n", isnan(value) ? "nan" : value > 0 ? "inf" : "-inf", type);
+        exit(70);
+    }
+    double modulus = ldexp(1.0, bits);
+    double t = fmod(trunc(value), modulus);
+    if (t < 0) t += modulus;
+    return wrap((int64_t)t, bits);
+}
+
+static int32_t divide(int64_t a, int64_t b) {
+    if (b == 0) trap("Integer division by zero");
+    return wrap(a / b, 32);
+}
+"""
+
+
+class RunLimits:
+    """
+    Limits for running a compiled program. A limit of None disables it.
+    """
+    # Environment variables that override the defaults (see from_env).
+    ENVIRONMENT = {
+        'cpu_seconds': 'RUN_CPU_SECONDS',
+        'memory_bytes': 'RUN_MEMORY_BYTES',
+        'wall_seconds': 'RUN_WALL_SECONDS',
+        'max_steps': 'RUN_MAX_STEPS',
+    }
+
+    def __init__(self, cpu_seconds=2, memory_bytes=256 * 1024 * 1024, wall_seconds=5.0, max_steps=10_000_000):
+        """
+        Initializes the limits.
+
+        Args:
+            cpu_seconds (int, optional): CPU time of a native run ('ulimit -t'). Defaults to 2.
+            memory_bytes (int, optional): Virtual memory of a native run ('ulimit -v'). Defaults to 256 MB.
+            wall_seconds (float, optional): Wall-clock time of a native run. Defaults to 5 seconds.
+            max_steps (int, optional): Instructions executed by the IR evaluator (when no C compiler
+                is available). Defaults to 10,000,000.
+        """
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_bytes
+        self.wall_seconds = wall_seconds
+        self.max_steps = max_steps
+
+    @classmethod
+    def from_env(cls, environ=None):
+        """
+        Creates limits from environment variables, falling back to the defaults.
+        A value of 0 disables the corresponding limit.
+
+        Args:
+            environ (dict, optional): The environment to read. Defaults to os.environ.
+
+        Returns:
+            RunLimits: The configured limits.
+        """
+        environ = os.environ if environ is None else environ
+        limits = cls()
+        for attribute, variable in cls.ENVIRONMENT.items():
+            if variable in environ:
+                value = float(environ[variable]) if attribute == 'wall_seconds' else int(environ[variable])
+                setattr(limits, attribute, value or None)
+        return limits
+
+
+# --- Emitting C ---
+
+def c_literal(value, value_type):
+    """
+    Returns a C expression for a constant (floating-point values are exact hexadecimal literals).
+    """
+    if value_type in FLOATING_TYPES:
+        if math.isnan(value):
+            return 'NAN'
+        if math.isinf(value):
+            return 'INFINITY' if value > 0 else '(-INFINITY)'
+        return f"({value.hex()})"
+    if value == -2 ** 31:
+        return '(-2147483647 - 1)'
+    return f"({value})" if value < 0 else str(value)
+
+
+def c_conversion(source, source_type, target_type):
+    """
+    Returns a C expression converting a value, as ir.convert does.
+    """
+    if target_type in FLOATING_TYPES:
+        return f"(double){source}"
+    if target_type == 'bool':
+        return f"({source} != 0)"
+    bits = 8 if target_type == 'char' else 32
+    if source_type in FLOATING_TYPES:
+        return f"truncate_to({source}, {bits}, \"{target_type}\")"
+    return f"wrap({source}, {bits})"
+
+
+class CEmitter:
+    """
+    Emits the C source of an IR program.
+    """
+    def __init__(self, program):
+        self.program = program
+        self.names = {function.name: f"f_{function.name}" for function in program.functions.values()}
+        self.names[program.initializer.name] = "init_globals"
+
+    def signature(self, function):
+        params = ", ".join(f"{C_TYPES[function.types[v]]} v{v}" for v in function.params) or "void"
+        return f"static {C_TYPES[function.return_type]} {self.names[function.name]}({params})"
+
+    def emit(self):
+        """
+        Returns the C source of the program, including a main() that initializes the globals,
+        calls the program's 'main' and prints its result.
+        """
+        program = self.program
+        lines = [PRELUDE]
+        for index, (_, global_type) in enumerate(program.globals):
+            lines.append(f"static {C_TYPES[global_type]} g{index} = 0;")
+        functions = program.all_functions()
+        lines.extend(self.signature(function) + ";" for function in functions)
+        for function in functions:
+            lines.append("")
+            lines.extend(self.function(function))
+        lines.append("")
+        lines.append("int main(void) {")
+        lines.append("    init_globals();")
+        main = program.functions.get('main')
+        if main is not None and not main.params:
+            if main.return_type == 'void':
+                lines.append("    f_main();")
+            elif main.return_type in FLOATING_TYPES:
+                lines.append("    printf(\"%.17g\\n\", f_main());")
+            else:
+                lines.append("    printf(\"%d\\n\", (int)f_main());")
+        lines.append("    return 0;")
+        lines.append("}")
+        return "\n".join(lines) + "\n"
+
+    def function(self, function):
+        """
+        Returns the lines of a function: its values are locals and its blocks are labels.
+        """
+        lines = [self.signature(function) + " {"]
+        params = set(function.params)
+        for value, value_type in enumerate(function.types):
+            if value not in params and value_type != 'void':
+                lines.append(f"    {C_TYPES[value_type]} v{value};")
+        for block in function.blocks:
+            lines.append(f"b{block.index}:;")
+            for op, dest, a, b in block.instructions():
+                lines.extend("    " + line for line in self.instruction(function, block, op, dest, a, b))
+        lines.append("}")
+        return lines
+
+    def instruction(self, function, block, op, dest, a, b):
+        """
+        Returns the C statements of an instruction.
+        """
+        types = function.types
+        if op == CONST:
+            return [f"v{dest} = {c_literal(function.constants[a], types[dest])};"]
+        if op == COPY:
+            return [f"v{dest} = v{a};"]
+        if op == CAST:
+            return [f"v{dest} = {c_conversion(f'v{a}', types[a], types[dest])};"]
+        if op == DIV:
+            if types[dest] in FLOATING_TYPES:
+                return [f"v{dest} = (double)v{a} / (double)v{b};"]
+            return [f"v{dest} = divide(v{a}, v{b});"]
+        if op in C_OPERATORS:
+            operator = C_OPERATORS[op]
+            if types[dest] in FLOATING_TYPES:
+                return [f"v{dest} = (double)v{a} {operator} (double)v{b};"]
+            if types[dest] == 'bool':  # Comparisons (mixed operands compare as double, as in Python)
+                return [f"v{dest} = v{a} {operator} v{b};"]
+            return [f"v{dest} = wrap((int64_t)v{a} {operator} (int64_t)v{b}, 32);"]
+        if op == GET_GLOBAL:
+            return [f"v{dest} = g{a};"]
+        if op == SET_GLOBAL:
+            return [f"g{a} = v{b};"]
+        if op == CALL:
+            callee = self.program.functions[self.program.function_names[a]]
+            call = f"{self.names[callee.name]}({', '.join(f'v{v}' for v in function.argument_lists[b])});"
+            return [f"v{dest} = {call}" if dest >= 0 and types[dest] != 'void' else call]
+        if op == JUMP:
+            return self.goto(function, block, block.successors[0])
+        if op == BRANCH:
+            taken = ["    " + line for line in self.goto(function, block, block.successors[0])]
+            not_taken = ["    " + line for line in self.goto(function, block, block.successors[1])]
+            return [f"if (v{a}) {{"] + taken + ["} else {"] + not_taken + ["}"]
+        if op == RETURN:
+            return ["return;" if a < 0 else f"return v{a};"]
+        raise IRError(f"Cannot emit opcode {op} (the program is not in SSA form)")
+
+    def goto(self, function, block, target):
+        """
+        Returns the statements that pass control from a block to a successor: the phi functions
+        of the successor are assigned in parallel (through temporaries), then a goto.
+        """
+        if not target.phis:
+            return [f"goto b{target.index};"]
+        position = target.predecessors.index(block)
+        lines = ["{"]
+        for i, (dest, values) in enumerate(target.phis):
+            lines.append(f"    {C_TYPES[function.types[dest]]} t{i} = v{values[position]};")
+        lines.extend(f"    v{dest} = t{i};" for i, (dest, _) in enumerate(target.phis))
+        lines.append(f"    goto b{target.index};")
+        lines.append("}")
+        return lines
+
+
+def emit_c(program):
+    """
+    Emits the C source of an IR program.
+
+    Args:
+        program (ir.Program): The program, in SSA form.
+
+    Returns:
+        str: The C99 source.
+    """
+    return CEmitter(program).emit()
+
+
+# --- Compiling ---
+
+def find_compiler():
+    """
+    Returns the path of the system C compiler ($CC, cc or gcc), or None if there is none.
+    """
+    for name in (os.environ.get('CC'), 'cc', 'gcc'):
+        path = shutil.which(name) if name else None
+        if path:
+            return path
+    return None
+
+
+def default_binary_dir():
+    """
+    Returns the directory of the cached binaries ($NATIVE_CACHE_DIR, or next to the compile cache).
+    """
+    return os.environ.get('NATIVE_CACHE_DIR') or os.path.join(
+        os.path.expanduser('~'), '.cache', 'interactive-code-parser', 'native')
+
+
+class BinaryCache:
+    """
+    Compiled programs on disk, keyed by a hash of their C source and of the compiler command.
+    The least recently used binaries are removed when there are more than max_entries.
+    """
+    def __init__(self, directory=None, compiler=None, max_entries=256):
+        """
+        Initializes the cache.
+
+        Args:
+            directory (str, optional): Where binaries are stored. Defaults to default_binary_dir().
+            compiler (str, optional): The C compiler. Defaults to find_compiler().
+            max_entries (int, optional): Maximum number of cached binaries. Defaults to 256.
+        """
+        self.directory = directory or default_binary_dir()
+        self.compiler = compiler or find_compiler()
+        self.max_entries = max_entries
+
+    def key(self, source):
+        digest = hashlib.sha256()
+        for part in (self.compiler or '', *CFLAGS, source):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def binary(self, source):
+        """
+        Returns the path of the binary compiled from a C source, compiling it on a miss.
+
+        Args:
+            source (str): The C source.
+
+        Returns:
+            str: The path of the executable.
+
+        Raises:
+            RuntimeError: If there is no C compiler or the compilation fails.
+        """
+        if self.compiler is None:
+            raise RuntimeError("No C compiler found")
+        path = os.path.join(self.directory, self.key(source))
+        if os.path.exists(path):
+            os.utime(path)  # Most recently used
+            return path
+        os.makedirs(self.directory, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=self.directory) as work:
+            source_path = os.path.join(work, 'program.c')
+            with open(source_path, 'w', encoding='utf-8') as file:
+                file.write(source)
+            output = os.path.join(work, 'program')
+            result = subprocess.run([self.compiler, *CFLAGS, '-o', output, source_path, '-lm'],
+                                    capture_output=True, text=True, timeout=60)
+            if result.returncode != 0:
+                raise RuntimeError(f"C compilation failed: {result.stderr.strip()[:500]}")
+            os.replace(output, path)  # Atomic, so concurrent requests never run a partial binary
+        self.evict()
+        return path
+
+    def evict(self):
+        """
+        Removes the least recently used binaries beyond max_entries.
+        """
+        try:
+            entries = [entry for entry in os.scandir(self.directory) if entry.is_file()]
+        except OSError:
+            return
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+# --- Running ---
+
+def run_binary(path, return_type, limits):
+    """
+    Runs a compiled program under the CPU time and memory limits (set with 'ulimit' by a shell
+    that then execs the program, so no Python code runs between fork and exec).
+
+    Args:
+        path (str): The executable.
+        return_type (str): The return type of the program's 'main'.
+        limits (RunLimits): The limits.
+
+    Returns:
+        dict: {'engine': 'native', 'returnValue': ...} or {'engine': 'native', 'error': ...}.
+    """
+    result = {'engine': 'native'}
+    settings = []
+    if limits.cpu_seconds:
+        settings.append(f"ulimit -t {int(limits.cpu_seconds)}")
+    if limits.memory_bytes:
+        settings.append(f"ulimit -v {max(1, int(limits.memory_bytes) // 1024)}")
+    command = ['/bin/sh', '-c', "; ".join(settings + ['exec "$0"']), path]
+    try:
+        process = subprocess.run(command, capture_output=True, text=True, timeout=limits.wall_seconds)
+    except subprocess.TimeoutExpired:
+        result.update(error="Time limit exceeded", limitExceeded=True)
+        return result
+    if process.returncode == 0:
+        output = process.stdout.strip()
+        if return_type == 'void' or not output:
+            result['returnValue'] = None
+        else:
+            result['returnValue'] = float(output) if return_type in FLOATING_TYPES else int(output)
+    elif process.returncode == TRAP_STATUS:
+        result['error'] = process.stderr.strip()
+    elif process.returncode < 0 or process.returncode > 128:
+        # Killed by a signal: directly, or reported by the shell as 128 + the signal number.
+        number = -process.returncode if process.returncode < 0 else process.returncode - 128
+        if number in (signal.SIGXCPU, signal.SIGKILL):
+            result.update(error="Time limit exceeded", limitExceeded=True)
+        else:
+            result.update(error=f"Program terminated by signal {signal.Signals(number).name}"
+                          if number in signal.valid_signals() else f"Program terminated by signal {number}")
+            result['limitExceeded'] = number == signal.SIGSEGV  # Usually the stack (memory limit)
+    else:
+        result['error'] = f"Program exited with status {process.returncode}"
+    return result
+
+
+def run_program(ast, limits=None, cache=None):
+    """
+    Compiles a checked program to native code and runs its 'main' function. Without a C
+    compiler, the program runs on the IR evaluator instead.
+
+    Args:
+        ast (Program): The AST of a program that passed the semantic analysis.
+        limits (RunLimits, optional): Limits of the run. Defaults to RunLimits.from_env().
+        cache (BinaryCache, optional): Where binaries are cached. Defaults to BinaryCache().
+
+    Returns:
+        dict: 'engine' ('native' or 'interpreter') and either 'returnValue' or 'error'
+        ('limitExceeded' is set when the run stopped at a limit). Infinite and NaN return
+        values are given as strings.
+    """
+    limits = limits or RunLimits.from_env()
+    cache = cache or BinaryCache()
+    try:
+        program = build_ir(ast)
+    except IRError as e:
+        return {'engine': 'native', 'error': str(e)}
+    main = program.functions.get('main')
+    if main is None:
+        return {'engine': 'native', 'error': "The program has no 'main' function"}
+    if main.params:
+        return {'engine': 'native', 'error': "Function 'main' cannot take parameters"}
+    result = None
+    if cache.compiler is not None:
+        try:
+            result = run_binary(cache.binary(emit_c(program)), main.return_type, limits)
+        except (RuntimeError, OSError, subprocess.SubprocessError) as e:
+            logger.warning("Native run unavailable, using the IR evaluator: %s", e)
+    if result is None:
+        result = {'engine': 'interpreter'}
+        try:
+            result['returnValue'] = execute(program, max_steps=limits.max_steps)
+        except ExecutionError as e:
+            result['error'] = str(e)
+            result['limitExceeded'] = 'limit' in str(e)
+        except RecursionError:
+            result.update(error="Call depth limit exceeded", limitExceeded=True)
+    value = result.get('returnValue')
+    if main.return_type == 'bool' and value is not None:
+        result['returnValue'] = bool(value)
+    elif isinstance(value, float) and not math.isfinite(value):
+        result['returnValue'] = str(value)  # 'inf', '-inf' or 'nan' (not representable in JSON)
+    return result
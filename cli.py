@@ -0,0 +1,153 @@
+# cli.py
+"""
+Command-line front end: compiles source files with the same pipeline as the web service,
+sharing its persistent compile cache.
+
+Usage:
+    python cli.py FILE [FILE ...] [--ast] [--ir] [--run] [--parser NAME] [--no-cache] [--cache PATH] [--jobs N]
+    python cli.py --link FILE [FILE ...] [--jobs N]
+    python cli.py --outline FILE [FILE ...]
+"""
+import argparse
+import json
+import sys
+
+from compile_cache import CompileCache
+from ir import IRError, build_ir, format_program
+from limits import CompileLimits
+from logsetup import configure_logging
+from outline import outline_entries, parse_outline
+from parser import PARSER_BACKENDS
+import pipeline
+from pipeline import compile_code
+from project import Project
+from syntax_tree import from_dict
+
+
+def compile_file(path, limits, cache, execute=False):
+    """
+    Compiles one file.
+
+    Args:
+        path (str): The source file ('-' reads standard input).
+        limits (CompileLimits): Resource limits.
+        cache (CompileCache or None): The compile cache.
+        execute (bool, optional): Whether to also run a valid program. Defaults to False.
+
+    Returns:
+        tuple: (response, ast) as returned by pipeline.compile_code.
+    """
+    if path == '-':
+        code = sys.stdin.read()
+    else:
+        with open(path, encoding='utf-8') as file:
+            code = file.read()
+    return compile_code(code, code.count('\n') + 1, limits, cache, execute=execute)
+
+
+def link_files(paths, jobs=None):
+    """
+    Compiles the files as one project (see project.py) and prints its errors.
+
+    Args:
+        paths (list): The source files.
+        jobs (int, optional): Processes for parsing the files in parallel. Defaults to the CPU count.
+
+    Returns:
+        int: The exit status.
+    """
+    errors = Project(paths, workers=jobs, limits=CompileLimits.from_env()).build()
+    for message in errors:
+        print(message)
+    if not errors:
+        print(f"{len(paths)} files linked")
+    return 1 if errors else 0
+
+
+def outline_files(paths):
+    """
+    Prints the global declarations and function signatures of each file as JSON, without
+    parsing the function bodies (see outline.py).
+
+    Args:
+        paths (list): The source files.
+
+    Returns:
+        int: The exit status.
+    """
+    status = 0
+    for path in paths:
+        with open(path, encoding='utf-8') as file:
+            program, errors = parse_outline(file.read())
+        if errors:
+            status = 1
+            print(f"{path}:\n" + "\n".join(errors))
+        else:
+            print(json.dumps({'file': path, 'declarations': outline_entries(program)}))
+    return status
+
+
+def main(argv=None):
+    argument_parser = argparse.ArgumentParser(description="Compile source files.")
+    argument_parser.add_argument('files', nargs='+', help="Source files ('-' for standard input).")
+    argument_parser.add_argument('--ast', action='store_true', help="Print the AST of each file as JSON.")
+    argument_parser.add_argument('--ir', action='store_true',
+                                 help="Print the optimized intermediate representation of each file.")
+    argument_parser.add_argument('--run', action='store_true',
+                                 help="Compile each valid file to native code, run it and print its result.")
+    argument_parser.add_argument('--no-cache', action='store_true', help="Do not use the compile cache.")
+    argument_parser.add_argument('--cache', default=None, help="Path of the compile cache file.")
+    argument_parser.add_argument('--jobs', type=int, default=None,
+                                 help="Processes for checking the functions of large programs in parallel.")
+    argument_parser.add_argument('--link', action='store_true',
+                                 help="Compile the files as one project, resolving calls and globals across files.")
+    argument_parser.add_argument('--parser', choices=PARSER_BACKENDS, default=None,
+                                 help="The parser backend (defaults to $COMPILE_PARSER, or 'ply').")
+    argument_parser.add_argument('--outline', action='store_true',
+                                 help="Print the global declarations and function signatures of each file.")
+    args = argument_parser.parse_args(argv)
+    configure_logging()
+    if args.outline:
+        return outline_files(args.files)
+    if args.link:
+        return link_files(args.files, args.jobs)
+    if args.jobs is not None:
+        pipeline.semantic_workers = args.jobs
+    if args.parser is not None:
+        pipeline.parser_backend = args.parser
+
+    limits = CompileLimits.from_env()
+    if args.no_cache:
+        cache = None
+    elif args.cache:
+        cache = CompileCache(args.cache)
+    else:
+        cache = CompileCache.from_env()
+
+    status = 0
+    for path in args.files:
+        response, ast = compile_file(path, limits, cache, args.run)
+        if 'error' in response:
+            status = 1
+            print(f"{path}:\n{response['error']}")
+        else:
+            print(f"{path}: {response['output']['parsed']} ({len(response['output']['tokens'])} tokens)")
+            run = response['output'].get('run')
+            if run is not None and 'error' in run:
+                status = 1
+                print(f"{path}: Runtime error: {run['error']}")
+            elif run is not None:
+                print(f"{path}: main returned {run['returnValue']} ({run['engine']})")
+        if args.ast and ast is not None:
+            print(json.dumps(ast, indent=2))
+        if args.ir and 'error' not in response:
+            try:
+                print(format_program(build_ir(from_dict(ast))), end='')
+            except IRError as e:
+                status = 1
+                print(f"{path}: {e}")
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+# coalesce.py
+import asyncio
+import hashlib
+import threading
+
+# --- Request Coalescing (single-flight) ---
+#
+# When identical sources are submitted at the same time (e.g., a whole class compiling
+# the starter template), only the first request runs the compile; the others wait for it
+# and share its result. The counters are exported as metrics (see render_metrics).
+
+
+def source_key(code, *options):
+    """
+    Returns the coalescing key of a compile request: a hash of the source and its options.
+
+    Args:
+        code (str): The source code.
+        *options: Other request parameters that affect the result.
+
+    Returns:
+        str: A hex digest.
+    """
+    digest = hashlib.sha256(code.encode('utf-8', 'surrogatepass'))
+    for option in options:
+        digest.update(b'\0' + repr(option).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class _Counters:
+    """
+    Request and execution counters shared by both single-flight variants.
+    """
+    def __init__(self):
+        self.requests = 0  # Calls to do()
+        self.executions = 0  # Calls that actually ran the function
+
+    @property
+    def coalesced(self):
+        return self.requests - self.executions
+
+    @property
+    def coalescing_ratio(self):
+        """
+        The fraction of requests that were served by another request's execution.
+        """
+        return self.coalesced / self.requests if self.requests else 0.0
+
+
+class _Call:
+    """
+    An in-flight execution that other requests can wait for.
+    """
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(_Counters):
+    """
+    Thread-based single-flight: concurrent calls with the same key share one execution.
+    """
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._calls = {}  # Maps a key to its in-flight _Call
+
+    def do(self, key, function):
+        """
+        Runs function() unless a call with the same key is already in flight, in which case
+        it waits for that call and returns (or raises) its outcome.
+
+        Args:
+            key (str): The coalescing key.
+            function (callable): Computes the result.
+
+        Returns:
+            The result of the (possibly shared) execution.
+        """
+        with self._lock:
+            self.requests += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = function()
+            return call.result
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight(_Counters):
+    """
+    asyncio single-flight: concurrent awaits with the same key share one execution.
+    """
+    def __init__(self):
+        super().__init__()
+        self._calls = {}  # Maps a key to its in-flight future
+
+    async def do(self, key, coroutine_function):
+        """
+        Awaits coroutine_function() unless a call with the same key is already in flight.
+
+        Args:
+            key (str): The coalescing key.
+            coroutine_function (callable): Returns an awaitable computing the result.
+
+        Returns:
+            The result of the (possibly shared) execution.
+        """
+        self.requests += 1
+        future = self._calls.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+        self.executions += 1
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await coroutine_function()
+            future.set_result(result)
+            return result
+        except BaseException as error:
+            future.set_exception(error)
+            future.exception()  # Mark the exception as retrieved when nobody else waits
+            raise
+        finally:
+            del self._calls[key]
+
+
+def render_metrics(single_flight, prefix='compile'):
+    """
+    Renders the coalescing counters in the Prometheus text exposition format.
+
+    Args:
+        single_flight: A SingleFlight or AsyncSingleFlight.
+        prefix (str): The metric name prefix.
+
+    Returns:
+        str: The metrics text.
+    """
+    metrics = [
+        ('requests_total', 'counter', "Compile requests received.", single_flight.requests),
+        ('executions_total', 'counter', "Compiles actually executed.", single_flight.executions),
+        ('coalesced_total', 'counter', "Requests served by an identical in-flight compile.", single_flight.coalesced),
+        ('coalescing_ratio', 'gauge', "Fraction of requests that were coalesced.", single_flight.coalescing_ratio),
+    ]
+    lines = []
+    for name, metric_type, description, value in metrics:
+        lines.append(f"# HELP {prefix}_{name} {description}")
+        lines.append(f"# TYPE {prefix}_{name} {metric_type}")
+        lines.append(f"{prefix}_{name} {value:g}" if isinstance(value, float) else f"{prefix}_{name} {value}")
+    return '\n'.join(lines) + '\n'
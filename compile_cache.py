@@ -0,0 +1,212 @@
+# compile_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+# --- Persistent Compile Cache ---
+#
+# Compile results (the /run_code response and the serialized AST) are stored in a local
+# SQLite file, so every worker process of the service and the CLI share them, and they
+# survive restarts. Entries are keyed on a hash of the source, the request options and
+# VERSION, a stamp of the compiler's own source files: editing the grammar or the semantic
+# rules changes the stamp, so stale entries are never hit again and are evicted over time.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Files whose contents determine the compile result (every module the pipeline loads)
+VERSIONED_FILES = ('lexer.py', 'parser.py', 'descent.py', 'lrtables.py', 'semantic.py', 'cfg.py', 'syntax_tree.py', 'pipeline.py', 'ir.py',
+                   'optimize.py', 'cgen.py', 'diagnostics.py', 'limits.py')
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    payload BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+"""
+
+
+def compiler_version(files=VERSIONED_FILES, base_dir=BASE_DIR):
+    """
+    Computes the version stamp of the compiler from the contents of its source files.
+
+    Args:
+        files (tuple, optional): The file names to hash. Defaults to VERSIONED_FILES.
+        base_dir (str, optional): The directory containing the files.
+
+    Returns:
+        str: A hex digest.
+    """
+    digest = hashlib.sha256()
+    for name in files:
+        digest.update(name.encode('utf-8') + b'\0')
+        with open(os.path.join(base_dir, name), 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+VERSION = compiler_version()
+
+
+def default_path():
+    """
+    Returns the default location of the cache file (under $XDG_CACHE_HOME or ~/.cache).
+    """
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'interactive-code-parser', 'compile_cache.sqlite')
+
+
+class CompileCache:
+    """
+    SQLite-backed store of compile results with a size cap and least-recently-used eviction.
+    It can be shared by any number of threads and processes; errors of the underlying
+    database (e.g., a locked or read-only file) are treated as cache misses.
+    """
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_BYTES, version=None):
+        """
+        Initializes the cache. The database file is created on first use.
+
+        Args:
+            path (str, optional): The cache file. Defaults to default_path().
+            max_bytes (int, optional): Maximum total size of the stored entries. Defaults to 64 MB.
+            version (str, optional): The compiler version stamp. Defaults to VERSION.
+        """
+        self.path = path or default_path()
+        self.max_bytes = max_bytes
+        self.version = version or VERSION
+        self._local = threading.local()  # One connection per thread (and process, see _connection)
+
+    @classmethod
+    def from_env(cls, environ=None):
+        """
+        Creates the cache configured by COMPILE_CACHE_PATH and COMPILE_CACHE_MAX_BYTES.
+        Setting COMPILE_CACHE_PATH to an empty string or 0 disables the cache, and a
+        COMPILE_CACHE_MAX_BYTES of 0 disables the size cap.
+
+        Args:
+            environ (dict, optional): The environment to read. Defaults to os.environ.
+
+        Returns:
+            CompileCache or None: The cache, or None if it is disabled.
+        """
+        environ = os.environ if environ is None else environ
+        path = environ.get('COMPILE_CACHE_PATH')
+        if path is not None and path.strip() in ('', '0'):
+            return None
+        max_bytes = int(environ.get('COMPILE_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+        return cls(path, max_bytes or None)
+
+    def key(self, code, *options):
+        """
+        Computes the cache key of a compilation.
+
+        Args:
+            code (str): The source code.
+            *options: Other parameters that affect the result (e.g., the resource limits).
+
+        Returns:
+            str: A hex digest.
+        """
+        digest = hashlib.sha256(self.version.encode('ascii') + b'\0')
+        digest.update(code.encode('utf-8', 'surrogatepass'))
+        for option in options:
+            digest.update(b'\0' + repr(option).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _connection(self):
+        # SQLite connections must not cross threads or be inherited by forked processes.
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key):
+        """
+        Looks up an entry and marks it as recently used.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            tuple or None: (response, ast) where ast is the serialized AST (or None),
+            or None on a miss.
+        """
+        try:
+            connection = self._connection()
+            row = connection.execute("SELECT payload FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            connection.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+            entry = json.loads(zlib.decompress(row[0]))
+        except (sqlite3.Error, OSError, zlib.error, ValueError):
+            return None
+        return entry['response'], entry['ast']
+
+    def put(self, key, response, ast=None):
+        """
+        Stores an entry, evicting the least recently used entries if the cache grows too large.
+
+        Args:
+            key (str): The cache key.
+            response (dict): The /run_code response.
+            ast (dict, optional): The serialized AST (see syntax_tree.to_dict).
+        """
+        payload = zlib.compress(json.dumps({'response': response, 'ast': ast}).encode('utf-8'))
+        if self.max_bytes is not None and len(payload) > self.max_bytes:
+            return  # Would evict everything else
+        try:
+            connection = self._connection()
+            connection.execute("INSERT OR REPLACE INTO entries (key, payload, size, last_used) VALUES (?, ?, ?, ?)",
+                               (key, payload, len(payload), time.time()))
+            self._evict(connection)
+        except (sqlite3.Error, OSError):
+            pass
+
+    def _evict(self, connection):
+        if self.max_bytes is None:
+            return
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Evict down to 90% of the cap so that eviction does not run on every insert.
+        excess = total - self.max_bytes * 9 // 10
+        evicted = []
+        for key, size in connection.execute("SELECT key, size FROM entries ORDER BY last_used"):
+            if excess <= 0:
+                break
+            evicted.append((key,))
+            excess -= size
+        connection.executemany("DELETE FROM entries WHERE key = ?", evicted)
+
+    def count(self):
+        """
+        Returns the number of stored entries.
+        """
+        try:
+            return self._connection().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def total_bytes(self):
+        """
+        Returns the total size of the stored entries.
+        """
+        try:
+            return self._connection().execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        except sqlite3.Error:
+            return 0
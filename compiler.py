@@ -0,0 +1,177 @@
+# compiler.py
+
+# --- Library API ---
+#
+# compile_source() runs the compiler on a source string and returns a CompileResult with the
+# tokens, the AST and the diagnostics, for programs that embed the compiler (batch graders,
+# other services) without the web front end. Importing this module is cheap: it imports
+# nothing from the compiler, and the lexer (whose import builds the PLY lexer), the parser
+# tables, the semantic analyzer and the native back end are imported by the first call that
+# needs them. Flask is never imported.
+#
+# Like the rest of the pipeline, compiles share the module-level lexer and parser state, so a
+# process runs one compile at a time (use worker processes for parallelism).
+
+
+class CompileOptions:
+    """
+    Options of compile_source.
+    """
+    def __init__(self, parser='ply', analyze=True, execute=False, limits=None):
+        """
+        Initializes the options.
+
+        Args:
+            parser (str, optional): The parser backend, one of parser.PARSER_BACKENDS. Defaults to 'ply'.
+            analyze (bool, optional): Whether to run the semantic analysis. Defaults to True.
+            execute (bool, optional): Whether to also run a valid program (see cgen.run_program).
+                Defaults to False.
+            limits (CompileLimits, optional): Resource limits. Defaults to CompileLimits().
+        """
+        self.parser = parser
+        self.analyze = analyze
+        self.execute = execute
+        self.limits = limits
+
+    @classmethod
+    def from_value(cls, options):
+        """
+        Returns options given as None, a CompileOptions or a dict of CompileOptions arguments.
+        """
+        if options is None:
+            return cls()
+        if isinstance(options, cls):
+            return options
+        return cls(**options)
+
+
+class Token:
+    """
+    A token of the source: its type (see lexer.tokens), value, line and position.
+    """
+    __slots__ = ('type', 'value', 'lineno', 'lexpos')
+
+    def __init__(self, type, value, lineno, lexpos):
+        self.type = type
+        self.value = value
+        self.lineno = lineno
+        self.lexpos = lexpos
+
+    def __repr__(self):
+        return f"Token({self.type}, {self.value!r}, {self.lineno}, {self.lexpos})"
+
+    def __eq__(self, other):
+        return isinstance(other, Token) and (self.type, self.value, self.lineno, self.lexpos) == \
+            (other.type, other.value, other.lineno, other.lexpos)
+
+
+class CompileResult:
+    """
+    The result of compile_source.
+    """
+    def __init__(self):
+        self.tokens = []  # Token objects, in source order
+        self.ast = None  # The Program, or None if the source could not be parsed
+        self.warnings = []  # Lexical warnings (they do not make the program invalid)
+        self.errors = []  # Lexical, syntax, resource limit and semantic errors, in that order
+        self.run = None  # The result of cgen.run_program, if the program was executed
+
+    @property
+    def ok(self):
+        """
+        True if the program is valid (it parsed and, when analyzed, has no semantic errors).
+        """
+        return self.ast is not None and not self.errors
+
+    @property
+    def diagnostics(self):
+        """
+        The errors followed by the warnings.
+        """
+        return self.errors + self.warnings
+
+    def to_dict(self):
+        """
+        Returns the result as JSON-compatible data (the AST as returned by syntax_tree.to_dict).
+        """
+        from syntax_tree import to_dict
+        data = {
+            'ok': self.ok,
+            'tokens': [{'type': token.type, 'value': token.value, 'line': token.lineno, 'position': token.lexpos}
+                       for token in self.tokens],
+            'ast': to_dict(self.ast) if self.ast is not None else None,
+            'errors': list(self.errors),
+            'warnings': list(self.warnings),
+        }
+        if self.run is not None:
+            data['run'] = self.run
+        return data
+
+
+def compile_source(text, options=None):
+    """
+    Lexes, parses and (by default) analyzes a program.
+
+    Args:
+        text (str): The source code.
+        options (CompileOptions or dict, optional): The options. Defaults to CompileOptions().
+
+    Returns:
+        CompileResult: The tokens, AST and diagnostics. Errors in the source, including
+        exceeded resource limits and nesting too deep to analyze, are reported in the result,
+        never raised.
+
+    Raises:
+        ValueError: If the parser backend is unknown.
+    """
+    options = CompileOptions.from_value(options)
+    from lexer import lexer, reset_lexer, lexical_errors, lexical_warnings
+    from limits import CompileLimits, LimitExceeded
+    from parser import get_parser, syntax_errors
+
+    parser = get_parser(options.parser)
+    result = CompileResult()
+    budget = (options.limits or CompileLimits()).budget()
+    try:
+        budget.check_source(text)
+        reset_lexer(lexer)
+        syntax_errors.clear()
+
+        # Tokens and the AST are built in one pass: the parser pulls the tokens through here.
+        next_token = budget.token_source(lexer.token)
+
+        def record_token():
+            token = next_token()
+            if token is not None:
+                result.tokens.append(Token(token.type, token.value, token.lineno, token.lexpos))
+            return token
+
+        budget.start_stage('parse')
+        lexer.input(text)
+        ast = parser.parse(lexer=lexer, tokenfunc=record_token)
+        # The parser stops reading at an unrecoverable error; list the remaining tokens too.
+        while record_token() is not None:
+            pass
+        result.warnings = list(lexical_warnings)
+        result.errors = list(lexical_errors) + list(syntax_errors)
+        if result.errors or ast is None:
+            return result
+        budget.check_depth(ast)
+        result.ast = ast
+        if options.analyze:
+            from semantic import SemanticError, semantic_analyzer
+            budget.start_stage('semantic')
+            try:
+                result.errors = list(semantic_analyzer(ast, budget))
+            except SemanticError as e:  # An error the analyzer could not recover from
+                result.errors = [str(e)]
+        if options.execute and not result.errors:
+            from cgen import run_program
+            result.run = run_program(ast)
+    except LimitExceeded as e:
+        result.ast = None
+        result.errors.append(str(e))
+    except RecursionError:  # Possible when max_ast_depth is None (or above the recursion limit)
+        result.ast = None
+        result.errors.append(str(LimitExceeded("program is nested too deeply to compile")))
+    return result
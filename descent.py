@@ -0,0 +1,306 @@
+# descent.py
+import parser as grammar
+from lexer import lexer as default_lexer
+
+# --- Recursive-Descent Parser ---
+#
+# A hand-written parser for the grammar of parser.py that builds the same nodes through the
+# same node factory (so it also builds flat ASTs). Statements are parsed by recursive descent
+# and expressions by precedence climbing on the 'precedence' table of parser.py. It follows
+# the way PLY resolves the conflicts of the grammar:
+#   - an assignment's right-hand side binds tighter than every binary operator, so
+#     'x = a + b' is '(x = a) + b' (ASSIGN has the highest precedence);
+#   - a statement that is exactly 'ID = expression;' is an assignment statement (with an
+#     Identifier target), while an assignment inside an expression keeps the name as a string;
+#   - an 'else' belongs to the nearest 'if'.
+# On a syntax error, or nesting deeper than MAX_NESTING, the tokens read so far are replayed
+# into the PLY parser, which reports the errors and recovers exactly as before (and has no
+# recursion limit). Valid programs never pay for PLY's generic driver.
+
+LITERAL_TYPES = {'INT_NUM': 'int', 'FLOAT_NUM': 'float', 'DOUBLE_NUM': 'double', 'CHAR_LIT': 'char', 'BOOL_LIT': 'bool'}
+
+# Precedence levels from the table of parser.py (1 binds loosest).
+LEVELS = {token: level for level, (_, *operators) in enumerate(grammar.precedence, 1) for token in operators}
+BINARY_LEVELS = {token: level for token, level in LEVELS.items() if token != 'ASSIGN'}
+ASSIGN_LEVEL = LEVELS['ASSIGN']  # Right-associative, so a right-hand side starts at the same level
+
+# Nested statements and expressions handled by recursion. Each level takes a few Python
+# frames, so this stays well below the recursion limit; deeper input goes to PLY.
+MAX_NESTING = 150
+
+
+class Mismatch(Exception):
+    """
+    Raised when the input is not a valid program; the PLY parser then takes over.
+    """
+
+
+class DescentParse:
+    """
+    The state of one parse: the token source, the current token and the tokens read so far.
+    """
+    def __init__(self, next_token, lexer):
+        self.next_token = next_token
+        self.lexer = lexer
+        self.factory = grammar.node_factory
+        self.history = []  # Every token read, for replaying into the PLY parser
+        self.nesting = 0
+        self.token = None
+        self.type = None
+        self.advance()
+
+    def advance(self):
+        token = self.next_token()
+        if token is not None:
+            self.history.append(token)
+            self.type = token.type
+        else:
+            self.type = None  # End of input
+        self.token = token
+
+    def expect(self, type):
+        token = self.token
+        if self.type != type:
+            raise Mismatch(type)
+        self.advance()
+        return token
+
+    def replay(self):
+        """
+        Returns a token function that yields the tokens read so far, then the rest of the input.
+        """
+        tokens = iter(self.history)
+        next_token = self.next_token
+
+        def token():
+            for token in tokens:
+                return token
+            return next_token()
+        return token
+
+    # --- Declarations ---
+
+    def program(self):
+        declarations = [self.external_declaration()]
+        while self.type is not None:
+            declarations.append(self.external_declaration())
+        return self.factory.Program(declarations, self.lexer.intern_table)
+
+    def external_declaration(self):
+        type_token = self.expect('TYPE')
+        name = self.expect('ID')
+        if self.type != 'LPAREN':
+            declaration = self.declaration_rest(type_token, name)
+            self.expect('SEMI')
+            return declaration
+        self.advance()
+        factory = self.factory
+        params = []
+        if self.type != 'RPAREN':
+            while True:
+                param_type = self.expect('TYPE')
+                param = self.expect('ID')
+                params.append(factory.Parameter(param_type.value, param.value, param.symbol_id))
+                if self.type != 'COMMA':
+                    break
+                self.advance()
+        self.expect('RPAREN')
+        return factory.FunctionDefinition(type_token.value, name.value, params, self.block(), name.symbol_id)
+
+    def declaration_rest(self, type_token, name):
+        initializer = None
+        if self.type == 'ASSIGN':
+            self.advance()
+            initializer = self.expression(0)
+        return self.factory.Declaration(type_token.value, name.value, initializer, name.symbol_id)
+
+    # --- Statements ---
+
+    def block(self):
+        self.expect('LBRACE')
+        statements = []
+        while self.type != 'RBRACE':
+            if self.type is None:
+                raise Mismatch('RBRACE')
+            statements.append(self.statement())
+        self.advance()
+        return self.factory.Block(statements or None)  # The grammar gives None for an empty block
+
+    def statement(self):
+        self.nesting += 1
+        if self.nesting > MAX_NESTING:
+            raise Mismatch('nesting')
+        statement = self.parse_statement()
+        self.nesting -= 1
+        return statement
+
+    def parse_statement(self):
+        type = self.type
+        factory = self.factory
+        if type == 'ID':
+            name = self.token
+            self.advance()
+            if self.type == 'ASSIGN':
+                self.advance()
+                value = self.expression(ASSIGN_LEVEL)
+                if self.type == 'SEMI':
+                    self.advance()
+                    return factory.Assignment(factory.Identifier(name.value, symbol_id=name.symbol_id), value)
+                left = factory.Assignment(name.value, value)
+            else:
+                left = self.identifier(name)
+            expression = self.binary(left, 0)
+            self.expect('SEMI')
+            return expression
+        if type == 'TYPE':
+            type_token = self.token
+            self.advance()
+            declaration = self.declaration_rest(type_token, self.expect('ID'))
+            self.expect('SEMI')
+            return declaration
+        if type == 'IF':
+            self.advance()
+            self.expect('LPAREN')
+            condition = self.expression(0)
+            self.expect('RPAREN')
+            then_block = self.statement()
+            else_block = None
+            if self.type == 'ELSE':
+                self.advance()
+                else_block = self.statement()
+            return factory.IfStatement(condition, then_block, else_block)
+        if type == 'WHILE':
+            self.advance()
+            self.expect('LPAREN')
+            condition = self.expression(0)
+            self.expect('RPAREN')
+            return factory.WhileStatement(condition, self.statement())
+        if type == 'FOR':
+            self.advance()
+            self.expect('LPAREN')
+            init = None
+            if self.type == 'TYPE':
+                type_token = self.token
+                self.advance()
+                init = self.declaration_rest(type_token, self.expect('ID'))
+            elif self.type != 'SEMI':
+                init = self.expression(0)
+            self.expect('SEMI')
+            condition = self.expression(0) if self.type != 'SEMI' else None
+            self.expect('SEMI')
+            increment = self.expression(0) if self.type != 'RPAREN' else None
+            self.expect('RPAREN')
+            return factory.ForStatement(init, condition, increment, self.statement())
+        if type == 'RETURN':
+            self.advance()
+            value = self.expression(0) if self.type != 'SEMI' else None
+            self.expect('SEMI')
+            return factory.ReturnStatement(value)
+        if type == 'LBRACE':
+            return self.block()
+        if type == 'SEMI':
+            self.advance()
+            return factory.EmptyStatement()
+        expression = self.expression(0)
+        self.expect('SEMI')
+        return expression
+
+    # --- Expressions ---
+
+    def expression(self, level):
+        """
+        Parses an expression whose binary operators bind at least as tightly as 'level'.
+        """
+        self.nesting += 1
+        if self.nesting > MAX_NESTING:
+            raise Mismatch('nesting')
+        expression = self.binary(self.operand(), level)
+        self.nesting -= 1
+        return expression
+
+    def binary(self, left, level):
+        factory = self.factory
+        while True:
+            operator_level = BINARY_LEVELS.get(self.type)
+            if operator_level is None or operator_level < level:
+                return left
+            operator = self.token
+            self.advance()
+            right = self.expression(operator_level + 1)  # Every binary operator is left-associative
+            left = factory.BinaryExpression(operator.value, left, right)
+            factory.set_position(left, operator.lineno)
+
+    def operand(self):
+        """
+        Parses a primary expression or an assignment expression.
+        """
+        token = self.token
+        type = self.type
+        factory = self.factory
+        if type == 'ID':
+            self.advance()
+            if self.type == 'ASSIGN':
+                self.advance()
+                return factory.Assignment(token.value, self.expression(ASSIGN_LEVEL))
+            return self.identifier(token)
+        if type in LITERAL_TYPES:
+            self.advance()
+            node = factory.Literal(LITERAL_TYPES[type], token.value)
+            factory.set_position(node, token.lineno, token.lexpos)
+            return node
+        if type == 'LPAREN':
+            self.advance()
+            node = self.expression(0)
+            self.expect('RPAREN')
+            factory.set_position(node, token.lineno, token.lexpos)
+            return node
+        raise Mismatch('expression')
+
+    def identifier(self, token):
+        """
+        Parses what follows an identifier in an expression: a call, or nothing.
+        """
+        factory = self.factory
+        callee = factory.Identifier(token.value, symbol_id=token.symbol_id)
+        factory.set_position(callee, token.lineno, token.lexpos)
+        if self.type != 'LPAREN':
+            return callee
+        self.advance()
+        arguments = []
+        if self.type != 'RPAREN':
+            arguments.append(self.expression(0))
+            while self.type == 'COMMA':
+                self.advance()
+                arguments.append(self.expression(0))
+        self.expect('RPAREN')
+        return factory.CallExpression(callee, arguments)
+
+
+class DescentParser:
+    """
+    A drop-in replacement for the PLY parser object of parser.py.
+    """
+    def parse(self, input=None, lexer=None, tokenfunc=None, **kwargs):
+        """
+        Parses a program, with the same arguments and result as the PLY parser's parse().
+
+        Args:
+            input (str, optional): The source code; when None, the lexer's current input is parsed.
+            lexer (optional): The lexer. Defaults to the module-level lexer of lexer.py.
+            tokenfunc (callable, optional): The token source. Defaults to lexer.token.
+
+        Returns:
+            Program: The root of the AST, or None if the program could not be parsed.
+        """
+        lexer = lexer or default_lexer
+        if input is not None:
+            lexer.input(input)
+        state = DescentParse(tokenfunc or lexer.token, lexer)
+        try:
+            return state.program()
+        except Mismatch:
+            pass
+        return grammar.parser.parse(lexer=lexer, tokenfunc=state.replay())
+
+
+descent_parser = DescentParser()
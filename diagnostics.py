@@ -0,0 +1,83 @@
+# diagnostics.py
+import logging
+
+# --- Diagnostics ---
+#
+# Compiler messages (lexical warnings, syntax and semantic errors) are collected in
+# Diagnostics lists, which hold at most MAX_DIAGNOSTICS messages per compilation; messages
+# past the cap are neither formatted nor logged, so a malformed input costs no more than a
+# valid one. Collected messages are also logged at DEBUG level on the 'compiler' logger.
+# Importing the compiler does not configure that logger, so the records reach the handlers
+# of the application; the entry points install the rate-limited handler of logsetup.py.
+
+LOGGER_NAME = 'compiler'
+MAX_DIAGNOSTICS = 100  # Messages kept per list and compilation
+
+logger = logging.getLogger(LOGGER_NAME)
+
+
+class Diagnostics(list):
+    """
+    A list of diagnostic messages with a per-compilation cap. Once the cap is reached, a
+    single notice is added and every later message is dropped. Clear it between compilations.
+    """
+    # Class-level defaults, also used while unpickling (items are restored before attributes)
+    kind = 'messages'
+    limit = MAX_DIAGNOSTICS
+
+    def __init__(self, kind, limit=MAX_DIAGNOSTICS):
+        """
+        Initializes an empty list.
+
+        Args:
+            kind (str): What the list holds, e.g. 'syntax errors' (used in log records and the cap notice).
+            limit (int, optional): Maximum number of messages. Defaults to MAX_DIAGNOSTICS.
+        """
+        super().__init__()
+        self.kind = kind
+        self.limit = limit
+
+    @property
+    def full(self):
+        """
+        True once the cap is reached (callers can skip computing message arguments).
+        """
+        return len(self) >= self.limit
+
+    def report(self, message, *args):
+        """
+        Adds a message, formatting it with '%' and the given arguments only if it is kept.
+
+        Args:
+            message (str): The message (or format string).
+            *args: Format arguments.
+
+        Returns:
+            bool: True if the message was kept.
+        """
+        if len(self) >= self.limit:
+            self._overflow()
+            return False
+        if args:
+            message = message % args
+        super().append(message)
+        logger.debug("%s: %s", self.kind, message)
+        return True
+
+    def append(self, message):
+        """
+        Adds an already formatted message, subject to the cap.
+        """
+        self.report(message)
+
+    def extend(self, messages):
+        """
+        Adds already formatted messages, subject to the cap.
+        """
+        for message in messages:
+            self.report(message)
+
+    def _overflow(self):
+        if len(self) == self.limit:
+            super().append(f"Too many {self.kind}; only the first {self.limit} are reported")
+            logger.debug("%s: cap of %d reached", self.kind, self.limit)
@@ -0,0 +1,372 @@
+# flat_ast.py
+from array import array
+
+from lexer import InternTable
+from syntax_tree import Program, FunctionDefinition, Parameter, Block, Declaration, Assignment, ReturnStatement, \
+    IfStatement, ForStatement, WhileStatement, BinaryExpression, Identifier, Literal, EmptyStatement, CallExpression
+
+# --- Flat (struct-of-arrays) AST ---
+#
+# Every node is a row index into a set of parallel arrays instead of a Python object.
+# Children of a node are stored contiguously in a shared 'children' array, so a node only
+# needs the offset of its first child and the number of children. Optional children that
+# are absent (e.g., a missing else block) are stored as NO_NODE.
+#
+# Child layout per node kind:
+#   Program             declarations...
+#   FunctionDefinition  params..., body              (name = function name, label = return type)
+#   Parameter           -                            (name = parameter name, label = type)
+#   Block               statements...
+#   Declaration         initializer                  (name = variable name, label = type)
+#   Assignment          lvalue, rvalue               (lvalue is NO_NODE when it is a plain name)
+#   ReturnStatement     value
+#   IfStatement         condition, then, else
+#   ForStatement        init, condition, increment, body
+#   WhileStatement      condition, body
+#   BinaryExpression    left, right                  (label = operator)
+#   Identifier          -                            (name = identifier)
+#   Literal             -                            (label = type, value = constant index)
+#   EmptyStatement      -
+#   CallExpression      callee, arguments...
+
+NO_NODE = -1  # Marker for absent children and unset columns
+
+# Node kinds, in the order of their numeric codes.
+KINDS = (
+    'Program', 'FunctionDefinition', 'Parameter', 'Block', 'Declaration', 'Assignment',
+    'ReturnStatement', 'IfStatement', 'ForStatement', 'WhileStatement', 'BinaryExpression',
+    'Identifier', 'Literal', 'EmptyStatement', 'CallExpression',
+)
+KIND_CODES = {name: code for code, name in enumerate(KINDS)}
+
+
+class FlatAST:
+    """
+    Stores an AST as parallel columns. Nodes are referred to by their integer row index.
+    """
+    def __init__(self, names=None):
+        """
+        Initializes an empty flat AST.
+
+        Args:
+            names (InternTable, optional): The table used for names. Sharing the lexer's
+                intern table makes the 'name' column hold the tokens' symbol ids. Defaults to a new table.
+        """
+        self.kind = array('B')  # Node kind code (see KINDS).
+        self.lineno = array('i')  # Line number, or NO_NODE if unknown.
+        self.lexpos = array('i')  # Lexical position, or NO_NODE if unknown.
+        self.first = array('i')  # Offset of the first child in 'children'.
+        self.count = array('i')  # Number of children.
+        self.name = array('i')  # Symbol id of the node's name, or NO_NODE.
+        self.label = array('i')  # Symbol id of a type or operator, or NO_NODE.
+        self.value = array('i')  # Index into 'constants' for literals, or NO_NODE.
+        self.children = array('i')  # Child node ids, grouped per parent.
+        self.names = names if names is not None else InternTable()  # Interned identifiers, type names and operators.
+        self.constants = []  # Literal values.
+        self.root = NO_NODE  # Id of the Program node.
+
+    def __len__(self):
+        return len(self.kind)
+
+    def add(self, kind, children=(), name=NO_NODE, label=NO_NODE, value=NO_NODE):
+        """
+        Appends a node row.
+
+        Args:
+            kind (str): The node kind (one of KINDS).
+            children (iterable): Child node ids (NO_NODE for absent optional children).
+            name (int): Symbol id of the node's name.
+            label (int): Symbol id of the node's type or operator.
+            value (int): Index of the node's literal value in 'constants'.
+
+        Returns:
+            int: The id of the new node.
+        """
+        node = len(self.kind)
+        self.kind.append(KIND_CODES[kind])
+        self.lineno.append(NO_NODE)
+        self.lexpos.append(NO_NODE)
+        self.first.append(len(self.children))
+        self.children.extend(children)
+        self.count.append(len(self.children) - self.first[node])
+        self.name.append(name)
+        self.label.append(label)
+        self.value.append(value)
+        return node
+
+    def kind_of(self, node):
+        """
+        Returns the kind name of a node.
+        """
+        return KINDS[self.kind[node]]
+
+    def child(self, node, index):
+        """
+        Returns the id of the index-th child of a node (NO_NODE if absent).
+        """
+        return self.children[self.first[node] + index]
+
+    def child_ids(self, node):
+        """
+        Returns the ids of all children of a node, including NO_NODE placeholders.
+        """
+        start = self.first[node]
+        return self.children[start:start + self.count[node]]
+
+    def walk(self, node=None):
+        """
+        Iterates over the ids of a subtree in pre-order without recursion.
+
+        Args:
+            node (int, optional): The subtree root. Defaults to the Program node.
+
+        Yields:
+            int: Node ids.
+        """
+        stack = [self.root if node is None else node]
+        children = self.children
+        first = self.first
+        count = self.count
+        while stack:
+            current = stack.pop()
+            if current == NO_NODE:
+                continue
+            yield current
+            start = first[current]
+            stack.extend(reversed(children[start:start + count[current]]))
+
+    def view(self, node=None):
+        """
+        Returns an object view of a node. Views are instances of the syntax_tree classes,
+        so passes written for the object AST (e.g., semantic_analyzer) run unchanged.
+
+        Args:
+            node (int, optional): The node id. Defaults to the Program node.
+
+        Returns:
+            Node or None: The view, or None for NO_NODE.
+        """
+        if node is None:
+            node = self.root
+        if node == NO_NODE:
+            return None
+        return _VIEW_CLASSES[self.kind[node]](self, node)
+
+
+class FlatASTBuilder:
+    """
+    Node factory for the parser that appends rows to a FlatAST instead of creating objects.
+    Install it with parser.set_node_factory(); every method returns a node id.
+    """
+    def __init__(self, ast=None):
+        """
+        Initializes the builder.
+
+        Args:
+            ast (FlatAST, optional): The flat AST to append to. Defaults to a new one.
+        """
+        self.ast = ast if ast is not None else FlatAST()
+
+    def _opt(self, node):
+        return NO_NODE if node is None else node
+
+    def Program(self, declarations, symbols=None):
+        self.ast.root = self.ast.add('Program', declarations)
+        return self.ast.root
+
+    def FunctionDefinition(self, return_type, name, params, body, symbol_id=None):
+        names = self.ast.names
+        return self.ast.add('FunctionDefinition', list(params) + [body], names.intern(name), names.intern(return_type))
+
+    def Parameter(self, param_type, name, symbol_id=None):
+        names = self.ast.names
+        return self.ast.add('Parameter', (), names.intern(name), names.intern(param_type))
+
+    def Block(self, statements):
+        return self.ast.add('Block', statements or ())
+
+    def Declaration(self, data_type, name, initializer, symbol_id=None):
+        names = self.ast.names
+        return self.ast.add('Declaration', (self._opt(initializer),), names.intern(name), names.intern(data_type))
+
+    def Assignment(self, lvalue, rvalue):
+        if isinstance(lvalue, str):
+            # Assignment expressions carry the target as a plain name rather than an Identifier node.
+            return self.ast.add('Assignment', (NO_NODE, rvalue), self.ast.names.intern(lvalue))
+        return self.ast.add('Assignment', (lvalue, rvalue))
+
+    def ReturnStatement(self, value):
+        return self.ast.add('ReturnStatement', (self._opt(value),))
+
+    def IfStatement(self, condition, then_block, else_block):
+        return self.ast.add('IfStatement', (condition, then_block, self._opt(else_block)))
+
+    def ForStatement(self, init, condition, increment, body):
+        return self.ast.add('ForStatement', (self._opt(init), self._opt(condition), self._opt(increment), body))
+
+    def WhileStatement(self, condition, body):
+        return self.ast.add('WhileStatement', (condition, body))
+
+    def BinaryExpression(self, op, left, right):
+        return self.ast.add('BinaryExpression', (left, right), label=self.ast.names.intern(op))
+
+    def Identifier(self, name, lineno=None, lexpos=None, symbol_id=None):
+        node = self.ast.add('Identifier', (), self.ast.names.intern(name))
+        if lineno is not None:
+            self.set_position(node, lineno, lexpos)
+        return node
+
+    def Literal(self, type, value, lineno=None, lexpos=None):
+        self.ast.constants.append(value)
+        node = self.ast.add('Literal', (), label=self.ast.names.intern(type), value=len(self.ast.constants) - 1)
+        if lineno is not None:
+            self.set_position(node, lineno, lexpos)
+        return node
+
+    def EmptyStatement(self):
+        return self.ast.add('EmptyStatement')
+
+    def CallExpression(self, callee, arguments):
+        return self.ast.add('CallExpression', [callee] + list(arguments))
+
+    def set_position(self, node, lineno, lexpos=None):
+        self.ast.lineno[node] = lineno
+        if lexpos is not None:
+            self.ast.lexpos[node] = lexpos
+
+
+class FlatVisitor:
+    """
+    Base class for passes over a FlatAST. visit() dispatches to a 'visit_<Kind>' method
+    (e.g., visit_BinaryExpression) with the node id, falling back to generic_visit().
+    """
+    def __init__(self, ast):
+        """
+        Initializes the visitor.
+
+        Args:
+            ast (FlatAST): The flat AST to traverse.
+        """
+        self.ast = ast
+        self._methods = [getattr(self, 'visit_' + kind, self.generic_visit) for kind in KINDS]
+
+    def visit(self, node):
+        """
+        Visits a node (ignoring NO_NODE).
+        """
+        if node == NO_NODE:
+            return None
+        return self._methods[self.ast.kind[node]](node)
+
+    def generic_visit(self, node):
+        """
+        Visits every child of a node.
+        """
+        for child in self.ast.child_ids(node):
+            self.visit(child)
+
+
+def parse_flat(code, lexer=None):
+    """
+    Parses source code straight into a FlatAST, without building the object AST.
+
+    Args:
+        code (str): The source code.
+        lexer: The lexer to use. Defaults to the module-level lexer from lexer.py.
+
+    Returns:
+        FlatAST: The flat AST (its root is NO_NODE if parsing failed).
+    """
+    import parser as parser_module
+    lexer = lexer or parser_module.lexer
+    builder = FlatASTBuilder(FlatAST(lexer.intern_table))
+    previous = parser_module.set_node_factory(builder)
+    try:
+        parser_module.parser.parse(code, lexer=lexer)
+    finally:
+        parser_module.set_node_factory(previous)
+    return builder.ast
+
+
+# --- Object views ---
+#
+# Views subclass the syntax_tree classes and expose the same attributes as properties that
+# read from the columns, so isinstance-based passes work on both representations.
+
+def _position(column):
+    def getter(self):
+        value = getattr(self._ast, column)[self._node]
+        return None if value == NO_NODE else value
+    return property(getter)
+
+def _name_property():
+    return property(lambda self: self._ast.names[self._ast.name[self._node]])
+
+def _symbol_id_property():
+    return property(lambda self: self._ast.name[self._node])
+
+def _label_property():
+    return property(lambda self: self._ast.names[self._ast.label[self._node]])
+
+def _child_property(index):
+    return property(lambda self: self._ast.view(self._ast.child(self._node, index)))
+
+def _children_property(start=0, stop_from_end=0, none_if_empty=False):
+    def getter(self):
+        ids = self._ast.child_ids(self._node)
+        ids = ids[start:len(ids) - stop_from_end]
+        if none_if_empty and not ids:
+            return None
+        return [self._ast.view(child) for child in ids]
+    return property(getter)
+
+def _assignment_lvalue(self):
+    target = self._ast.child(self._node, 0)
+    if target == NO_NODE:
+        return self._ast.names[self._ast.name[self._node]]
+    return self._ast.view(target)
+
+
+class _FlatNodeView:
+    """
+    Mixin holding the reference to the flat AST row.
+    """
+    lineno = _position('lineno')
+    lexpos = _position('lexpos')
+
+    def __init__(self, ast, node):
+        self._ast = ast
+        self._node = node
+
+    def __eq__(self, other):
+        return isinstance(other, _FlatNodeView) and other._ast is self._ast and other._node == self._node
+
+    def __hash__(self):
+        return hash((id(self._ast), self._node))
+
+
+def _make_view(base, **fields):
+    return type('Flat' + base.__name__, (_FlatNodeView, base), fields)
+
+
+_VIEW_CLASSES = [
+    _make_view(Program, declarations=_children_property(), symbols=property(lambda self: self._ast.names)),
+    _make_view(FunctionDefinition, name=_name_property(), symbol_id=_symbol_id_property(), return_type=_label_property(),
+               params=_children_property(stop_from_end=1),
+               body=property(lambda self: self._ast.view(self._ast.child_ids(self._node)[-1]))),
+    _make_view(Parameter, name=_name_property(), symbol_id=_symbol_id_property(), param_type=_label_property()),
+    _make_view(Block, statements=_children_property(none_if_empty=True)),
+    _make_view(Declaration, name=_name_property(), symbol_id=_symbol_id_property(), data_type=_label_property(),
+               initializer=_child_property(0)),
+    _make_view(Assignment, lvalue=property(_assignment_lvalue), rvalue=_child_property(1)),
+    _make_view(ReturnStatement, value=_child_property(0)),
+    _make_view(IfStatement, condition=_child_property(0), then_block=_child_property(1), else_block=_child_property(2)),
+    _make_view(ForStatement, init=_child_property(0), condition=_child_property(1), increment=_child_property(2),
+               body=_child_property(3)),
+    _make_view(WhileStatement, condition=_child_property(0), body=_child_property(1)),
+    _make_view(BinaryExpression, op=_label_property(), left=_child_property(0), right=_child_property(1)),
+    _make_view(Identifier, name=_name_property(), symbol_id=_symbol_id_property()),
+    _make_view(Literal, type=_label_property(), value=property(lambda self: self._ast.constants[self._ast.value[self._node]])),
+    _make_view(EmptyStatement),
+    _make_view(CallExpression, callee=_child_property(0), arguments=_children_property(start=1)),
+]
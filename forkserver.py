@@ -0,0 +1,207 @@
+# forkserver.py
+import gc
+import os
+import signal
+import socket
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from multiprocessing.connection import Connection
+
+# --- Fork Server ---
+#
+# ForkServerExecutor runs functions in worker processes forked from a warm template process
+# (the fork server) instead of starting fresh interpreters:
+#   - the fork server is forked from the calling process before any of the executor's
+#     threads exist, imports the preload modules, runs the warm-up function (building the
+#     PLY lexer and parser tables, the node factory, ...), then calls gc.freeze() so the
+#     warm objects are never touched by the collector again and stay shared copy-on-write;
+#   - a worker is forked from it whenever a call finds no idle worker (up to max_workers),
+#     which takes milliseconds since nothing is imported or built;
+#   - a worker exits after max_requests calls (bounding the memory a long-lived process can
+#     accumulate) and the next call forks a fresh one.
+# The fork server is single-threaded, so forking it is safe even when the caller runs an
+# event loop and threads. Each worker talks to the caller over its own socket pair, whose
+# end is passed back through the fork server's control socket (SCM_RIGHTS).
+
+DEFAULT_MAX_REQUESTS = 500
+FORK = b'F'  # Control message: fork a worker
+
+
+class WorkerCrashed(RuntimeError):
+    """
+    Raised when a worker process exits before returning the result of a call.
+    """
+
+
+# --- Processes ---
+
+def _fork_server_loop(control, preload, warm_up):
+    """
+    Runs in the fork server: warms up, then forks a worker for each FORK message until the
+    control socket is closed.
+    """
+    signal.set_wakeup_fd(-1)  # Inherited from the caller's event loop, if any
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C is handled by the caller, which shuts us down
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)  # Exited workers are reaped automatically
+    for module in preload:
+        __import__(module)
+    if warm_up is not None:
+        warm_up()
+    gc.collect()
+    gc.freeze()  # Everything built so far is shared with the workers and never scanned again
+    while True:
+        try:
+            message = control.recv(1)
+        except InterruptedError:
+            continue
+        if message != FORK:
+            return  # The caller closed the executor (or exited)
+        ours, theirs = socket.socketpair()
+        pid = os.fork()
+        if pid == 0:
+            control.close()
+            ours.close()
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)  # Workers wait for their own children (see cgen.run_binary)
+            _worker_loop(Connection(theirs.detach()))
+            os._exit(0)
+        theirs.close()
+        socket.send_fds(control, [pid.to_bytes(4, 'little')], [ours.fileno()])
+        ours.close()
+
+
+def _worker_loop(connection):
+    """
+    Runs in a worker: executes the calls it receives, exiting after max_requests of them
+    (sent with each call) or when the connection is closed.
+    """
+    handled = 0
+    while True:
+        try:
+            function, args, max_requests = connection.recv()
+        except (EOFError, OSError):
+            return
+        handled += 1
+        retiring = bool(max_requests) and handled >= max_requests
+        try:
+            reply = (True, function(*args), retiring)
+        except BaseException as error:
+            reply = (False, error, retiring)
+        try:
+            connection.send(reply)
+        except Exception as error:  # The result (or exception) cannot be pickled
+            connection.send((False, RuntimeError(f"Unpicklable result: {error}"), retiring))
+        if retiring:
+            return
+
+
+class Worker:
+    """
+    The caller's handle on a worker process.
+    """
+    def __init__(self, pid, connection):
+        self.pid = pid
+        self.connection = connection
+
+    def close(self):
+        self.connection.close()
+
+
+# --- Executor ---
+
+class ForkServerExecutor(Executor):
+    """
+    An executor whose workers are forked from a pre-warmed fork server (see the notes above).
+    Functions and arguments must be picklable, as with ProcessPoolExecutor.
+    """
+    def __init__(self, max_workers=None, max_requests=DEFAULT_MAX_REQUESTS, preload=(), warm_up=None):
+        """
+        Starts the fork server.
+
+        Args:
+            max_workers (int, optional): Maximum number of workers. Defaults to the CPU count.
+            max_requests (int, optional): Calls a worker handles before it is replaced (None
+                or 0 keeps workers forever). Defaults to DEFAULT_MAX_REQUESTS.
+            preload (iterable of str, optional): Modules the fork server imports.
+            warm_up (callable, optional): Called in the fork server after the imports.
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_requests = max_requests
+        self.workers_started = 0
+        self.workers_recycled = 0
+        self._idle = []  # Workers waiting for a call
+        self._lock = threading.Lock()
+        self._control, theirs = socket.socketpair()
+        self._server_pid = os.fork()
+        if self._server_pid == 0:
+            self._control.close()
+            try:
+                _fork_server_loop(theirs, tuple(preload), warm_up)
+            finally:
+                os._exit(0)
+        theirs.close()
+        # One thread per worker waits for its result; created after the fork server.
+        self._threads = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='fork-worker')
+
+    def submit(self, fn, /, *args, **kwargs):
+        """
+        Runs fn(*args) in a worker.
+
+        Returns:
+            Future: The result of the call, or its exception (WorkerCrashed if the worker died).
+        """
+        if kwargs:
+            raise TypeError("ForkServerExecutor does not pass keyword arguments")
+        return self._threads.submit(self._call, fn, args)
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        """
+        Stops the workers and the fork server once the submitted calls are done.
+        """
+        if self._threads is None:
+            return
+        self._threads.shutdown(wait=wait, cancel_futures=cancel_futures)
+        self._threads = None
+        with self._lock:
+            for worker in self._idle:
+                worker.close()  # The worker exits on end of file
+            self._idle.clear()
+        self._control.close()
+        try:
+            os.waitpid(self._server_pid, 0)
+        except ChildProcessError:
+            pass
+
+    def _call(self, fn, args):
+        worker = self._acquire()
+        try:
+            worker.connection.send((fn, args, self.max_requests))
+            ok, value, retiring = worker.connection.recv()
+        except (EOFError, OSError) as error:
+            worker.close()
+            raise WorkerCrashed(f"Worker {worker.pid} exited during a call") from error
+        if retiring:
+            worker.close()
+            with self._lock:
+                self.workers_recycled += 1
+        else:
+            with self._lock:
+                self._idle.append(worker)
+        if not ok:
+            raise value
+        return value
+
+    def _acquire(self):
+        """
+        Returns an idle worker, forking one if there is none. At most max_workers calls run
+        at once (one per thread), so there are never more than max_workers workers.
+        """
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+            # Fork requests are serialized: one control message, one file descriptor back.
+            self._control.sendall(FORK)
+            message, fds, _, _ = socket.recv_fds(self._control, 4, 1)
+            if not fds:
+                raise WorkerCrashed("The fork server exited")
+            self.workers_started += 1
+            return Worker(int.from_bytes(message, 'little'), Connection(fds[0]))
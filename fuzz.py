@@ -0,0 +1,503 @@
+# fuzz.py
+"""
+Grammar-aware differential fuzzer.
+
+Generates valid programs from the grammar of parser.py (and near-valid ones by mutating
+them), runs each through the reference pipeline (lexer.py, the PLY parser and semantic.py)
+and through alternative engines (the other parser backends, the streaming and incremental
+lexers, the parallel semantic analysis, and the analysis of the flat and hash-consed ASTs),
+and reports every difference in tokens, AST or diagnostics with a minimized reproducer. Batches run across a process pool.
+
+Usage:
+    python fuzz.py [--count N] [--seed S] [--workers N] [--engines a,b] [--output FILE]
+"""
+import argparse
+import json
+import math
+import os
+import random
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import lexer as lexer_module
+import parser as grammar
+from lexer import lexer, reset_lexer, lexical_errors, lexical_warnings
+from parser import get_parser, syntax_errors
+from semantic import semantic_analyzer
+from syntax_tree import to_dict
+
+# --- Program Generation ---
+#
+# Programs are random derivations of the grammar, read from the productions PLY built for
+# parser.py (so new rules are fuzzed without changes here). Longer alternatives are chosen
+# more often, and past MAX_DEPTH each nonterminal takes one of its shortest productions so
+# derivations stay small. Identifiers come from a
+# small pool so that uses often meet declarations and the semantic checks get exercised.
+# A nonterminal sometimes repeats one of its earlier derivations in the program, so that
+# identical subtrees (and identical errors) occur on several lines.
+# Near-valid programs are valid ones with a few token or character mutations.
+
+MAX_DEPTH = 12
+REPEAT_PROBABILITY = 0.15  # Chance that a nonterminal repeats an earlier derivation
+NAMES = ('a', 'b', 'c', 'x', 'f', 'main')
+TYPES = ('int', 'float', 'double', 'char', 'bool', 'void')
+NOISE = ('/*', '*/', '//', "'", '\n', '@', '.', 'e', '\\', '0x')  # Inserted by character mutations
+BATCH_SIZE = 200  # Programs per pool task
+
+
+def terminal_texts():
+    """
+    Returns the source text(s) of each token type that has fixed spellings.
+    """
+    texts = {}
+    for name in lexer_module.tokens:
+        pattern = getattr(lexer_module, 't_' + name, None)
+        if isinstance(pattern, str):
+            texts[name] = (re.sub(r'\\(.)', r'\1', pattern),)  # e.g. r'\+' -> '+'
+    for keyword, name in lexer_module.keywords.items():
+        texts[name] = texts.get(name, ()) + (keyword,)
+    return texts
+
+
+TERMINAL_TEXTS = terminal_texts()
+
+# Spellings of the tokens whose rules are functions
+LITERALS = {
+    'ID': lambda rng: rng.choice(NAMES),
+    'INT_NUM': lambda rng: str(rng.choice((0, 1, 2, 7, 42, 2147483647, rng.randint(0, 99999)))),
+    'FLOAT_NUM': lambda rng: rng.choice(('1.5f', '0.0f', '.5F', '2e3f', '1.f')),
+    'DOUBLE_NUM': lambda rng: rng.choice(('1.5', '0.0', '.25', '1e10', '3.', '2.5e-3')),
+    'CHAR_LIT': lambda rng: rng.choice(("'a'", "'0'", "'\\n'", "'\\''", "' '")),
+    'BOOL_LIT': lambda rng: rng.choice(('true', 'false')),
+}
+
+
+class Grammar:
+    """
+    The productions of parser.py as {nonterminal: [right-hand sides]}, with the height of
+    the shortest derivation of each symbol.
+    """
+    def __init__(self, lr_parser=None):
+        productions = (lr_parser or grammar.parser).productions
+        self.start = productions[0].str.split('->')[1].split()[0]  # S' -> program
+        self.rules = {}
+        for production in productions[1:]:
+            symbols = [symbol for symbol in production.str.split('->', 1)[1].split() if symbol != '<empty>']
+            self.rules.setdefault(production.name, []).append(symbols)
+        # Height of the shortest derivation of each nonterminal (terminals are 0).
+        self.height = {}
+        changed = True
+        while changed:
+            changed = False
+            for name, alternatives in self.rules.items():
+                for symbols in alternatives:
+                    heights = [self.height.get(symbol, 0 if symbol not in self.rules else None) for symbol in symbols]
+                    if None in heights:
+                        continue
+                    height = 1 + max(heights, default=0)
+                    if height < self.height.get(name, math.inf):
+                        self.height[name] = height
+                        changed = True
+
+    def shortest(self, name):
+        """
+        Returns the right-hand sides of a nonterminal with the shortest derivations.
+        """
+        alternatives = self.rules[name]
+        best = min(1 + max((self.height.get(symbol, 0) for symbol in symbols), default=0) for symbols in alternatives)
+        return [symbols for symbols in alternatives
+                if 1 + max((self.height.get(symbol, 0) for symbol in symbols), default=0) == best]
+
+    def derive(self, rng, name=None, depth=0, out=None, earlier=None):
+        """
+        Appends a random derivation of a symbol to a list of (token type, text) pairs.
+        """
+        out = [] if out is None else out
+        earlier = {} if earlier is None else earlier  # Nonterminal -> its derivations so far
+        name = name or self.start
+        if name not in self.rules:
+            out.append((name, spell(name, rng)))
+            return out
+        if earlier.get(name) and rng.random() < REPEAT_PROBABILITY:
+            out.extend(rng.choice(earlier[name]))
+            return out
+        start = len(out)
+        alternatives = self.rules[name] if depth < MAX_DEPTH else self.shortest(name)
+        # Longer alternatives are likelier, so lists and nested statements actually grow.
+        for symbol in rng.choices(alternatives, [1 + len(symbols) for symbols in alternatives])[0]:
+            self.derive(rng, symbol, depth + 1, out, earlier)
+        earlier.setdefault(name, []).append(out[start:])
+        return out
+
+
+def spell(token_type, rng):
+    """
+    Returns a random spelling of a token type.
+    """
+    if token_type in LITERALS:
+        return LITERALS[token_type](rng)
+    if token_type == 'TYPE':
+        return rng.choice(TYPES)
+    return rng.choice(TERMINAL_TEXTS[token_type])
+
+
+def join_tokens(texts, rng):
+    """
+    Joins token texts with random (but always separating) whitespace.
+    """
+    pieces = []
+    for text in texts:
+        pieces.append(text)
+        pieces.append(rng.choice((' ', ' ', ' ', '\n', '\t', '  ')))
+    return ''.join(pieces)
+
+
+def generate_program(rng, syntax, near_valid=False):
+    """
+    Generates a program from the grammar.
+
+    Args:
+        rng (random.Random): The random source.
+        syntax (Grammar): The grammar.
+        near_valid (bool, optional): Whether to mutate the program. Defaults to False.
+
+    Returns:
+        str: The source code.
+    """
+    tokens = syntax.derive(rng)
+    if not near_valid:
+        return join_tokens([text for _, text in tokens], rng)
+    texts = [text for _, text in tokens]
+    terminals = sorted(TERMINAL_TEXTS) + sorted(LITERALS)
+    for _ in range(rng.randint(1, 3)):
+        index = rng.randrange(len(texts))
+        mutation = rng.randrange(4)
+        if mutation == 0 and len(texts) > 1:
+            del texts[index]
+        elif mutation == 1:
+            texts.insert(index, texts[index])
+        elif mutation == 2:
+            texts.insert(index, spell(rng.choice(terminals), rng))
+        else:
+            texts[index] = texts[index] + rng.choice(NOISE)  # Glued to a token
+    return join_tokens(texts, rng)
+
+
+# --- Engines ---
+#
+# An engine maps a source to an observation: a dict with some of 'tokens' (type, value, line,
+# position), 'ast' (syntax_tree.to_dict) and 'errors' (lexical warnings and errors, syntax
+# errors, then semantic errors). Only the fields an engine returns are compared with the
+# reference. Exceptions are observations too ('crash').
+
+def _start(code):
+    reset_lexer(lexer)
+    syntax_errors.clear()
+    lexer.input(code)
+
+
+def _token_key(token):
+    return token.type, token.value, token.lineno, token.lexpos
+
+
+def _analyze(ast):
+    try:
+        return list(semantic_analyzer(ast))
+    except Exception as error:  # e.g. an unrecoverable SemanticError
+        return [f"{type(error).__name__}: {error}"]
+
+
+def observe_reference(code):
+    """
+    Runs the reference pipeline: lexer.py, the PLY parser and semantic.py.
+    """
+    _start(code)
+    tokens = [_token_key(token) for token in iter(lexer.token, None)]
+    observation = parse_with('ply', code)
+    observation['tokens'] = tokens
+    return observation
+
+
+def parse_with(backend, code):
+    """
+    Parses (and analyzes) a source with a parser backend.
+    """
+    _start(code)
+    ast = get_parser(backend).parse(lexer=lexer)
+    errors = list(lexical_warnings) + list(lexical_errors) + list(syntax_errors)
+    if ast is not None and not lexical_errors and not syntax_errors:
+        errors += _analyze(ast)
+    return {'ast': to_dict(ast) if ast is not None else None, 'errors': errors}
+
+
+def observe_analysis(code, build, analyze=_analyze):
+    """
+    Parses a source into another representation (or analyzes it another way) and returns the
+    diagnostics, to be compared with those of the reference.
+
+    Args:
+        code (str): The source code.
+        build (callable): Returns the tree to analyze for the source (None if parsing failed).
+        analyze (callable, optional): Returns the semantic errors of a tree. Defaults to the
+            sequential analysis.
+    """
+    _start(code)
+    tree = build(code)
+    errors = list(lexical_warnings) + list(lexical_errors) + list(syntax_errors)
+    if tree is not None and not lexical_errors and not syntax_errors:
+        errors += analyze(tree)
+    return {'errors': errors}
+
+
+def _build_flat(code):
+    from flat_ast import parse_flat
+    return parse_flat(code, lexer=lexer).view()
+
+
+def _build_hash_consed(code):
+    from hashcons import parse_hash_consed
+    return parse_hash_consed(code, lexer=lexer)[0]
+
+
+def _analyze_in_parallel(ast):
+    # Checks the function bodies in forked workers whatever the size of the program. Where
+    # forking is unavailable or unsafe (see semantic.parallel_available) this is the
+    # sequential analysis.
+    import semantic
+    from diagnostics import Diagnostics
+    if not semantic.parallel_available():
+        return _analyze(ast)
+    errors = Diagnostics('semantic errors')
+    try:
+        semantic.analyze_in_parallel(ast, errors, PARALLEL_WORKERS)
+    except Exception as error:  # Raised in source order, as by the sequential analysis
+        return [f"{type(error).__name__}: {error}"]
+    return list(errors)
+
+
+def observe_stream(code):
+    """
+    Lexes the source in small chunks with stream_lexer.StreamLexer.
+    """
+    from stream_lexer import StreamLexer
+    lexical_warnings.clear()
+    stream = StreamLexer(code, chunk_size=7)
+    return {'tokens': [_token_key(token) for token in stream.tokens()]}
+
+
+def observe_incremental(code):
+    """
+    Lexes the source with incremental_lexer.IncrementalLexer, as the result of an edit that
+    inserts its middle third into the rest.
+    """
+    from incremental_lexer import IncrementalLexer
+    lexical_warnings.clear()
+    third = len(code) // 3
+    buffer = IncrementalLexer(code[:third] + code[2 * third:])
+    buffer.edit(third, 0, code[third:2 * third])
+    return {'tokens': [_token_key(token) for token in buffer.tokens]}
+
+
+PARALLEL_WORKERS = 2
+
+ENGINES = {
+    'descent': lambda code: parse_with('descent', code),
+    'tables': lambda code: parse_with('tables', code),
+    'stream': observe_stream,
+    'incremental': observe_incremental,
+    'parallel': lambda code: observe_analysis(code, lambda source: get_parser('ply').parse(lexer=lexer),
+                                              _analyze_in_parallel),
+    'flat': lambda code: observe_analysis(code, _build_flat),
+    'hashcons': lambda code: observe_analysis(code, _build_hash_consed),
+}
+
+
+def run_engine(engine, code):
+    try:
+        return engine(code)
+    except Exception as error:
+        return {'crash': f"{type(error).__name__}: {error}"}
+
+
+def differences(code, engines):
+    """
+    Compares the engines with the reference on one source.
+
+    Args:
+        code (str): The source code.
+        engines (dict): Maps engine names to engine functions.
+
+    Returns:
+        list: (engine name, field, expected, actual) for each differing field.
+    """
+    expected = run_engine(observe_reference, code)
+    found = []
+    for name, engine in engines.items():
+        actual = run_engine(engine, code)
+        for field in sorted(set(actual) | ({'crash'} & set(expected))):
+            if actual.get(field) != expected.get(field):
+                found.append((name, field, expected.get(field), actual.get(field)))
+    return found
+
+
+# --- Minimization ---
+
+def split_units(code, unit):
+    """
+    Splits a source into lines, tokens (each with the text up to the next token) or characters.
+    """
+    if unit == 'line':
+        return code.splitlines(keepends=True)
+    if unit == 'char':
+        return list(code)
+    _start(code)
+    starts = [token.lexpos for token in iter(lexer.token, None)]
+    bounds = [0] + [start for start in starts if start > 0] + [len(code)]
+    return [code[begin:end] for begin, end in zip(bounds, bounds[1:]) if end > begin]
+
+
+def minimize(code, still_fails, max_tests=5000):
+    """
+    Shrinks a failing source with delta debugging over lines, then tokens, then characters.
+
+    Args:
+        code (str): A source for which still_fails(code) is true.
+        still_fails (callable): Returns True if a candidate source still shows the failure.
+        max_tests (int, optional): Maximum number of candidates tried. Defaults to 5000.
+
+    Returns:
+        str: A smaller source that still fails.
+    """
+    tests = 0
+    for unit in ('line', 'token', 'char'):
+        chunks = split_units(code, unit)
+        granularity = 2
+        while len(chunks) >= 2 and tests < max_tests:
+            size = math.ceil(len(chunks) / granularity)
+            for start in range(0, len(chunks), size):
+                candidate = chunks[:start] + chunks[start + size:]
+                tests += 1
+                if still_fails(''.join(candidate)):
+                    chunks = candidate
+                    granularity = max(granularity - 1, 2)
+                    break
+            else:
+                if granularity >= len(chunks):
+                    break
+                granularity = min(len(chunks), granularity * 2)
+        code = ''.join(chunks)
+    return code
+
+
+# --- Campaigns ---
+
+def fuzz_batch(seed, count, engine_names=None, near_valid_ratio=0.5, minimize_reports=True):
+    """
+    Fuzzes a batch of programs (runs in a worker process).
+
+    Args:
+        seed (int): The seed of the batch (the batch is reproducible from it).
+        count (int): The number of programs.
+        engine_names (list, optional): Names from ENGINES. Defaults to all of them.
+        near_valid_ratio (float, optional): Fraction of mutated programs. Defaults to 0.5.
+        minimize_reports (bool, optional): Whether to minimize reproducers. Defaults to True.
+
+    Returns:
+        list: One report dict per mismatch: engine, field, seed, index, source, minimized,
+        expected and actual.
+    """
+    engines = {name: ENGINES[name] for name in (engine_names or ENGINES)}
+    rng = random.Random(seed)
+    syntax = Grammar()
+    reports = []
+    for index in range(count):
+        code = generate_program(rng, syntax, near_valid=rng.random() < near_valid_ratio)
+        for name, field, expected, actual in differences(code, engines):
+            engine = {name: engines[name]}
+            minimized = code
+            if minimize_reports:
+                minimized = minimize(code, lambda candidate: any(
+                    found[1] == field for found in differences(candidate, engine)))
+            reports.append({'engine': name, 'field': field, 'seed': seed, 'index': index, 'source': code,
+                            'minimized': minimized, 'expected': expected, 'actual': actual})
+    return reports
+
+
+def run_campaign(count, seed=0, workers=None, engine_names=None, batch_size=BATCH_SIZE, progress=None):
+    """
+    Fuzzes 'count' programs in batches across a process pool.
+
+    Args:
+        count (int): The number of programs.
+        seed (int, optional): The base seed; batch i uses seed + i. Defaults to 0.
+        workers (int, optional): Worker processes; None or 1 runs in this process. Defaults to None.
+        engine_names (list, optional): Names from ENGINES. Defaults to all of them.
+        batch_size (int, optional): Programs per batch. Defaults to BATCH_SIZE.
+        progress (callable, optional): Called with (programs done, reports so far) after each batch.
+
+    Returns:
+        list: The reports, with duplicate (engine, field, minimized source) reports removed.
+    """
+    batches = [(seed + index, min(batch_size, count - start))
+               for index, start in enumerate(range(0, count, batch_size))]
+    reports, seen, done = [], set(), 0
+
+    def collect(batch_count, batch_reports):
+        nonlocal done
+        done += batch_count
+        for report in batch_reports:
+            key = (report['engine'], report['field'], report['minimized'])
+            if key not in seen:
+                seen.add(key)
+                reports.append(report)
+        if progress is not None:
+            progress(done, reports)
+
+    if workers is None or workers <= 1:
+        for batch_seed, batch_count in batches:
+            collect(batch_count, fuzz_batch(batch_seed, batch_count, engine_names))
+    else:
+        with ProcessPoolExecutor(workers) as executor:
+            futures = [(batch_count, executor.submit(fuzz_batch, batch_seed, batch_count, engine_names))
+                       for batch_seed, batch_count in batches]
+            for batch_count, future in futures:
+                collect(batch_count, future.result())
+    return reports
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description="Differential fuzzer for the compiler engines.")
+    argument_parser.add_argument('--count', type=int, default=10000, help="Programs to generate.")
+    argument_parser.add_argument('--seed', type=int, default=0)
+    argument_parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count).")
+    argument_parser.add_argument('--engines', default=','.join(ENGINES), help="Comma-separated engines to compare.")
+    argument_parser.add_argument('--output', default=None, help="Write the reports to this file as JSON lines.")
+    args = argument_parser.parse_args()
+    engine_names = [name for name in args.engines.split(',') if name]
+    unknown = [name for name in engine_names if name not in ENGINES]
+    if unknown:
+        argument_parser.error(f"unknown engines: {', '.join(unknown)} (choose from {', '.join(ENGINES)})")
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+    start = time.perf_counter()
+
+    def progress(done, reports):
+        rate = done / max(time.perf_counter() - start, 1e-9)
+        print(f"\r{done}/{args.count} programs, {len(reports)} mismatches, {rate:.0f} programs/s",
+              end='', file=sys.stderr, flush=True)
+
+    reports = run_campaign(args.count, args.seed, args.workers or os.cpu_count(), engine_names, progress=progress)
+    print(file=sys.stderr)
+    for report in reports:
+        print(f"{report['engine']}: {report['field']} differs (seed {report['seed']}, program {report['index']})")
+        print(f"    reproducer: {report['minimized']!r}")
+    if args.output:
+        with open(args.output, 'w') as file:
+            for report in reports:
+                file.write(json.dumps(report, default=repr) + '\n')
+    sys.exit(1 if reports else 0)
+
+
+if __name__ == '__main__':
+    main()
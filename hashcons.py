@@ -0,0 +1,324 @@
+# hashcons.py
+import hashlib
+from array import array
+import parser as parser_module
+from parser import NodeFactory
+from syntax_tree import Node, Program, FunctionDefinition, Parameter, Block, Declaration, Assignment, \
+    ReturnStatement, IfStatement, ForStatement, WhileStatement, BinaryExpression, Identifier, Literal, \
+    EmptyStatement, CallExpression
+
+# --- Hash-Consed AST ---
+#
+# HashConsFactory is a node factory for the grammar actions (see parser.NodeFactory) that
+# returns one shared node for all structurally identical expressions and simple statements
+# (identifiers, literals, binary expressions, calls, assignments, returns, declarations,
+# parameters and empty statements): the repeated 'x < 10' and 'f(i, 1)' of a program are
+# built once. Their children are shared nodes too, so a lookup is a dict access on the
+# kind, the scalar fields and the ids of the children. Blocks, control statements,
+# functions and the program are built as usual (over shared children).
+#
+# Shared nodes are never mutated by the compiler's passes, but a shared node can only hold
+# one position: its lineno and lexpos are those of its first occurrence. The analyses read
+# positions from the nodes, so a node whose line a diagnostic reports (a binary expression,
+# see semantic.get_expression_type) is only shared between occurrences on the same line:
+# its line is part of its key. The line is only known once the grammar action has
+# positioned the node, so binary expressions are built unshared and replaced by their
+# shared node when their parent is built. No analysis reports the position of a leaf.
+#
+# The positions of the other occurrences are kept in a side table, in source order, so the
+# k-th time a source-order walk meets a node its position is the k-th entry (see
+# occurrences()); a node that occurs once has no entry and keeps its own position. Occurrences
+# of identical subtrees never overlap and the parsers build each subtree after the ones
+# before it, with two exceptions: a call's callee is built after its arguments (its entry is
+# moved back by its lexpos), and an assignment statement's target after its value (targets
+# have no position, so they share a separate node). The table only lines up for a successful
+# parse (error recovery builds nodes that are then dropped).
+#
+# structural_hash() gives a stable 64-bit digest of a node's kind, fields and children's
+# hashes (identifiers by name, so the hash does not depend on the symbol ids of one
+# compilation). Equal subtrees have equal hashes within and across programs, so results
+# computed for one subtree can be cached under its hash. Hashes are computed on request.
+
+POSITION_FIELDS = ('lineno', 'lexpos')
+UNHASHED_FIELDS = POSITION_FIELDS + ('symbol_id', 'symbols')
+NO_POSITION = -1  # None in the position arrays
+
+
+def _digest(parts):
+    """
+    Returns a stable 64-bit digest of a tuple of strings, numbers, None and nested tuples.
+    """
+    data = repr(parts).encode('utf-8', 'surrogatepass')
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
+
+def _ref(value):
+    # The part of a cons key for a field: children by identity (they are shared already).
+    if isinstance(value, Node):
+        return id(value)
+    if isinstance(value, list):
+        return tuple(id(item) for item in value)
+    return value
+
+
+def _entry(node):
+    # The side table entry of a node's own position.
+    return (NO_POSITION if node.lineno is None else node.lineno,
+            NO_POSITION if node.lexpos is None else node.lexpos)
+
+
+class HashConsFactory(NodeFactory):
+    """
+    Node factory that shares structurally identical subtrees (see the notes above). Use one
+    factory per parse: its tables keep the nodes of that parse alive.
+    """
+    def __init__(self):
+        self.table = {}  # Cons key -> shared node
+        # Node occurring more than once -> lineno, lexpos of each occurrence in source order
+        # (flat, NO_POSITION for None); arrays of machine ints cost far less than one tuple
+        # of int objects per occurrence.
+        self.positions = {}
+        self.hashes = {}  # Node -> structural hash, filled by structural_hash()
+        self.pending = set()  # Binary expressions not yet replaced by their shared node
+        self.requested = 0  # Nodes requested by the grammar actions
+        self.built = 0  # Nodes kept in the tree
+
+    # --- Construction ---
+
+    def _occur(self, node, entry=(NO_POSITION, NO_POSITION)):
+        # Records another occurrence of an existing shared node (positioned later by set_position).
+        occurrences = self.positions.get(node)
+        if occurrences is None:
+            occurrences = self.positions[node] = array('l', _entry(node))
+        occurrences.extend(entry)
+
+    def _cons(self, key, build):
+        self.requested += 1
+        node = self.table.get(key)
+        if node is None:
+            node = build()
+            self.built += 1
+            self.table[key] = node
+        else:
+            self._occur(node)
+        return node
+
+    def _fresh(self, node):
+        self.requested += 1
+        self.built += 1
+        return node
+
+    def _canon(self, value):
+        # Replaces the binary expressions among a parent's children by their shared nodes.
+        if isinstance(value, list):
+            return [self._canon(item) for item in value]
+        if not isinstance(value, BinaryExpression) or value not in self.pending:
+            return value
+        self.pending.discard(value)
+        key = ('BinaryExpression', value.op, id(value.left), id(value.right), value.lineno)
+        node = self.table.get(key)
+        if node is None:
+            self.built += 1
+            self.table[key] = value
+            return value
+        self._occur(node, _entry(value))  # All occurrences are on the same line
+        return node
+
+    def Identifier(self, name, lineno=None, lexpos=None, symbol_id=None):
+        node = self._cons(('Identifier', name, symbol_id), lambda: Identifier(name, symbol_id=symbol_id))
+        if lineno is not None:
+            self.set_position(node, lineno, lexpos)
+        return node
+
+    def Literal(self, type, value, lineno=None, lexpos=None):
+        # repr keeps 1, 1.0 and True apart (they are equal as dict keys)
+        node = self._cons(('Literal', type, repr(value)), lambda: Literal(type, value))
+        if lineno is not None:
+            self.set_position(node, lineno, lexpos)
+        return node
+
+    def BinaryExpression(self, op, left, right):
+        self.requested += 1
+        node = BinaryExpression(op, self._canon(left), self._canon(right))
+        self.pending.add(node)  # Keyed by its line once positioned (see _canon)
+        return node
+
+    def Assignment(self, lvalue, rvalue):
+        rvalue = self._canon(rvalue)
+        # Assignment expressions carry the target as a plain name rather than an Identifier node.
+        if isinstance(lvalue, Identifier) and self._unpositioned(lvalue):
+            # The target of an assignment statement, built after the value and never positioned
+            self.requested -= 1
+            name, symbol_id = lvalue.name, lvalue.symbol_id
+            lvalue = self._cons(('Identifier', name, symbol_id, 'target'), lambda: Identifier(name, symbol_id=symbol_id))
+        return self._cons(('Assignment', _ref(lvalue), id(rvalue)), lambda: Assignment(lvalue, rvalue))
+
+    def _unpositioned(self, node):
+        # Removes the latest occurrence of a node if it has no position, and reports whether it did.
+        occurrences = self.positions.get(node)
+        if occurrences is None:
+            if node.lineno is not None:
+                return False
+            del self.table[('Identifier', node.name, node.symbol_id)]  # Its only occurrence
+            self.built -= 1
+            return True
+        if occurrences[-2:] != array('l', (NO_POSITION, NO_POSITION)):
+            return False
+        del occurrences[-2:]
+        if len(occurrences) == 2:
+            del self.positions[node]  # Back to a single occurrence
+        return True
+
+    def CallExpression(self, callee, arguments):
+        arguments = self._canon(arguments)
+        return self._cons(('CallExpression', id(callee), _ref(arguments)), lambda: CallExpression(callee, arguments))
+
+    def ReturnStatement(self, value):
+        value = self._canon(value)
+        return self._cons(('ReturnStatement', _ref(value)), lambda: ReturnStatement(value))
+
+    def EmptyStatement(self):
+        return self._cons(('EmptyStatement',), EmptyStatement)
+
+    def Declaration(self, data_type, name, initializer, symbol_id=None):
+        initializer = self._canon(initializer)
+        return self._cons(('Declaration', data_type, name, symbol_id, _ref(initializer)),
+                          lambda: Declaration(data_type, name, initializer, symbol_id))
+
+    def Parameter(self, param_type, name, symbol_id=None):
+        return self._cons(('Parameter', param_type, name, symbol_id), lambda: Parameter(param_type, name, symbol_id))
+
+    def Block(self, statements):
+        return self._fresh(Block(self._canon(statements)))
+
+    def IfStatement(self, condition, then_block, else_block):
+        return self._fresh(IfStatement(*self._canon([condition, then_block, else_block])))
+
+    def ForStatement(self, init, condition, increment, body):
+        return self._fresh(ForStatement(*self._canon([init, condition, increment, body])))
+
+    def WhileStatement(self, condition, body):
+        return self._fresh(WhileStatement(*self._canon([condition, body])))
+
+    def FunctionDefinition(self, return_type, name, params, body, symbol_id=None):
+        return self._fresh(FunctionDefinition(return_type, name, params, body, symbol_id))
+
+    def Program(self, declarations, symbols=None):
+        return self._fresh(Program(declarations, symbols))
+
+    def set_position(self, node, lineno, lexpos=None):
+        """
+        Records the position of the latest occurrence of a node (and sets the node's own
+        position on its first occurrence).
+        """
+        occurrences = self.positions.get(node)
+        if occurrences is None:
+            super().set_position(node, lineno, lexpos)
+            return
+        index = len(occurrences) - 2
+        if lexpos is None:
+            lexpos = occurrences[index + 1]
+            lexpos = None if lexpos == NO_POSITION else lexpos
+        else:
+            # A callee is positioned after its arguments were built: move it before them.
+            while index and occurrences[index - 1] != NO_POSITION and occurrences[index - 1] > lexpos:
+                occurrences[index:index + 2] = occurrences[index - 2:index]
+                index -= 2
+        occurrences[index] = lineno
+        occurrences[index + 1] = NO_POSITION if lexpos is None else lexpos
+        if index == 0:
+            super().set_position(node, lineno, lexpos)
+
+    # --- Queries ---
+
+    def structural_hash(self, node):
+        """
+        Returns the structural hash of a node built by this factory (see the notes above).
+        """
+        stack = [(node, False)]
+        while stack:
+            current, expanded = stack.pop()
+            if current in self.hashes:
+                continue
+            fields = [(name, value) for name, value in vars(current).items() if name not in UNHASHED_FIELDS]
+            if not expanded:
+                # Hash the children first.
+                stack.append((current, True))
+                for _, value in fields:
+                    for child in (value if isinstance(value, list) else [value]):
+                        if isinstance(child, Node):
+                            stack.append((child, False))
+                continue
+            parts = [type(current).__name__]
+            for name, value in fields:
+                if isinstance(value, list):
+                    parts.append(tuple(self.hashes[child] if isinstance(child, Node) else child for child in value))
+                elif isinstance(value, Node):
+                    parts.append(self.hashes[value])
+                else:
+                    parts.append(repr(value) if isinstance(current, Literal) and name == 'value' else value)
+            self.hashes[current] = _digest(tuple(parts))
+        return self.hashes[node]
+
+    @property
+    def shared(self):
+        """
+        The number of node requests answered with an existing node.
+        """
+        return self.requested - self.built
+
+    def occurrences(self, root):
+        """
+        Walks a tree built by this factory in source order, once per occurrence of each node.
+
+        Args:
+            root (Node): The root, usually the Program.
+
+        Yields:
+            tuple: (node, lineno, lexpos) with the position of that occurrence.
+        """
+        seen = {}
+        stack = [root]
+        while stack:
+            value = stack.pop()
+            if isinstance(value, list):
+                stack.extend(reversed(value))
+                continue
+            if not isinstance(value, Node):
+                continue
+            index = seen.get(value, 0)
+            seen[value] = index + 1
+            entries = self.positions.get(value)
+            if entries and 2 * index < len(entries):
+                lineno, lexpos = (None if item == NO_POSITION else item for item in entries[2 * index:2 * index + 2])
+            else:
+                lineno, lexpos = value.lineno, value.lexpos
+            yield value, lineno, lexpos
+            children = [child for name, child in vars(value).items()
+                        if name not in POSITION_FIELDS and isinstance(child, (Node, list))]
+            stack.extend(reversed(children))
+
+
+def parse_hash_consed(code, lexer=None, backend='ply'):
+    """
+    Parses source code into a hash-consed AST.
+
+    Args:
+        code (str): The source code.
+        lexer: The lexer to use. Defaults to the module-level lexer from lexer.py.
+        backend (str, optional): The parser backend (see parser.PARSER_BACKENDS). Defaults to 'ply'.
+
+    Returns:
+        tuple: (the Program, or None if parsing failed; the HashConsFactory with the
+        positions and structural hashes).
+    """
+    lexer = lexer or parser_module.lexer
+    factory = HashConsFactory()
+    previous = parser_module.set_node_factory(factory)
+    try:
+        program = parser_module.get_parser(backend).parse(code, lexer=lexer)
+    finally:
+        parser_module.set_node_factory(previous)
+    factory.table.clear()  # Only needed while building
+    factory.pending.clear()  # Left over only by a failed parse
+    return program, factory
@@ -0,0 +1,172 @@
+# incremental_lexer.py
+import lexer as lexer_module
+from lexer import reset_lexer
+
+# --- Incremental Lexing ---
+#
+# IncrementalLexer keeps the text and tokens of an editor buffer and updates them after each
+# edit (offset, deleted length, inserted text) without re-tokenizing the whole buffer:
+#   - lexing restarts at the end of the last token that ends at least RESTART_MARGIN
+#     characters before the edit. A token always ends outside comments and literals, and no
+#     rule looks further than RESTART_MARGIN characters past the end of its match (e.g. an
+#     exponent or the rest of a character literal), so that token and the ones before it
+#     cannot change;
+#   - the relexed tokens replace the old ones until the stream resynchronizes: a new token
+#     that starts after the edit at the (shifted) start of an old token. From there the text
+#     is the same and lexing is deterministic, so the remaining old tokens are kept, with
+#     their lexpos and lineno shifted. An edit that opens or closes a block comment simply
+#     resynchronizes later (or at the end of the buffer).
+# Shifting every later token would make each keystroke linear in the buffer size, so the
+# shift is pending: one (index, offset, lines) triple applies to every token from the index
+# on. An edit only settles the tokens between itself and that index (few when typing), and
+# reading 'tokens' applies the pending shift once.
+# Relexed tokens are interned in the buffer's intern table, so symbol ids stay consistent.
+
+RESTART_MARGIN = 4
+
+
+class TokenChange:
+    """
+    The effect of an edit on the token list: tokens[start:start + removed] were replaced by
+    'added' (and the tokens after them were shifted).
+    """
+    def __init__(self, start, removed, added):
+        self.start = start
+        self.removed = removed
+        self.added = added
+
+    def __repr__(self):
+        return f"TokenChange(start={self.start}, removed={self.removed}, added={len(self.added)})"
+
+
+class IncrementalLexer:
+    """
+    The tokens of a text buffer, kept up to date across edits.
+    """
+    def __init__(self, text='', lexer=None):
+        """
+        Tokenizes the initial text.
+
+        Args:
+            text (str, optional): The initial text. Defaults to ''.
+            lexer: The PLY lexer to clone. Defaults to the module-level lexer from lexer.py.
+        """
+        self.inner = (lexer or lexer_module.lexer).clone()
+        reset_lexer(self.inner)
+        self.intern_table = self.inner.intern_table
+        self.text = text
+        self._tokens = self._lex(0, 1, None)[0]
+        self.relexed = len(self._tokens)  # Tokens produced by the last update
+        # Pending shift of the tokens from index _pending on (see the notes above)
+        self._pending = len(self._tokens)
+        self._shift = 0
+        self._line_shift = 0
+
+    @property
+    def tokens(self):
+        """
+        The tokens of the current text (LexToken objects with an extra 'end' position).
+        """
+        self._settle(self._pending, len(self._tokens), self._shift, self._line_shift)
+        self._pending, self._shift, self._line_shift = len(self._tokens), 0, 0
+        return self._tokens
+
+    def _settle(self, start, stop, shift, line_shift):
+        """
+        Adds a shift to the stored positions of tokens[start:stop].
+        """
+        if shift or line_shift:
+            for token in self._tokens[start:stop]:
+                token.lexpos += shift
+                token.end += shift
+                token.lineno += line_shift
+
+    def _lex(self, start, lineno, stop):
+        """
+        Lexes self.text from a position until stop(token) is true or the text ends.
+
+        Returns:
+            tuple: (the tokens before the stop, True if stop(token) became true).
+        """
+        inner = self.inner
+        inner.input(self.text)
+        inner.lexpos = start
+        inner.lineno = lineno
+        tokens = []
+        while True:
+            token = inner.token()
+            if token is None:
+                return tokens, False
+            if stop is not None and stop(token):
+                return tokens, True
+            token.end = inner.lexpos  # End of the token's text (values are converted)
+            tokens.append(token)
+
+    def edit(self, offset, deleted, inserted):
+        """
+        Applies an edit to the text and updates the tokens.
+
+        Args:
+            offset (int): Where the edit starts in the current text.
+            deleted (int): The number of characters removed at offset.
+            inserted (str): The text inserted at offset.
+
+        Returns:
+            TokenChange: The tokens that were replaced.
+
+        Raises:
+            ValueError: If the edit is outside the text.
+        """
+        old_text = self.text
+        if offset < 0 or deleted < 0 or offset + deleted > len(old_text):
+            raise ValueError(f"Edit ({offset}, {deleted}) outside a text of length {len(old_text)}")
+        shift = len(inserted) - deleted
+        line_shift = inserted.count('\n') - old_text.count('\n', offset, offset + deleted)
+        self.text = old_text[:offset] + inserted + old_text[offset + deleted:]
+        tokens = self._tokens
+        pending, pending_shift = self._pending, self._shift
+
+        def position(index):  # The lexpos of an old token in the old text
+            return tokens[index].lexpos + (pending_shift if index >= pending else 0)
+
+        # Keep the tokens that end at least RESTART_MARGIN characters before the edit (token
+        # ends increase, so a binary search finds the first one that may change).
+        low, high = 0, len(tokens)
+        while low < high:
+            middle = (low + high) // 2
+            if tokens[middle].end + (pending_shift if middle >= pending else 0) + RESTART_MARGIN <= offset:
+                low = middle + 1
+            else:
+                high = middle
+        first = low
+        self._settle(pending, first, pending_shift, self._line_shift)  # Kept tokens after the pending index
+        if first:
+            start, lineno = tokens[first - 1].end, tokens[first - 1].lineno  # Tokens never span lines
+        else:
+            start, lineno = 0, 1
+
+        # Relex until a new token starts, after the edit, where an old token started.
+        old_edit_end = offset + deleted
+        candidate = [first]  # The first old token that may still start at the same place
+
+        def resynchronized(token):
+            old_position = token.lexpos - shift
+            if old_position < old_edit_end:
+                return False
+            index = candidate[0]
+            while index < len(tokens) and position(index) < old_position:
+                index += 1
+            candidate[0] = index
+            return index < len(tokens) and position(index) == old_position
+
+        added, resumed = self._lex(start, lineno, resynchronized)
+        end = candidate[0] if resumed else len(tokens)
+        # The tokens from 'end' on are kept with a pending shift of (pending shift + shift);
+        # the ones before the old pending index get the opposite of the old pending shift.
+        self._settle(end, pending, -pending_shift, -self._line_shift)
+        tokens[first:end] = added
+        self._pending = first + len(added)
+        self._shift = pending_shift + shift
+        self._line_shift += line_shift
+        self.relexed = len(added)
+        return TokenChange(first, end - first, added)
@@ -0,0 +1,924 @@
+# ir.py
+import math
+from array import array
+
+from cfg import reverse_postorder, solve
+from syntax_tree import FunctionDefinition, Block, Declaration, Assignment, ReturnStatement, IfStatement, \
+    ForStatement, WhileStatement, BinaryExpression, Identifier, Literal, EmptyStatement, CallExpression
+
+# --- Three-Address Intermediate Representation ---
+#
+# A checked program is lowered to functions made of basic blocks. Each block stores its
+# instructions in an array of integers, four per instruction: (opcode, dest, a, b), where
+# dest, a and b are value numbers or indexes into a side table (see the opcodes below), and
+# -1 means "none". The last instruction of a block is a terminator (JUMP, BRANCH or RETURN),
+# whose targets are the block's successors.
+#
+# Lowering reads and writes local variables through LOAD and STORE instructions on variable
+# slots. to_ssa() then turns the function into SSA form: every value is assigned once, LOADs
+# and STOREs disappear and phi functions merge values where control flow joins. Globals are
+# always accessed through GET_GLOBAL and SET_GLOBAL, since calls may change them.
+#
+# Values are typed ('int', 'char', 'bool', 'float', 'double' or 'void'). Integers wrap
+# around like 32-bit ints (8-bit for chars), and 'float' has the precision of 'double'.
+# fold() defines the result of every computing instruction; the evaluator (execute) and the
+# constant propagation of optimize.py both use it, so they always agree.
+
+(CONST, COPY, CAST, ADD, SUB, MUL, DIV, EQ, NE, LT, GT, LE, GE,
+ LOAD, STORE, GET_GLOBAL, SET_GLOBAL, CALL, JUMP, BRANCH, RETURN) = range(21)
+
+# Operands:
+#   CONST dest, constant index      COPY dest, value         CAST dest, value (to the type of dest)
+#   ADD ... GE dest, value, value   LOAD dest, slot          STORE -, slot, value
+#   GET_GLOBAL dest, global         SET_GLOBAL -, global, value
+#   CALL dest, function index, argument list index (dest has type 'void' for void functions)
+#   JUMP                            BRANCH -, value (to successors[0] if true, else successors[1])
+#   RETURN -, value (or -1)
+OPCODE_NAMES = ['const', 'copy', 'cast', 'add', 'sub', 'mul', 'div', 'eq', 'ne', 'lt', 'gt', 'le', 'ge',
+                'load', 'store', 'get_global', 'set_global', 'call', 'jump', 'branch', 'return']
+
+BINARY_OPCODES = {'+': ADD, '-': SUB, '*': MUL, '/': DIV, '==': EQ, '!=': NE, '<': LT, '>': GT, '<=': LE, '>=': GE}
+ARITHMETIC = frozenset((ADD, SUB, MUL, DIV))
+COMPARISONS = frozenset((EQ, NE, LT, GT, LE, GE))
+BINARY = ARITHMETIC | COMPARISONS
+TERMINATORS = frozenset((JUMP, BRANCH, RETURN))
+USES_A = frozenset((COPY, CAST, BRANCH, RETURN)) | BINARY  # Opcodes whose 'a' operand is a value
+USES_B = frozenset((STORE, SET_GLOBAL)) | BINARY  # Opcodes whose 'b' operand is a value
+
+FLOATING_TYPES = ('float', 'double')
+INTEGER_BITS = {'int': 32, 'char': 8}
+
+
+class IRError(Exception):
+    """
+    Raised when a checked program cannot be lowered (e.g., a call with the wrong number of arguments).
+    """
+    pass
+
+
+class ExecutionError(Exception):
+    """
+    Raised when the evaluation of a program fails (e.g., an integer division by zero).
+    """
+    pass
+
+
+# --- Constant Folding ---
+
+def convert(value, value_type):
+    """
+    Converts a value to a type, as an assignment does.
+
+    Args:
+        value (int or float): The value.
+        value_type (str): The target type.
+
+    Returns:
+        int or float: The converted value.
+
+    Raises:
+        ExecutionError: If a non-finite floating-point value is converted to an integer type.
+    """
+    if value_type in FLOATING_TYPES:
+        return float(value)
+    if value_type == 'bool':
+        return 1 if value else 0
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            raise ExecutionError(f"Cannot convert {value} to '{value_type}'")
+        value = int(value)  # Truncates toward zero
+    bits = INTEGER_BITS.get(value_type, 32)
+    value &= (1 << bits) - 1
+    return value - (1 << bits) if value >> (bits - 1) else value
+
+
+def fold(op, value_type, a, b=None):
+    """
+    Computes the result of a COPY, CAST or binary instruction on known operands.
+
+    Args:
+        op (int): The opcode.
+        value_type (str): The type of the result.
+        a: The first operand.
+        b: The second operand (for binary instructions).
+
+    Returns:
+        int or float: The result (comparisons give 0 or 1).
+
+    Raises:
+        ExecutionError: On an integer division by zero or an invalid conversion.
+    """
+    if op == COPY:
+        return a
+    if op == CAST:
+        return convert(a, value_type)
+    if op == ADD:
+        result = a + b
+    elif op == SUB:
+        result = a - b
+    elif op == MUL:
+        result = a * b
+    elif op == DIV:
+        if value_type in FLOATING_TYPES:
+            if b == 0:
+                # IEEE 754 semantics instead of Python's ZeroDivisionError.
+                return math.copysign(math.inf, a) * math.copysign(1.0, b) if a else math.nan
+            result = a / b
+        else:
+            if b == 0:
+                raise ExecutionError("Integer division by zero")
+            quotient = abs(a) // abs(b)  # C truncates toward zero
+            result = quotient if (a < 0) == (b < 0) else -quotient
+    elif op == EQ:
+        return int(a == b)
+    elif op == NE:
+        return int(a != b)
+    elif op == LT:
+        return int(a < b)
+    elif op == GT:
+        return int(a > b)
+    elif op == LE:
+        return int(a <= b)
+    elif op == GE:
+        return int(a >= b)
+    else:
+        raise ValueError(f"Cannot fold opcode {OPCODE_NAMES[op]}")
+    return convert(result, value_type)
+
+
+def binary_type(op, left_type, right_type):
+    """
+    Returns the type of the result of a binary operator, as in the semantic analysis.
+    """
+    if op in COMPARISONS:
+        return 'bool'
+    if 'double' in (left_type, right_type):
+        return 'double'
+    if 'float' in (left_type, right_type):
+        return 'float'
+    return 'int'
+
+
+def literal_value(node):
+    """
+    Returns the value of a literal in the IR (characters are their code, booleans 0 or 1).
+    """
+    if node.type == 'char':
+        return convert(ord(node.value), 'char')
+    return convert(node.value, node.type)
+
+
+# --- Functions and Blocks ---
+
+class BasicBlock:
+    """
+    A basic block: phi functions followed by straight-line instructions and a terminator.
+    """
+    def __init__(self, index):
+        """
+        Initializes an empty block.
+
+        Args:
+            index (int): The position of the block in Function.blocks.
+        """
+        self.index = index
+        self.code = array('q')  # (opcode, dest, a, b) for each instruction
+        self.phis = []  # [dest, [value for each predecessor]]
+        self.successors = []
+        self.predecessors = []
+
+    def append(self, op, dest=-1, a=-1, b=-1):
+        self.code.extend((op, dest, a, b))
+
+    def instructions(self):
+        """
+        Yields the instructions of the block as (opcode, dest, a, b) tuples.
+        """
+        code = self.code
+        for i in range(0, len(code), 4):
+            yield code[i], code[i + 1], code[i + 2], code[i + 3]
+
+    @property
+    def terminated(self):
+        return len(self.code) > 0 and self.code[-4] in TERMINATORS
+
+    def remove_predecessor(self, predecessor):
+        """
+        Removes an incoming edge and the matching phi operands.
+        """
+        position = self.predecessors.index(predecessor)
+        del self.predecessors[position]
+        for phi in self.phis:
+            del phi[1][position]
+
+
+class Function:
+    """
+    A function in the IR.
+    """
+    def __init__(self, name, return_type):
+        """
+        Initializes an empty function.
+
+        Args:
+            name (str): The name of the function.
+            return_type (str): The type of the returned value.
+        """
+        self.name = name
+        self.return_type = return_type
+        self.params = []  # Values holding the arguments
+        self.blocks = []
+        self.types = []  # Type of each value
+        self.constants = []  # Constant pool (CONST operands)
+        self.constant_indexes = {}
+        self.argument_lists = []  # Values passed by each CALL
+        self.slots = []  # (name, type) of each local variable slot (before SSA)
+        self.entry = self.new_block()
+        self.exit = None  # Functions have no single exit block (see cfg.solve)
+
+    def new_block(self):
+        block = BasicBlock(len(self.blocks))
+        self.blocks.append(block)
+        return block
+
+    def new_value(self, value_type):
+        self.types.append(value_type)
+        return len(self.types) - 1
+
+    def constant(self, value):
+        """
+        Returns the index of a constant in the pool, adding it if needed.
+        """
+        key = (type(value), value)
+        if key not in self.constant_indexes:
+            self.constant_indexes[key] = len(self.constants)
+            self.constants.append(value)
+        return self.constant_indexes[key]
+
+    def add_edge(self, source, target):
+        source.successors.append(target)
+        target.predecessors.append(source)
+
+    def reachable(self):
+        return reverse_postorder(self.entry)
+
+    def remove_unreachable(self):
+        """
+        Removes the blocks that cannot be reached from the entry and renumbers the others.
+        """
+        order = self.reachable()
+        reachable = {block.index for block in order}
+        for block in order:
+            for predecessor in [p for p in block.predecessors if p.index not in reachable]:
+                block.remove_predecessor(predecessor)
+        self.blocks = [block for block in self.blocks if block.index in reachable]
+        for index, block in enumerate(self.blocks):
+            block.index = index
+
+    def size(self):
+        """
+        Returns the number of instructions and phi functions.
+        """
+        return sum(len(block.code) // 4 + len(block.phis) for block in self.blocks)
+
+    def map_values(self, resolve):
+        """
+        Replaces every value operand v with resolve(v).
+        """
+        for block in self.blocks:
+            code = block.code
+            for i in range(0, len(code), 4):
+                op = code[i]
+                if op in USES_A and code[i + 2] >= 0:
+                    code[i + 2] = resolve(code[i + 2])
+                if op in USES_B:
+                    code[i + 3] = resolve(code[i + 3])
+                elif op == CALL:
+                    arguments = self.argument_lists[code[i + 3]]
+                    arguments[:] = [resolve(value) for value in arguments]
+            for phi in block.phis:
+                phi[1] = [resolve(value) for value in phi[1]]
+
+
+class Program:
+    """
+    A program in the IR: its globals, the function that initializes them and its functions.
+    """
+    def __init__(self):
+        self.globals = []  # (name, type) of each global
+        self.function_names = []  # CALL operands index this list
+        self.functions = {}  # Maps a name to its Function
+        self.initializer = Function('<globals>', 'void')
+
+    def all_functions(self):
+        return [self.initializer] + list(self.functions.values())
+
+    def size(self):
+        return sum(function.size() for function in self.all_functions())
+
+
+# --- Lowering ---
+
+class FunctionBuilder:
+    """
+    Lowers the statements and expressions of one function (or of the global initializers).
+    """
+    def __init__(self, program, function, signatures, global_indexes):
+        """
+        Initializes the builder.
+
+        Args:
+            program (Program): The program being built.
+            function (Function): The function receiving the code.
+            signatures (dict): Maps each function name to its FunctionDefinition.
+            global_indexes (dict): Maps each global name to its index in program.globals.
+        """
+        self.program = program
+        self.function = function
+        self.signatures = signatures
+        self.global_indexes = global_indexes
+        self.block = function.entry
+        self.scopes = [{}]  # Maps local names to slots, innermost scope last
+
+    def emit(self, op, dest=-1, a=-1, b=-1):
+        self.block.append(op, dest, a, b)
+        return dest
+
+    def start(self, block):
+        self.block = block
+
+    def jump(self, target):
+        self.emit(JUMP)
+        self.function.add_edge(self.block, target)
+
+    def branch(self, condition, then_block, else_block):
+        self.emit(BRANCH, -1, condition)
+        self.function.add_edge(self.block, then_block)
+        self.function.add_edge(self.block, else_block)
+
+    def constant(self, value, value_type):
+        return self.emit(CONST, self.function.new_value(value_type), self.function.constant(value))
+
+    def convert(self, value, value_type):
+        """
+        Returns a value converted to a type (a CAST unless it already has the type).
+        """
+        source_type = self.function.types[value]
+        if source_type == 'void':
+            raise IRError(f"Value of a void function used in '{self.function.name}'")
+        if source_type == value_type:
+            return value
+        return self.emit(CAST, self.function.new_value(value_type), value)
+
+    def declare(self, name, value_type):
+        slot = len(self.function.slots)
+        self.function.slots.append((name, value_type))
+        self.scopes[-1][name] = slot
+        return slot
+
+    def lookup(self, name):
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope[name]
+        return None
+
+    def function_definition(self, node):
+        """
+        Lowers the parameters and the body of a function definition.
+        """
+        for param in node.params:
+            value = self.function.new_value(param.param_type)
+            self.function.params.append(value)
+            self.emit(STORE, -1, self.declare(param.name, param.param_type), value)
+        self.statement(node.body)
+        self.finish()
+        return self.function
+
+    def finish(self):
+        # Control reaches the end of the body only in void functions (and in unreachable blocks).
+        if not self.block.terminated:
+            self.emit(RETURN)
+
+    def statement(self, node):
+        """
+        Lowers a statement into the current block (which may change).
+        """
+        if isinstance(node, Block):
+            self.scopes.append({})
+            for statement in node.statements or []:
+                self.statement(statement)
+            self.scopes.pop()
+        elif isinstance(node, Declaration):
+            # A redeclaration (reported by the semantic analysis) keeps the earlier variable, as in cfg.py.
+            slot = self.lookup(node.name)
+            if slot is None:
+                slot = self.declare(node.name, node.data_type)
+            if node.initializer is not None:
+                value = self.expression(node.initializer)
+                self.emit(STORE, -1, slot, self.convert(value, self.function.slots[slot][1]))
+        elif isinstance(node, ReturnStatement):
+            if node.value is not None and self.function.return_type != 'void':
+                self.emit(RETURN, -1, self.convert(self.expression(node.value), self.function.return_type))
+            else:
+                if node.value is not None:
+                    self.expression(node.value)
+                self.emit(RETURN)
+            self.start(self.function.new_block())  # Statements after a return are unreachable
+        elif isinstance(node, IfStatement):
+            condition = self.expression(node.condition)
+            then_block, after = self.function.new_block(), self.function.new_block()
+            else_block = self.function.new_block() if node.else_block is not None else after
+            self.branch(condition, then_block, else_block)
+            self.start(then_block)
+            self.statement(node.then_block)
+            self.jump(after)
+            if node.else_block is not None:
+                self.start(else_block)
+                self.statement(node.else_block)
+                self.jump(after)
+            self.start(after)
+        elif isinstance(node, WhileStatement):
+            self.loop(None, node.condition, None, node.body)
+        elif isinstance(node, ForStatement):
+            self.loop(node.init, node.condition, node.increment, node.body)
+        elif isinstance(node, EmptyStatement):
+            pass  # Produces no code
+        elif node is not None:
+            # Expression statements
+            self.expression(node)
+
+    def loop(self, init, condition, increment, body):
+        """
+        Lowers a while or for loop.
+        """
+        if init is not None:
+            self.statement(init)
+        header, start, after = self.function.new_block(), self.function.new_block(), self.function.new_block()
+        self.jump(header)
+        self.start(header)
+        if condition is not None:
+            self.branch(self.expression(condition), start, after)
+        else:
+            self.jump(start)
+        self.start(start)
+        self.statement(body)
+        if increment is not None:
+            self.expression(increment)
+        self.jump(header)
+        self.start(after)
+
+    def expression(self, node):
+        """
+        Lowers an expression and returns the value that holds its result.
+        """
+        function = self.function
+        if isinstance(node, Literal):
+            return self.constant(literal_value(node), node.type)
+        elif isinstance(node, Identifier):
+            slot = self.lookup(node.name)
+            if slot is not None:
+                return self.emit(LOAD, function.new_value(function.slots[slot][1]), slot)
+            if node.name in self.global_indexes:
+                index = self.global_indexes[node.name]
+                return self.emit(GET_GLOBAL, function.new_value(self.program.globals[index][1]), index)
+            raise IRError(f"'{node.name}' is not defined")
+        elif isinstance(node, BinaryExpression):
+            if node.op in ('&&', '||'):
+                return self.logical(node)
+            left = self.expression(node.left)
+            right = self.expression(node.right)
+            op = BINARY_OPCODES[node.op]
+            for value in (left, right):
+                if function.types[value] == 'void':
+                    raise IRError(f"Value of a void function used in '{function.name}'")
+            value_type = binary_type(op, function.types[left], function.types[right])
+            return self.emit(op, function.new_value(value_type), left, right)
+        elif isinstance(node, Assignment):
+            value = self.expression(node.rvalue)
+            # Statement-level assignments have an Identifier target, nested ones a plain name.
+            name = node.lvalue.name if isinstance(node.lvalue, Identifier) else node.lvalue
+            slot = self.lookup(name)
+            if slot is not None:
+                value = self.convert(value, function.slots[slot][1])
+                self.emit(STORE, -1, slot, value)
+            elif name in self.global_indexes:
+                index = self.global_indexes[name]
+                value = self.convert(value, self.program.globals[index][1])
+                self.emit(SET_GLOBAL, -1, index, value)
+            else:
+                raise IRError(f"'{name}' is not defined")
+            return value
+        elif isinstance(node, CallExpression):
+            return self.call(node)
+        raise IRError(f"Cannot lower {type(node).__name__}")
+
+    def logical(self, node):
+        """
+        Lowers '&&' and '||', which evaluate their right operand only if needed.
+        """
+        function = self.function
+        slot = self.declare(f"<{node.op}>", 'bool')  # Holds the result on both paths
+        left = self.convert(self.expression(node.left), 'bool')
+        self.emit(STORE, -1, slot, left)
+        right_block, after = function.new_block(), function.new_block()
+        if node.op == '&&':
+            self.branch(left, right_block, after)
+        else:
+            self.branch(left, after, right_block)
+        self.start(right_block)
+        self.emit(STORE, -1, slot, self.convert(self.expression(node.right), 'bool'))
+        self.jump(after)
+        self.start(after)
+        return self.emit(LOAD, function.new_value('bool'), slot)
+
+    def call(self, node):
+        definition = self.signatures.get(node.callee.name)
+        if definition is None:
+            raise IRError(f"Function '{node.callee.name}' is not defined")
+        arguments = node.arguments or []
+        if len(arguments) != len(definition.params):
+            raise IRError(f"Function '{definition.name}' takes {len(definition.params)} arguments, got {len(arguments)}")
+        values = [self.convert(self.expression(argument), param.param_type)
+                  for argument, param in zip(arguments, definition.params)]
+        self.function.argument_lists.append(values)
+        dest = self.function.new_value(definition.return_type)
+        self.emit(CALL, dest, self.program.function_names.index(definition.name), len(self.function.argument_lists) - 1)
+        return dest
+
+
+def lower(ast):
+    """
+    Lowers a checked program (one without lexical, syntax or semantic errors) to the IR.
+
+    Args:
+        ast (Program): The AST.
+
+    Returns:
+        Program: The IR program, with local variables in slots (see to_ssa).
+
+    Raises:
+        IRError: If the program cannot be lowered.
+    """
+    program = Program()
+    signatures = {}
+    for declaration in ast.declarations:
+        if isinstance(declaration, FunctionDefinition) and declaration.name not in signatures:
+            signatures[declaration.name] = declaration
+            program.function_names.append(declaration.name)
+    global_indexes = {}
+    initializer = FunctionBuilder(program, program.initializer, signatures, global_indexes)
+    for declaration in ast.declarations:
+        if isinstance(declaration, Declaration) and declaration.name not in global_indexes:
+            index = len(program.globals)
+            program.globals.append((declaration.name, declaration.data_type))
+            if declaration.initializer is not None:
+                value = initializer.expression(declaration.initializer)
+                initializer.emit(SET_GLOBAL, -1, index, initializer.convert(value, declaration.data_type))
+            global_indexes[declaration.name] = index  # Visible after its initializer
+    initializer.finish()
+    for name, definition in signatures.items():
+        function = Function(name, definition.return_type)
+        program.functions[name] = FunctionBuilder(program, function, signatures, global_indexes).function_definition(definition)
+    return program
+
+
+# --- SSA Construction ---
+
+def dominators(function, order):
+    """
+    Computes the immediate dominator of each block (Cooper, Harvey and Kennedy's algorithm).
+
+    Args:
+        function (Function): The function.
+        order (list): The reachable blocks in reverse postorder.
+
+    Returns:
+        list: The index of the immediate dominator of each block (the entry dominates itself).
+    """
+    position = {block.index: i for i, block in enumerate(order)}
+    idom = [None] * len(function.blocks)
+    idom[function.entry.index] = function.entry.index
+
+    def intersect(a, b):
+        while a != b:
+            while position[a] > position[b]:
+                a = idom[a]
+            while position[b] > position[a]:
+                b = idom[b]
+        return a
+
+    changed = True
+    while changed:
+        changed = False
+        for block in order[1:]:
+            new = None
+            for predecessor in block.predecessors:
+                if idom[predecessor.index] is not None:
+                    new = predecessor.index if new is None else intersect(predecessor.index, new)
+            if idom[block.index] != new:
+                idom[block.index] = new
+                changed = True
+    return idom
+
+
+def dominance_frontiers(function, idom):
+    """
+    Computes the dominance frontier of each block.
+    """
+    frontiers = [set() for _ in function.blocks]
+    for block in function.blocks:
+        if len(block.predecessors) > 1:
+            for predecessor in block.predecessors:
+                runner = predecessor.index
+                while runner != idom[block.index]:
+                    frontiers[runner].add(block.index)
+                    runner = idom[runner]
+    return frontiers
+
+
+def live_slots(function):
+    """
+    Computes the slots whose value may be loaded before being stored again, at the start of each block.
+    """
+    gen, kill = [], []
+    for block in function.blocks:
+        generated = killed = 0
+        code = block.code
+        for i in range(len(code) - 4, -1, -4):
+            if code[i] == LOAD:
+                generated |= 1 << code[i + 2]
+            elif code[i] == STORE:
+                generated &= ~(1 << code[i + 2])
+                killed |= 1 << code[i + 2]
+        gen.append(generated)
+        kill.append(killed)
+    return solve(function, gen, kill, forward=False)[0]
+
+
+def to_ssa(function):
+    """
+    Converts a function to (pruned) SSA form: phi functions are placed on the iterated
+    dominance frontiers of the stores of each slot where the slot is live, then the loads
+    and stores are replaced by the values they read and write.
+
+    Args:
+        function (Function): The function, with local variables in slots.
+
+    Returns:
+        Function: The same function, in SSA form.
+    """
+    function.remove_unreachable()
+    order = function.reachable()
+    idom = dominators(function, order)
+    frontiers = dominance_frontiers(function, idom)
+    live = live_slots(function)
+
+    # Place the phi functions.
+    phi_slots = {}  # Maps each phi's value to its slot
+    stores = [set() for _ in function.slots]
+    for block in function.blocks:
+        for op, _, a, _ in block.instructions():
+            if op == STORE:
+                stores[a].add(block.index)
+    for slot, blocks in enumerate(stores):
+        pending = list(blocks)
+        placed = set()
+        while pending:
+            for target in frontiers[pending.pop()]:
+                if target not in placed and live[target] >> slot & 1:
+                    placed.add(target)
+                    block = function.blocks[target]
+                    dest = function.new_value(function.slots[slot][1])
+                    block.phis.append([dest, [-1] * len(block.predecessors)])
+                    phi_slots[dest] = slot
+                    if target not in blocks:
+                        pending.append(target)
+
+    # Rename along the dominator tree (iteratively, since it can be as deep as the function is long).
+    children = [[] for _ in function.blocks]
+    for block in order[1:]:
+        children[idom[block.index]].append(function.blocks[block.index])
+    definitions = [[] for _ in function.slots]  # Stack of the current value of each slot
+    replaced = {}  # Maps each loaded value to the value it reads
+    undefined = {}  # Maps a slot read before any store to a zero value (only in unchecked code)
+
+    def current(slot):
+        if definitions[slot]:
+            return definitions[slot][-1]
+        if slot not in undefined:
+            undefined[slot] = function.new_value(function.slots[slot][1])
+        return undefined[slot]
+
+    def resolve(value):
+        return replaced.get(value, value)
+
+    stack = [(function.entry, None)]
+    while stack:
+        block, pushed = stack.pop()
+        if pushed is not None:
+            for slot in pushed:
+                definitions[slot].pop()
+            continue
+        pushed = []
+        for phi in block.phis:
+            definitions[phi_slots[phi[0]]].append(phi[0])
+            pushed.append(phi_slots[phi[0]])
+        code = array('q')
+        for op, dest, a, b in block.instructions():
+            if op == LOAD:
+                replaced[dest] = current(a)
+                continue
+            if op == STORE:
+                definitions[a].append(resolve(b))
+                pushed.append(a)
+                continue
+            if op in USES_A and a >= 0:
+                a = resolve(a)
+            if op in USES_B:
+                b = resolve(b)
+            elif op == CALL:
+                arguments = function.argument_lists[b]
+                arguments[:] = [resolve(value) for value in arguments]
+            code.extend((op, dest, a, b))
+        block.code = code
+        for successor in block.successors:
+            position = successor.predecessors.index(block)
+            for phi in successor.phis:
+                phi[1][position] = current(phi_slots[phi[0]])
+        stack.append((block, pushed))
+        stack.extend((child, None) for child in reversed(children[block.index]))
+
+    # Values read before any store start as zero, like the slots of the evaluator.
+    prologue = array('q')
+    for slot, value in undefined.items():
+        prologue.extend((CONST, value, function.constant(convert(0, function.slots[slot][1])), -1))
+    function.entry.code = prologue + function.entry.code
+    function.slots = []
+    return function
+
+
+def build_ir(ast, optimize=True):
+    """
+    Lowers a checked program to SSA form and (by default) optimizes it.
+
+    Args:
+        ast (Program): The AST.
+        optimize (bool, optional): Whether to run the passes of optimize.py. Defaults to True.
+
+    Returns:
+        Program: The IR program.
+    """
+    program = lower(ast)
+    for function in program.all_functions():
+        to_ssa(function)
+    if optimize:
+        from optimize import optimize_program
+        optimize_program(program)
+    return program
+
+
+# --- Evaluation ---
+
+DEFAULT_MAX_STEPS = 10_000_000  # Instructions executed before execute() gives up
+DEFAULT_MAX_DEPTH = 200  # Nested calls
+
+
+class Machine:
+    """
+    Executes IR programs, in SSA form or not.
+    """
+    def __init__(self, program, max_steps=DEFAULT_MAX_STEPS, max_depth=DEFAULT_MAX_DEPTH):
+        self.program = program
+        self.max_steps = max_steps
+        self.max_depth = max_depth
+        self.steps = 0
+        self.globals = [convert(0, global_type) for _, global_type in program.globals]
+
+    def call(self, function, arguments, depth=0):
+        """
+        Executes a function and returns its result (None for void functions).
+        """
+        if depth > self.max_depth:
+            raise ExecutionError("Call depth limit exceeded")
+        program = self.program
+        types = function.types
+        constants = function.constants
+        values = [None] * len(types)
+        slots = [convert(0, slot_type) for _, slot_type in function.slots]
+        for param, argument in zip(function.params, arguments):
+            values[param] = argument
+        block, previous = function.entry, None
+        while True:
+            if block.phis:
+                position = block.predecessors.index(previous)
+                incoming = [values[operands[position]] for _, operands in block.phis]
+                for (dest, _), value in zip(block.phis, incoming):
+                    values[dest] = value
+            code = block.code
+            self.steps += len(code) >> 2
+            if self.max_steps is not None and self.steps > self.max_steps:
+                raise ExecutionError("Step limit exceeded")
+            for i in range(0, len(code), 4):
+                op, dest, a, b = code[i], code[i + 1], code[i + 2], code[i + 3]
+                if op == CONST:
+                    values[dest] = constants[a]
+                elif op in BINARY:
+                    values[dest] = fold(op, types[dest], values[a], values[b])
+                elif op == COPY or op == CAST:
+                    values[dest] = fold(op, types[dest], values[a])
+                elif op == LOAD:
+                    values[dest] = slots[a]
+                elif op == STORE:
+                    slots[a] = values[b]
+                elif op == GET_GLOBAL:
+                    values[dest] = self.globals[a]
+                elif op == SET_GLOBAL:
+                    self.globals[a] = values[b]
+                elif op == CALL:
+                    callee = program.functions[program.function_names[a]]
+                    result = self.call(callee, [values[value] for value in function.argument_lists[b]], depth + 1)
+                    if dest >= 0:
+                        values[dest] = result
+                elif op == JUMP:
+                    previous, block = block, block.successors[0]
+                    break
+                elif op == BRANCH:
+                    previous, block = block, block.successors[0 if values[a] else 1]
+                    break
+                elif op == RETURN:
+                    return values[a] if a >= 0 else None
+
+
+def execute(program, function='main', arguments=(), max_steps=DEFAULT_MAX_STEPS):
+    """
+    Initializes the globals of a program, then executes one of its functions.
+
+    Args:
+        program (Program): The IR program.
+        function (str, optional): The function to execute. Defaults to 'main'.
+        arguments (tuple, optional): The arguments. Defaults to ().
+        max_steps (int, optional): Maximum number of executed instructions. Defaults to DEFAULT_MAX_STEPS.
+
+    Returns:
+        The result of the function (None for void functions).
+
+    Raises:
+        ExecutionError: If the evaluation fails or exceeds its limits.
+    """
+    machine = Machine(program, max_steps)
+    machine.call(program.initializer, ())
+    return machine.call(program.functions[function], list(arguments))
+
+
+# --- Printing ---
+
+def format_function(function):
+    """
+    Returns a readable listing of a function.
+    """
+    def value(v):
+        return f"v{v}" if v >= 0 else "-"
+
+    params = ", ".join(f"{value(v)}: {function.types[v]}" for v in function.params)
+    lines = [f"function {function.return_type} {function.name}({params})"]
+    for block in function.blocks:
+        predecessors = ", ".join(f"b{p.index}" for p in block.predecessors)
+        lines.append(f"b{block.index}:" + (f"  ; from {predecessors}" if predecessors else ""))
+        for dest, operands in block.phis:
+            incoming = ", ".join(f"b{p.index}: {value(v)}" for p, v in zip(block.predecessors, operands))
+            lines.append(f"    {value(dest)} = phi {incoming}")
+        for op, dest, a, b in block.instructions():
+            name = OPCODE_NAMES[op]
+            if op == CONST:
+                text = f"{value(dest)} = const {function.constants[a]!r}"
+            elif op in (COPY, CAST):
+                text = f"{value(dest)} = {name} {value(a)}" + (f" to {function.types[dest]}" if op == CAST else "")
+            elif op in BINARY:
+                text = f"{value(dest)} = {name} {value(a)}, {value(b)}"
+            elif op in (LOAD, GET_GLOBAL):
+                text = f"{value(dest)} = {name} {'s' if op == LOAD else 'g'}{a}"
+            elif op in (STORE, SET_GLOBAL):
+                text = f"{name} {'s' if op == STORE else 'g'}{a}, {value(b)}"
+            elif op == CALL:
+                arguments = ", ".join(value(v) for v in function.argument_lists[b])
+                text = (f"{value(dest)} = " if dest >= 0 else "") + f"call #{a}({arguments})"
+            elif op == JUMP:
+                text = f"jump b{block.successors[0].index}"
+            elif op == BRANCH:
+                text = f"branch {value(a)}, b{block.successors[0].index}, b{block.successors[1].index}"
+            else:
+                text = "return" + (f" {value(a)}" if a >= 0 else "")
+            lines.append(f"    {text}")
+    return "\n".join(lines)
+
+
+def format_program(program):
+    """
+    Returns a readable listing of a program.
+    """
+    lines = [f"global {global_type} g{index} ({name})" for index, (name, global_type) in enumerate(program.globals)]
+    lines.extend(f"# function #{index}: {name}" for index, name in enumerate(program.function_names))
+    functions = program.all_functions()
+    if program.initializer.size() <= 1:
+        functions = functions[1:]  # Only 'return'
+    return "\n\n".join(["\n".join(lines)] + [format_function(function) for function in functions]).strip() + "\n"
@@ -1,5 +1,7 @@
 # lexer.py
+import re
 from ply import lex  # Import the lex module from the PLY library
+from diagnostics import Diagnostics
 
 # --- Lexer ---
 
@@ -32,6 +34,44 @@ keywords = {
     'return': 'RETURN',
 }
 
+# Canonical keyword strings, so every keyword token shares a single string object.
+keyword_names = {keyword: keyword for keyword in keywords}
+
+class InternTable:
+    """
+    Per-compilation table that maps each identifier name to a small integer symbol id.
+    Tokens and AST nodes carry the id, and the symbol tables in semantic.py are keyed by it.
+    """
+    def __init__(self):
+        """
+        Initializes an empty intern table.
+        """
+        self.ids = {}  # Maps a name to its symbol id.
+        self.names = []  # Maps a symbol id back to its (shared) name string.
+
+    def intern(self, name):
+        """
+        Returns the symbol id of a name, adding it to the table if needed.
+
+        Args:
+            name (str): The name to intern.
+
+        Returns:
+            int: The symbol id of the name.
+        """
+        symbol_id = self.ids.get(name)
+        if symbol_id is None:
+            symbol_id = len(self.names)
+            self.ids[name] = symbol_id
+            self.names.append(name)
+        return symbol_id
+
+    def __getitem__(self, symbol_id):
+        return self.names[symbol_id]
+
+    def __len__(self):
+        return len(self.names)
+
 # Regular expression rules for simple tokens
 # These are defined as global variables starting with 't_'.
 # The value of each variable is the regular expression string that matches the corresponding token.
@@ -55,15 +95,37 @@ t_COMMA = r','
 t_AND = r'&&'
 t_OR = r'\|\|'
 
+# Messages of lexical errors (e.g., unterminated comments) found in the current input
+lexical_errors = Diagnostics('lexical errors')
+
+# Messages of lexical warnings (e.g., illegal characters, which are skipped) found in the current input
+lexical_warnings = Diagnostics('lexical warnings')
+
+# A run of characters that cannot start any token (nor be ignored); t_error skips it at once.
+illegal_run = re.compile(r"[^A-Za-z\d_ \t\n+\-*/=<>!&|(){};,.']+")
+
 # A string containing ignored characters (spaces and tabs)
 # The lexer will skip these characters without producing a token.
 t_ignore = ' \t'
 
 def t_COMMENT(t):
-    r'(//.*)|(/\*(.|\n)*?\*/)'
+    r'//[^\n]*|/\*'
     """Handles single-line (// ...) and multi-line (/* ... */) comments.
+    The regex only matches the opening '/*' of a block comment; the closing '*/' is found
+    with str.find, so scanning is linear in the comment length even if it is never closed.
     It updates the line number counter for multi-line comments."""
-    t.lexer.lineno += t.value.count('\n')
+    if t.value == '/*':
+        lexdata = t.lexer.lexdata
+        start = t.lexer.lexpos
+        end = lexdata.find('*/', start, t.lexer.lexlen)
+        if end == -1:
+            # Unterminated comment: report it and consume the rest of the input.
+            lexical_errors.report("Lexical error at line %d: Unterminated block comment", t.lineno)
+            end = t.lexer.lexlen
+        else:
+            end += 2
+        t.lexer.lineno += lexdata.count('\n', start, end)
+        t.lexer.lexpos = end
     # No return value means this token is discarded and not passed to the parser.
 
 def t_BOOL_LIT(t):
@@ -76,8 +138,15 @@ def t_BOOL_LIT(t):
 def t_ID(t):
     r'[a-zA-Z_][a-zA-Z0-9_]*'
     """Handles identifiers (variable and function names).
-    It checks if the matched string is a reserved keyword and sets the token type accordingly."""
+    It checks if the matched string is a reserved keyword and sets the token type accordingly.
+    Identifiers are interned: the token carries the shared name string and its symbol id."""
     t.type = keywords.get(t.value, 'ID')  # Check if the identifier is a keyword. If so, use the keyword's token type.
+    if t.type == 'ID':
+        table = t.lexer.intern_table
+        t.symbol_id = table.intern(t.value)
+        t.value = table.names[t.symbol_id]  # Share one string object per distinct name.
+    else:
+        t.value = keyword_names[t.value]  # Share the keyword string as well.
     return t
 
 def t_FLOAT_NUM(t):
@@ -87,7 +156,7 @@ def t_FLOAT_NUM(t):
     try:
         t.value = float(t.value[:-1])  # Convert to float, excluding the 'f' or 'F' suffix.
     except ValueError:
-        print(f"Invalid float format: '{t.value}' at line {t.lexer.lineno}")
+        lexical_warnings.report("Invalid float format: '%s' at line %d", t.value, t.lexer.lineno)
         t.lexer.skip(1)  # Skip the problematic character and continue lexing.
     return t
 
@@ -98,7 +167,7 @@ def t_DOUBLE_NUM(t):
     try:
         t.value = float(t.value)
     except ValueError:
-        print(f"Invalid double format: '{t.value}' at line {t.lexer.lineno}")
+        lexical_warnings.report("Invalid double format: '%s' at line %d", t.value, t.lexer.lineno)
         t.lexer.skip(1)
     return t
 
@@ -109,14 +178,15 @@ def t_INT_NUM(t):
     try:
         t.value = int(t.value)
     except ValueError:
-        print(f"Invalid integer format: '{t.value}' at line {t.lexer.lineno}")
+        lexical_warnings.report("Invalid integer format: '%s' at line %d", t.value, t.lexer.lineno)
         t.lexer.skip(1)
     return t
 
 def t_CHAR_LIT(t):
-    r'\'(\\[^\']|.)\''
+    r'\'(\\[^\n]|[^\'\\\n])\''
     """Handles character literals enclosed in single quotes.
-    It supports escape sequences (e.g., '\\n', '\\t')."""
+    It supports escape sequences (e.g., '\\n', '\\t', '\\'').
+    The pattern has a fixed length, so a stray quote never causes a long scan."""
     value = t.value[1:-1]  # Remove the surrounding single quotes.
     if value.startswith('\\'):
         # Handle escape sequences
@@ -136,13 +206,13 @@ def t_CHAR_LIT(t):
         elif esc == '"':
             t.value = '"'
         else:
-            print(f"Invalid escape sequence '\\{esc}' at line {t.lexer.lineno}")
+            lexical_warnings.report("Invalid escape sequence '\\%s' at line %d", esc, t.lexer.lineno)
             t.lexer.skip(1)
             return None  # Don't return a token for an invalid escape sequence.
     else:
         t.value = value
     if len(t.value) != 1:
-        print(f"Invalid character literal '{t.value}' at line {t.lexer.lineno}")
+        lexical_warnings.report("Invalid character literal '%s' at line %d", t.value, t.lexer.lineno)
         t.lexer.skip(1)
         return None  # Don't return a token for multi-character literals.
     return t
@@ -154,10 +224,34 @@ def t_newline(t):
 
 def t_error(t):
     """Error handling for illegal characters that don't match any rule.
-    It prints an error message and skips the illegal character."""
-    print(f"Illegal character '{t.value[0]}' at line {t.lexer.lineno}")
-    t.lexer.skip(1)
+    It records a warning and skips the illegal character, or the whole run of characters
+    that cannot start a token, so a binary blob costs one call instead of one per byte."""
+    match = illegal_run.match(t.lexer.lexdata, t.lexer.lexpos, t.lexer.lexlen)
+    length = match.end() - t.lexer.lexpos if match else 1
+    if length == 1:
+        lexical_warnings.report("Illegal character '%s' at line %d", t.value[0], t.lexer.lineno)
+    else:
+        lexical_warnings.report("Illegal characters '%s' at line %d", t.value[:min(length, 20)], t.lexer.lineno)
+    t.lexer.skip(length)
+
+def find_column(token, lexer_obj=None):
+    """Computes the column of a token from the source held by the lexer that produced it.
+    Lexers that only hold part of the source (see stream_lexer.StreamLexer) expose the
+    offset of that part as 'chunk_base'; chunks always start at the beginning of a line."""
+    lexer_obj = getattr(token, 'lexer', None) or lexer_obj or lexer
+    position = token.lexpos - getattr(lexer_obj, 'chunk_base', 0)
+    return position - lexer_obj.lexdata.rfind('\n', 0, position) + 1
+
+def reset_lexer(lexer_obj=None):
+    """Prepares a lexer for a new compilation: resets the line counter, starts a
+    fresh intern table and clears the lexical errors and warnings."""
+    lexer_obj = lexer_obj or lexer
+    lexer_obj.lineno = 1
+    lexer_obj.intern_table = InternTable()
+    lexical_errors.clear()
+    lexical_warnings.clear()
 
 # Build the lexer
 # This creates the lexer object that can be used to tokenize input text.
-lexer = lex.lex()
\ No newline at end of file
+lexer = lex.lex()
+lexer.intern_table = InternTable()  # Intern table for the current compilation
\ No newline at end of file
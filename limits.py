@@ -0,0 +1,230 @@
+# limits.py
+import os
+import time
+
+from syntax_tree import Node
+
+# --- Resource Limits ---
+#
+# Limits are enforced cooperatively: the lexer loop counts tokens, the parser counts the
+# tokens it pulls, and the semantic analyzer ticks once per visited node. Each of them
+# checks the wall-clock budget of the current stage every CHECK_INTERVAL ticks, and a
+# breach raises LimitExceeded, which the caller turns into a regular diagnostic.
+
+CHECK_INTERVAL = 256  # Number of ticks between wall-clock checks
+
+
+class LimitExceeded(Exception):
+    """
+    Raised when a compilation exceeds one of its resource limits.
+    """
+    def __init__(self, message):
+        super().__init__(f"Resource limit exceeded: {message}")
+        self.detail = message
+
+    def __reduce__(self):
+        # Pickle with the original message (e.g., when raised in a worker process).
+        return type(self), (self.detail,)
+
+
+class CompileLimits:
+    """
+    Configurable limits for a single compilation. A limit of None disables it.
+    """
+    # Environment variables that override the defaults (see from_env).
+    ENVIRONMENT = {
+        'max_source_bytes': 'COMPILE_MAX_SOURCE_BYTES',
+        'max_tokens': 'COMPILE_MAX_TOKENS',
+        'max_ast_depth': 'COMPILE_MAX_AST_DEPTH',
+        'stage_timeout': 'COMPILE_STAGE_TIMEOUT',
+    }
+
+    def __init__(self, max_source_bytes=1_000_000, max_tokens=200_000, max_ast_depth=200, stage_timeout=5.0):
+        """
+        Initializes the limits.
+
+        Args:
+            max_source_bytes (int, optional): Maximum size of the UTF-8 encoded source. Defaults to 1 MB.
+            max_tokens (int, optional): Maximum number of tokens. Defaults to 200,000.
+            max_ast_depth (int, optional): Maximum nesting depth of the AST. This also keeps the
+                recursive semantic passes well below Python's recursion limit. Defaults to 200.
+            stage_timeout (float, optional): Wall-clock budget in seconds for each stage
+                (lexing, parsing, semantic analysis). Defaults to 5 seconds.
+        """
+        self.max_source_bytes = max_source_bytes
+        self.max_tokens = max_tokens
+        self.max_ast_depth = max_ast_depth
+        self.stage_timeout = stage_timeout
+
+    @classmethod
+    def from_env(cls, environ=None):
+        """
+        Creates limits from environment variables, falling back to the defaults.
+        A value of 0 disables the corresponding limit.
+
+        Args:
+            environ (dict, optional): The environment to read. Defaults to os.environ.
+
+        Returns:
+            CompileLimits: The configured limits.
+        """
+        environ = os.environ if environ is None else environ
+        limits = cls()
+        for attribute, variable in cls.ENVIRONMENT.items():
+            if variable in environ:
+                value = float(environ[variable]) if attribute == 'stage_timeout' else int(environ[variable])
+                setattr(limits, attribute, value or None)
+        return limits
+
+    def budget(self):
+        """
+        Returns a new Budget tracking one compilation against these limits.
+        """
+        return Budget(self)
+
+
+class Budget:
+    """
+    Tracks the resources used by one compilation.
+    """
+    def __init__(self, limits):
+        """
+        Initializes the budget.
+
+        Args:
+            limits (CompileLimits): The limits to enforce.
+        """
+        self.limits = limits
+        self.stage = None  # Name of the current stage
+        self.deadline = None  # perf_counter() value at which the current stage times out
+        self.tokens = 0  # Tokens counted in the current stage
+        self.ticks = 0  # Ticks since the last wall-clock check
+        self.timings = {}  # Elapsed seconds per finished stage
+        self._stage_start = None
+
+    def check_source(self, code):
+        """
+        Checks the size of the source code.
+
+        Args:
+            code (str): The source code.
+
+        Raises:
+            LimitExceeded: If the source is larger than max_source_bytes.
+        """
+        limit = self.limits.max_source_bytes
+        if limit is None or len(code) * 4 <= limit:
+            return  # Even if every character needs 4 bytes, it fits
+        size = len(code.encode('utf-8', 'surrogatepass'))
+        if size > limit:
+            raise LimitExceeded(f"source is {size} bytes (limit {limit})")
+
+    def start_stage(self, name):
+        """
+        Starts timing a new stage; its wall-clock budget starts now.
+
+        Args:
+            name (str): The name of the stage (e.g., 'lex', 'parse', 'semantic').
+        """
+        self.end_stage()
+        now = time.perf_counter()
+        self.stage = name
+        self._stage_start = now
+        self.deadline = now + self.limits.stage_timeout if self.limits.stage_timeout else None
+        self.tokens = 0
+        self.ticks = 0
+
+    def end_stage(self):
+        """
+        Records the elapsed time of the current stage, if any.
+        """
+        if self.stage is not None:
+            self.timings[self.stage] = time.perf_counter() - self._stage_start
+            self.stage = None
+
+    def tick(self):
+        """
+        Called from processing loops; checks the wall-clock budget every CHECK_INTERVAL ticks.
+
+        Raises:
+            LimitExceeded: If the current stage has run out of time.
+        """
+        self.ticks += 1
+        if self.ticks >= CHECK_INTERVAL:
+            self.ticks = 0
+            if self.deadline is not None and time.perf_counter() > self.deadline:
+                raise LimitExceeded(f"{self.stage} stage took longer than {self.limits.stage_timeout:g} seconds")
+
+    def count_token(self):
+        """
+        Counts one token of the current stage.
+
+        Raises:
+            LimitExceeded: If there are more than max_tokens tokens or the stage ran out of time.
+        """
+        self.tokens += 1
+        if self.limits.max_tokens is not None and self.tokens > self.limits.max_tokens:
+            raise LimitExceeded(f"more than {self.limits.max_tokens} tokens")
+        self.tick()
+
+    def token_source(self, token_function):
+        """
+        Wraps a token function (e.g., lexer.token) so that every token is counted.
+        Pass the result to parser.parse() as tokenfunc.
+
+        Args:
+            token_function (callable): Returns the next token or None.
+
+        Returns:
+            callable: The counting token function.
+        """
+        def next_token():
+            tok = token_function()
+            if tok is not None:
+                self.count_token()
+            return tok
+        return next_token
+
+    def check_depth(self, ast):
+        """
+        Checks the nesting depth of an AST without recursion.
+
+        Args:
+            ast (Node): The root of the AST.
+
+        Raises:
+            LimitExceeded: If the AST is nested deeper than max_ast_depth.
+        """
+        limit = self.limits.max_ast_depth
+        if limit is not None and ast_depth(ast, limit) > limit:
+            raise LimitExceeded(f"program is nested more than {limit} levels deep")
+
+
+def ast_depth(ast, limit=None):
+    """
+    Computes the depth of an AST iteratively (lists of nodes do not add a level).
+
+    Args:
+        ast (Node): The root of the AST.
+        limit (int, optional): Stop as soon as the depth exceeds this value.
+
+    Returns:
+        int: The depth (or limit + 1 if the limit was exceeded).
+    """
+    deepest = 0
+    stack = [(ast, 1)]
+    while stack:
+        node, depth = stack.pop()
+        if isinstance(node, list):
+            stack.extend((item, depth) for item in node)
+            continue
+        if not isinstance(node, Node):
+            continue
+        if depth > deepest:
+            deepest = depth
+            if limit is not None and deepest > limit:
+                return deepest
+        for value in vars(node).values():
+            if isinstance(value, (Node, list)):
+                stack.append((value, depth + 1))
+    return deepest
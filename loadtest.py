@@ -0,0 +1,610 @@
+# loadtest.py
+"""
+Load test and latency report for /run_code.
+
+Serves app.py on a local socket (or targets a running server with --url) and drives it with
+a weighted mix of sources at increasing load: in closed-loop mode each step runs a number
+of clients that send requests back to back; in open-loop mode each step sends requests at a
+fixed rate (Poisson arrivals) whether or not earlier ones have finished. Each step reports
+throughput, latency percentiles, the error rate and the per-stage server timings (from the
+Server-Timing header), and the report can be written as JSON and HTML and compared with the
+report of a previous release.
+
+Usage:
+    python loadtest.py [--mode closed|open] [--steps 1,2,4,8] [--duration S] [--mix template=6,small=3,...]
+                       [--url URL] [--server-processes N] [--slo-p99 MS] [--max-error-rate F]
+                       [--json FILE] [--html FILE] [--baseline FILE] [--label NAME]
+"""
+import argparse
+import html
+import http.client
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+REPORT_VERSION = 1
+DEFAULT_MIX = 'template=6,small=3,large=1,invalid=1'
+DEFAULT_STEPS = {'closed': '1,2,4,8', 'open': '5,10,20,40'}  # Clients, or requests per second
+PERCENTILES = (50, 95, 99)
+REQUEST_TIMEOUT = 60.0
+
+# --- Sources ---
+#
+# Each source kind returns the code of the next request. 'template' is the same program
+# every time (a class compiling the starter code); the generated kinds add the request
+# number in a comment so identical requests are not coalesced or served from the cache.
+# Assignments are parenthesized: the grammar parses 'x = a + b' as '(x = a) + b'.
+
+TEMPLATE_SOURCE = """int square(int n) {
+    return n * n;
+}
+
+int main() {
+    int total = 0;
+    int i = 0;
+    while (i < 10) {
+        total = (total + square(i));
+        i = (i + 1);
+    }
+    if (total > 100) {
+        return 1;
+    } else {
+        return 0;
+    }
+}
+"""
+
+
+def generated_source(functions, statements, index):
+    """
+    Generates a valid program of 'functions' functions with 'statements' loops each.
+
+    Args:
+        functions (int): The number of functions (plus a 'main').
+        statements (int): The number of loops in each function.
+        index (int): The request number, added in a comment.
+
+    Returns:
+        str: The source code.
+    """
+    lines = [f"// request {index}", "int counter = 0;"]
+    for function in range(functions):
+        lines.append(f"int f{function}(int a, int b) {{")
+        lines.append("    int total = 0;")
+        lines.append("    int i = 0;")
+        for step in range(statements):
+            lines.append("    i = 0;")
+            lines.append(f"    while (i < {step + 2}) {{")
+            lines.append(f"        if (a > b) {{ total = (total + a * {step}); }} else {{ total = (total - b); }}")
+            lines.append("        i = (i + 1);")
+            lines.append("    }")
+        lines.append("    return total;")
+        lines.append("}")
+    lines.append("int main() {")
+    lines.append("    int result = 0;")
+    for function in range(min(functions, 20)):
+        lines.append(f"    result = f{function}(result, {function});")
+    lines.append("    return result;")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+SOURCES = {
+    'template': lambda index: TEMPLATE_SOURCE,
+    'small': lambda index: generated_source(3, 3, index),
+    'large': lambda index: generated_source(40, 10, index),
+    'invalid': lambda index: f"// request {index}\nint main() {{\n    int x = ;\n    return x\n}}\n",
+}
+
+
+def parse_mix(text):
+    """
+    Parses a source mix such as 'template=6,small=3' into {kind: weight}.
+
+    Raises:
+        ValueError: If a kind is unknown or a weight is not a positive number.
+    """
+    mix = {}
+    for item in filter(None, text.split(',')):
+        kind, _, weight = item.partition('=')
+        if kind not in SOURCES:
+            raise ValueError(f"Unknown source kind '{kind}' (choose from {', '.join(SOURCES)})")
+        mix[kind] = float(weight or 1)
+        if mix[kind] <= 0:
+            raise ValueError(f"The weight of '{kind}' must be positive")
+    if not mix:
+        raise ValueError("The source mix is empty")
+    return mix
+
+
+class RequestPlan:
+    """
+    The sequence of requests of a run: source kinds drawn from the mix with a fixed seed, so
+    two runs (e.g. of two releases) send the same requests.
+    """
+    def __init__(self, mix, seed=0):
+        self.kinds = list(mix)
+        self.weights = [mix[kind] for kind in self.kinds]
+        self.rng = random.Random(seed)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def next(self):
+        """
+        Returns (kind, request body) for the next request.
+        """
+        with self._lock:
+            kind = self.rng.choices(self.kinds, self.weights)[0]
+            index = self.count
+            self.count += 1
+        code = SOURCES[kind](index)
+        return kind, json.dumps({'code': code, 'lineCount': code.count('\n') + 1}).encode('utf-8')
+
+
+# --- Local Server ---
+
+def start_local_server(processes=1):
+    """
+    Serves app.py on a free local port from a background thread.
+
+    The pipeline shares the module-level lexer and parser between compiles, so requests are
+    never handled by concurrent threads: with processes=1 they are served one at a time, and
+    with more, each request is handled in a process forked from this (warm) one, at most
+    'processes' at once.
+
+    Returns:
+        tuple: (server, base URL). Call server.shutdown() to stop it.
+    """
+    from werkzeug.serving import make_server
+    from app import app
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)  # No line per request
+    server = make_server('127.0.0.1', 0, app, threaded=False, processes=processes)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+# --- Client ---
+
+def parse_server_timing(value):
+    """
+    Parses a Server-Timing header into {name: milliseconds} (entries without a duration are skipped).
+    """
+    timings = {}
+    for entry in filter(None, (part.strip() for part in (value or '').split(','))):
+        name, *parameters = entry.split(';')
+        for parameter in parameters:
+            key, _, duration = parameter.strip().partition('=')
+            if key == 'dur':
+                try:
+                    timings[name.strip()] = float(duration)
+                except ValueError:
+                    pass
+    return timings
+
+
+def send_request(base_url, kind, body, keep_response=False):
+    """
+    Posts one request to /run_code on a new connection.
+
+    Args:
+        base_url (str): The server.
+        kind (str): The source kind, copied to the outcome.
+        body (bytes): The JSON request body.
+        keep_response (bool, optional): Whether to add the decoded response to the outcome
+            as 'response'. Defaults to False.
+
+    Returns:
+        dict: The outcome: kind, status (0 if the request failed), 'error' (a transport or
+        HTTP error message, or None), 'invalid' (whether the compile reported an error) and
+        'timings' (the server's stage timings in milliseconds).
+    """
+    address = urlsplit(base_url)
+    outcome = {'kind': kind, 'status': 0, 'error': None, 'invalid': False, 'timings': {}}
+    connection = http.client.HTTPConnection(address.hostname, address.port, timeout=REQUEST_TIMEOUT)
+    try:
+        connection.request('POST', address.path.rstrip('/') + '/run_code', body, {'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        payload = response.read()
+        outcome['status'] = response.status
+        outcome['timings'] = parse_server_timing(response.getheader('Server-Timing'))
+        if response.status != 200:
+            outcome['error'] = f"HTTP {response.status}"
+        else:
+            result = json.loads(payload)
+            outcome['invalid'] = 'error' in result
+            if keep_response:
+                outcome['response'] = result
+    except (OSError, http.client.HTTPException, ValueError) as error:
+        outcome['error'] = f"{type(error).__name__}: {error}"
+    finally:
+        connection.close()
+    return outcome
+
+
+# --- Load Steps ---
+
+def run_closed_step(base_url, plan, clients, duration):
+    """
+    Runs 'clients' clients that each send a request as soon as their previous one is answered.
+
+    Returns:
+        tuple: (outcomes with a 'latency' in seconds, elapsed seconds).
+    """
+    outcomes = []
+    start = time.perf_counter()
+    deadline = start + duration
+
+    def client():
+        while time.perf_counter() < deadline:
+            kind, body = plan.next()
+            sent = time.perf_counter()
+            outcome = send_request(base_url, kind, body)
+            outcome['latency'] = time.perf_counter() - sent
+            outcomes.append(outcome)  # list.append is atomic
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes, time.perf_counter() - start
+
+
+def run_open_step(base_url, plan, rate, duration, max_in_flight=64, seed=0):
+    """
+    Sends requests at 'rate' requests per second (exponential gaps) for 'duration' seconds.
+
+    Latency is measured from the time a request was due, not from when a client thread got
+    to send it, so a server that falls behind is charged for the queueing it causes.
+
+    Returns:
+        tuple: (outcomes with a 'latency' in seconds, elapsed seconds).
+    """
+    rng = random.Random(seed)
+    outcomes = []
+
+    def send(kind, body, due):
+        outcome = send_request(base_url, kind, body)
+        outcome['latency'] = time.perf_counter() - due
+        outcomes.append(outcome)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        due = start + rng.expovariate(rate)
+        while due < start + duration:
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            kind, body = plan.next()
+            executor.submit(send, kind, body, due)
+            due += rng.expovariate(rate)
+    return outcomes, time.perf_counter() - start
+
+
+# --- Statistics ---
+
+def percentile(values, fraction):
+    """
+    Returns the nearest-rank percentile of a sorted list (None if it is empty).
+    """
+    if not values:
+        return None
+    rank = max(1, -(-len(values) * fraction // 1))  # ceil(len * fraction), at least 1
+    return values[int(rank) - 1]
+
+
+def latency_summary(seconds):
+    """
+    Summarizes latencies given in seconds as milliseconds: mean, p50, p95, p99 and max.
+    """
+    values = sorted(value * 1000 for value in seconds)
+    summary = {'mean': sum(values) / len(values) if values else None}
+    for rank in PERCENTILES:
+        summary[f"p{rank}"] = percentile(values, rank / 100)
+    summary['max'] = values[-1] if values else None
+    return summary
+
+
+def summarize_step(mode, level, outcomes, elapsed):
+    """
+    Builds the report of one step.
+
+    Args:
+        mode (str): 'closed' or 'open'.
+        level (float): The number of clients, or the request rate.
+        outcomes (list): The outcomes of the step's requests.
+        elapsed (float): The duration of the step in seconds.
+
+    Returns:
+        dict: Request and error counts, throughput (successful requests per second),
+        latency percentiles (ms), latencies per source kind and per-stage server timings (ms).
+    """
+    succeeded = [outcome for outcome in outcomes if outcome['error'] is None]
+    errors = {}
+    for outcome in outcomes:
+        if outcome['error'] is not None:
+            errors[outcome['error']] = errors.get(outcome['error'], 0) + 1
+    stages = {}
+    for outcome in succeeded:
+        for name, milliseconds in outcome['timings'].items():
+            stages.setdefault(name, []).append(milliseconds / 1000)
+    kinds = {}
+    for outcome in succeeded:
+        kinds.setdefault(outcome['kind'], []).append(outcome['latency'])
+    return {
+        'mode': mode,
+        'level': level,
+        'requests': len(outcomes),
+        'succeeded': len(succeeded),
+        'invalid': sum(outcome['invalid'] for outcome in succeeded),
+        'errors': errors,
+        'error_rate': (len(outcomes) - len(succeeded)) / len(outcomes) if outcomes else 0.0,
+        'elapsed': elapsed,
+        'throughput': len(succeeded) / elapsed if elapsed else 0.0,
+        'latency': latency_summary([outcome['latency'] for outcome in succeeded]),
+        'kinds': {kind: dict(latency_summary(values), count=len(values)) for kind, values in sorted(kinds.items())},
+        'stages': {name: dict(latency_summary(values), count=len(values)) for name, values in stages.items()},
+    }
+
+
+def evaluate_slo(steps, slo_p99, max_error_rate):
+    """
+    Marks each step as meeting the SLO or not, and finds the saturation point.
+
+    Returns:
+        dict: 'peak_throughput' (the highest throughput of any step), 'saturation_level'
+        (the level of that step), and 'slo_capacity' / 'slo_level': the highest throughput
+        (and its level) of a step whose p99 and error rate are within the SLO, or None.
+    """
+    for step in steps:
+        p99 = step['latency']['p99']
+        step['meets_slo'] = p99 is not None and p99 <= slo_p99 and step['error_rate'] <= max_error_rate
+    peak = max(steps, key=lambda step: step['throughput'], default=None)
+    passing = max((step for step in steps if step['meets_slo']), key=lambda step: step['throughput'], default=None)
+    return {
+        'slo_p99_ms': slo_p99,
+        'max_error_rate': max_error_rate,
+        'peak_throughput': peak['throughput'] if peak else None,
+        'saturation_level': peak['level'] if peak else None,
+        'slo_capacity': passing['throughput'] if passing else None,
+        'slo_level': passing['level'] if passing else None,
+    }
+
+
+def compare_reports(report, baseline):
+    """
+    Compares the steps of a report with the steps of a baseline report at the same mode and level.
+
+    Returns:
+        list: One dict per matching step: level, and the baseline value, current value and
+        relative change of the throughput and of the p50 and p99 latencies.
+    """
+    previous = {(step['mode'], step['level']): step for step in baseline['steps']}
+    rows = []
+    for step in report['steps']:
+        old = previous.get((step['mode'], step['level']))
+        if old is None:
+            continue
+        row = {'mode': step['mode'], 'level': step['level']}
+        for name, new_value, old_value in (('throughput', step['throughput'], old['throughput']),
+                                           ('p50', step['latency']['p50'], old['latency']['p50']),
+                                           ('p99', step['latency']['p99'], old['latency']['p99'])):
+            change = (new_value - old_value) / old_value if new_value is not None and old_value else None
+            row[name] = {'baseline': old_value, 'current': new_value, 'change': change}
+        rows.append(row)
+    return rows
+
+
+# --- Reports ---
+
+def git_revision():
+    """
+    Returns the short commit hash of the working tree, or None outside a git checkout.
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_load_test(base_url, mode='closed', steps=(1, 2, 4, 8), duration=10.0, mix=None, seed=0,
+                  max_in_flight=64, slo_p99=500.0, max_error_rate=0.01, label=None, progress=None):
+    """
+    Runs one load step per level and builds the report.
+
+    Args:
+        base_url (str): The server, e.g. 'http://127.0.0.1:5000'.
+        mode (str, optional): 'closed' (levels are clients) or 'open' (levels are requests
+            per second). Defaults to 'closed'.
+        steps (iterable, optional): The load levels, in order. Defaults to (1, 2, 4, 8).
+        duration (float, optional): Seconds per step. Defaults to 10.
+        mix (dict, optional): Source kind weights (see parse_mix). Defaults to DEFAULT_MIX.
+        seed (int, optional): Seed of the request plan and arrivals. Defaults to 0.
+        max_in_flight (int, optional): Open-loop requests in flight at most. Defaults to 64.
+        slo_p99 (float, optional): The p99 latency objective in milliseconds. Defaults to 500.
+        max_error_rate (float, optional): The highest acceptable error rate. Defaults to 0.01.
+        label (str, optional): The name of the release. Defaults to the git revision.
+        progress (callable, optional): Called with each step's report when it is done.
+
+    Returns:
+        dict: The report (see summarize_step and evaluate_slo).
+
+    Raises:
+        ValueError: If the mode is unknown.
+    """
+    if mode not in DEFAULT_STEPS:
+        raise ValueError(f"Unknown mode '{mode}' (choose from {', '.join(DEFAULT_STEPS)})")
+    mix = mix or parse_mix(DEFAULT_MIX)
+    plan = RequestPlan(mix, seed)
+    send_request(base_url, *plan.next())  # Warm up (imports, first connection)
+    results = []
+    for index, level in enumerate(steps):
+        if mode == 'closed':
+            outcomes, elapsed = run_closed_step(base_url, plan, int(level), duration)
+        else:
+            outcomes, elapsed = run_open_step(base_url, plan, level, duration, max_in_flight, seed + index)
+        results.append(summarize_step(mode, level, outcomes, elapsed))
+        if progress is not None:
+            progress(results[-1])
+    return {
+        'version': REPORT_VERSION,
+        'label': label or git_revision(),
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'config': {'url': base_url, 'mode': mode, 'steps': list(steps), 'duration': duration, 'mix': mix,
+                   'seed': seed},
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpus': os.cpu_count()},
+        'steps': results,
+        'summary': evaluate_slo(results, slo_p99, max_error_rate),
+    }
+
+
+def _format(value, digits=1):
+    return '-' if value is None else f"{value:.{digits}f}"
+
+
+def _format_change(change):
+    return '-' if change is None else f"{change * 100:+.1f}%"
+
+
+def format_text(report):
+    """
+    Formats a report as a plain-text table.
+    """
+    unit = 'clients' if report['config']['mode'] == 'closed' else 'req/s'
+    lines = [f"{unit:>8} {'requests':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}  SLO"]
+    for step in report['steps']:
+        latency = step['latency']
+        lines.append(f"{step['level']:>8g} {step['requests']:>8} {step['throughput']:>8.1f} {_format(latency['p50']):>8} "
+                     f"{_format(latency['p95']):>8} {_format(latency['p99']):>8} {step['error_rate'] * 100:>6.1f}%  "
+                     f"{'ok' if step['meets_slo'] else 'MISS'}")
+    summary = report['summary']
+    lines.append(f"Peak throughput {_format(summary['peak_throughput'])} req/s at {summary['saturation_level']:g} {unit}; "
+                 f"within the SLO (p99 <= {summary['slo_p99_ms']:g} ms): {_format(summary['slo_capacity'])} req/s")
+    for row in report.get('comparison', []):
+        lines.append(f"vs baseline at {row['level']:g} {unit}: throughput {_format_change(row['throughput']['change'])}, "
+                     f"p50 {_format_change(row['p50']['change'])}, p99 {_format_change(row['p99']['change'])}")
+    return '\n'.join(lines)
+
+
+def _html_table(headers, rows):
+    head = ''.join(f"<th>{html.escape(str(header))}</th>" for header in headers)
+    body = ''.join('<tr>' + ''.join(f"<td>{html.escape(str(cell))}</td>" for cell in row) + '</tr>' for row in rows)
+    return f"<table><tr>{head}</tr>{body}</table>"
+
+
+def format_html(report):
+    """
+    Formats a report as a self-contained HTML page.
+    """
+    unit = 'Clients' if report['config']['mode'] == 'closed' else 'Requests/s'
+    summary = report['summary']
+    sections = [
+        f"<h1>/run_code load test: {html.escape(str(report['label'] or 'unlabeled'))}</h1>",
+        f"<p>{html.escape(report['created'])}, {report['config']['mode']}-loop, {report['config']['duration']:g} s per "
+        f"step, mix {html.escape(json.dumps(report['config']['mix']))}, Python {report['environment']['python']} on "
+        f"{report['environment']['cpus']} CPUs.</p>",
+        f"<p>Peak throughput {_format(summary['peak_throughput'])} req/s at {summary['saturation_level']:g}; within the "
+        f"SLO (p99 &le; {summary['slo_p99_ms']:g} ms, errors &le; {summary['max_error_rate'] * 100:g}%): "
+        f"{_format(summary['slo_capacity'])} req/s.</p>",
+        "<h2>Steps</h2>",
+        _html_table([unit, 'Requests', 'Req/s', 'p50 ms', 'p95 ms', 'p99 ms', 'Max ms', 'Errors', 'Invalid', 'SLO'],
+                    [[f"{step['level']:g}", step['requests'], _format(step['throughput']),
+                      _format(step['latency']['p50']), _format(step['latency']['p95']),
+                      _format(step['latency']['p99']), _format(step['latency']['max']),
+                      f"{step['error_rate'] * 100:.1f}%", step['invalid'], 'ok' if step['meets_slo'] else 'MISS']
+                     for step in report['steps']]),
+        "<h2>Server stages (p50 / p99 ms)</h2>",
+    ]
+    stage_names = sorted({name for step in report['steps'] for name in step['stages']})
+    sections.append(_html_table([unit] + stage_names, [
+        [f"{step['level']:g}"] + [f"{_format(step['stages'][name]['p50'], 2)} / {_format(step['stages'][name]['p99'], 2)}"
+                                  if name in step['stages'] else '-' for name in stage_names]
+        for step in report['steps']]))
+    kinds = sorted({kind for step in report['steps'] for kind in step['kinds']})
+    sections.append("<h2>Sources (count, p50 / p99 ms)</h2>")
+    sections.append(_html_table([unit] + kinds, [
+        [f"{step['level']:g}"] + [f"{step['kinds'][kind]['count']}, {_format(step['kinds'][kind]['p50'])} / "
+                                  f"{_format(step['kinds'][kind]['p99'])}" if kind in step['kinds'] else '-'
+                                  for kind in kinds]
+        for step in report['steps']]))
+    if report.get('comparison'):
+        sections.append(f"<h2>Against {html.escape(str(report.get('baseline_label') or 'the baseline'))}</h2>")
+        sections.append(_html_table([unit, 'Req/s', 'Change', 'p50 ms', 'Change', 'p99 ms', 'Change'], [
+            [f"{row['level']:g}", _format(row['throughput']['current']), _format_change(row['throughput']['change']),
+             _format(row['p50']['current']), _format_change(row['p50']['change']),
+             _format(row['p99']['current']), _format_change(row['p99']['change'])]
+            for row in report['comparison']]))
+    style = ("body{font-family:sans-serif;margin:2em}table{border-collapse:collapse;margin-bottom:1.5em}"
+             "td,th{border:1px solid #ccc;padding:4px 8px;text-align:right}")
+    return (f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>Load test</title><style>{style}</style>"
+            f"</head><body>{''.join(sections)}</body></html>\n")
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description="Load test for /run_code.")
+    argument_parser.add_argument('--mode', choices=sorted(DEFAULT_STEPS), default='closed',
+                                 help="closed: steps are concurrent clients; open: steps are requests per second.")
+    argument_parser.add_argument('--steps', default=None, help="Comma-separated load levels (default: by mode).")
+    argument_parser.add_argument('--duration', type=float, default=10.0, help="Seconds per step.")
+    argument_parser.add_argument('--mix', default=DEFAULT_MIX, help=f"Source kind weights ({', '.join(SOURCES)}).")
+    argument_parser.add_argument('--seed', type=int, default=0)
+    argument_parser.add_argument('--url', default=None, help="Test a running server instead of a local app.py.")
+    argument_parser.add_argument('--server-processes', type=int, default=1,
+                                 help="Requests the local server handles at once, each in a forked process.")
+    argument_parser.add_argument('--max-in-flight', type=int, default=64, help="Open-loop concurrency cap.")
+    argument_parser.add_argument('--slo-p99', type=float, default=500.0, help="p99 latency objective in ms.")
+    argument_parser.add_argument('--max-error-rate', type=float, default=0.01)
+    argument_parser.add_argument('--json', default=None, help="Write the report to this file.")
+    argument_parser.add_argument('--html', default=None, help="Write an HTML report to this file.")
+    argument_parser.add_argument('--baseline', default=None, help="A previous JSON report to compare with.")
+    argument_parser.add_argument('--label', default=None, help="Release name (default: the git revision).")
+    args = argument_parser.parse_args()
+    try:
+        mix = parse_mix(args.mix)
+        steps = [float(level) for level in (args.steps or DEFAULT_STEPS[args.mode]).split(',') if level]
+    except ValueError as error:
+        argument_parser.error(str(error))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        server, base_url = start_local_server(args.server_processes)
+    try:
+        def progress(step):
+            print(f"{step['level']:g}: {step['requests']} requests, {step['throughput']:.1f} req/s, "
+                  f"p99 {_format(step['latency']['p99'])} ms", file=sys.stderr)
+
+        report = run_load_test(base_url, args.mode, steps, args.duration, mix, args.seed, args.max_in_flight,
+                               args.slo_p99, args.max_error_rate, args.label, progress)
+    finally:
+        if server is not None:
+            server.shutdown()
+    if baseline is not None:
+        report['baseline_label'] = baseline.get('label')
+        report['comparison'] = compare_reports(report, baseline)
+    print(format_text(report))
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(report, file, indent=2)
+    if args.html:
+        with open(args.html, 'w') as file:
+            file.write(format_html(report))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+# logsetup.py
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+from diagnostics import logger
+
+# --- Log Handler ---
+#
+# The entry points (app.py, async_server.py, cli.py) call configure_logging() to install a
+# handler on the 'compiler' logger that hands records to a background thread through a
+# bounded queue (so a slow stderr never blocks a compile) and drops them when they arrive
+# faster than the rate limit. Importing the compiler itself leaves logging alone.
+
+QUEUE_SIZE = 10000  # Log records waiting for the background thread
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket filter: lets through at most 'burst' records at once and 'rate' records
+    per second on average, and notes the number of dropped records on the next one let through.
+    """
+    def __init__(self, rate=50.0, burst=200):
+        """
+        Initializes the filter.
+
+        Args:
+            rate (float, optional): Records per second on average. Defaults to 50.
+            burst (int, optional): Maximum number of records let through at once. Defaults to 200.
+        """
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.suppressed = 0  # Records dropped since the last one let through
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                self.suppressed += 1
+                return False
+            self.tokens -= 1
+            suppressed, self.suppressed = self.suppressed, 0
+        if suppressed:
+            record.msg = f"{record.getMessage()} ({suppressed} earlier messages suppressed)"
+            record.args = None
+        return True
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to a QueueListener thread that writes them to the target handlers.
+    Records are dropped when the queue is full. The listener is (re)started lazily in
+    each process, since threads do not survive a fork (e.g., in a worker pool).
+    """
+    def __init__(self, *targets, maxsize=QUEUE_SIZE):
+        """
+        Initializes the handler.
+
+        Args:
+            *targets (logging.Handler): The handlers that write the records.
+            maxsize (int, optional): Maximum number of queued records. Defaults to QUEUE_SIZE.
+        """
+        super().__init__(queue.Queue(maxsize))
+        self.targets = targets
+        self.listener = None
+        self.pid = None  # Process in which the listener runs
+        self.dropped = 0  # Records dropped because the queue was full
+
+    def enqueue(self, record):
+        # Called with the handler lock held, so the listener is started only once.
+        if self.pid != os.getpid():
+            self._start_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start_listener(self):
+        # A queue inherited from the parent process may hold records (and a lock) of another thread.
+        self.queue = queue.Queue(self.queue.maxsize)
+        self.listener = logging.handlers.QueueListener(self.queue, *self.targets, respect_handler_level=True)
+        self.listener.start()
+        self.pid = os.getpid()
+
+    def close(self):
+        # Called by logging.shutdown() at exit: write out the queued records.
+        if self.listener is not None and self.pid == os.getpid():
+            self.listener.stop()
+            self.listener = None
+        super().close()
+
+
+def configure_logging(level=None, stream=None):
+    """
+    Installs the queue-based, rate-limited handler on the 'compiler' logger (once).
+
+    Args:
+        level (int or str, optional): The log level. Defaults to $COMPILE_LOG_LEVEL or WARNING.
+        stream (file, optional): Where records are written. Defaults to sys.stderr.
+
+    Returns:
+        logging.Logger: The 'compiler' logger.
+    """
+    logger.setLevel(level or os.environ.get('COMPILE_LOG_LEVEL', 'WARNING').upper())
+    if not any(isinstance(handler, AsyncQueueHandler) for handler in logger.handlers):
+        target = logging.StreamHandler(stream or sys.stderr)
+        target.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+        handler = AsyncQueueHandler(target)
+        handler.addFilter(RateLimitFilter())
+        logger.addHandler(handler)
+        logger.propagate = False
+    return logger
+
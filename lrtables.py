@@ -0,0 +1,294 @@
+# lrtables.py
+import dis
+from array import array
+
+import parser as grammar
+from lexer import lexer as default_lexer
+
+# --- Dense LR Tables ---
+#
+# build_tables() reads the LALR tables that PLY generated for parser.py and re-encodes them
+# as flat integer arrays indexed by state * width + symbol column, instead of one dict per
+# state. TableParser drives them with a loop specialized for this grammar:
+#   - tokens are shifted as they are (no wrapper objects), and reductions reuse a single
+#     production object instead of allocating a symbol and a slice per reduction;
+#   - rules whose action is 'p[0] = p[1]' (expression : binary_expression, statement :
+#     block, ...) or 'p[0] = None' are detected from their bytecode and never called: a unit
+#     rule only replaces the state on top of the stack;
+#   - PLY's default reductions are kept, so tokens are requested at the same moments.
+# The grammar functions of parser.py run unchanged. On a syntax error, the tokens read so far
+# are replayed into the PLY parser, which reports the errors and recovers exactly as before.
+
+ERROR = 0x7fffffff  # Action of an invalid (state, token) pair
+END = '$end'
+
+# Kinds of reductions
+CALL, PASS, NONE = range(3)
+
+
+def _instructions(function):
+    return [(instruction.opname, instruction.argval) for instruction in dis.get_instructions(function)
+            if instruction.opname not in ('RESUME', 'NOP')]
+
+
+def _pass_through(p):
+    p[0] = p[1]
+
+
+def _none(p):
+    p[0] = None
+
+
+PASS_THROUGH_CODE = _instructions(_pass_through)
+NONE_CODE = _instructions(_none)
+
+
+def reduction_kind(function):
+    """
+    Classifies a grammar function by what it does: PASS for 'p[0] = p[1]', NONE for
+    'p[0] = None' and CALL for anything else (comments and docstrings are ignored).
+    """
+    code = _instructions(function)
+    if code == PASS_THROUGH_CODE:
+        return PASS
+    if code == NONE_CODE:
+        return NONE
+    return CALL
+
+
+class DenseTables:
+    """
+    The LALR tables of a PLY parser as flat integer arrays.
+    """
+    def __init__(self, lr_parser):
+        """
+        Encodes the tables of a PLY parser.
+
+        Args:
+            lr_parser (ply.yacc.LRParser): The parser built by yacc.yacc().
+        """
+        states = len(lr_parser.action)
+        terminals = sorted({name for actions in lr_parser.action.values() for name in actions})
+        nonterminals = sorted({production.name for production in lr_parser.productions})
+        self.columns = {name: column for column, name in enumerate(terminals)}  # Token type -> column
+        self.nonterminals = {name: column for column, name in enumerate(nonterminals)}
+        self.width = len(terminals)
+        self.goto_width = len(nonterminals)
+
+        # Shift to state s: s (> 0); reduce by rule r: -r; accept: 0; error: ERROR.
+        self.action = array('i', [ERROR]) * (states * self.width)
+        for state, actions in lr_parser.action.items():
+            for name, value in actions.items():
+                self.action[state * self.width + self.columns[name]] = value
+        self.goto = array('i', [-1]) * (states * self.goto_width)
+        for state, gotos in lr_parser.goto.items():
+            for name, target in gotos.items():
+                self.goto[state * self.goto_width + self.nonterminals[name]] = target
+        # The reduction of a state that reduces whatever the lookahead is (0 for none).
+        self.defaults = array('i', [0]) * states
+        for state, value in lr_parser.defaulted_states.items():
+            self.defaults[state] = value
+
+        # Per rule: (length, left-hand side column, kind, grammar function, right-hand side names)
+        self.rules = []
+        for production in lr_parser.productions:
+            function = production.callable
+            kind = reduction_kind(function) if function is not None else NONE
+            right = production.str.split('->', 1)[1].split() if '->' in production.str else []
+            self.rules.append((production.len, self.nonterminals[production.name], kind, function, right))
+
+
+def build_tables(lr_parser=None):
+    """
+    Builds the dense tables of a PLY parser.
+
+    Args:
+        lr_parser (ply.yacc.LRParser, optional): The parser. Defaults to the parser of parser.py.
+
+    Returns:
+        DenseTables: The tables.
+    """
+    return DenseTables(lr_parser or grammar.parser)
+
+
+# --- Parsing ---
+
+class Symbol:
+    """
+    A nonterminal as seen through Production.slice (PLY's YaccSymbol interface).
+    """
+    def __init__(self, type, value):
+        self.type = type
+        self.value = value
+
+
+class Production:
+    """
+    The argument passed to the grammar functions of parser.py (PLY's YaccProduction interface).
+    One instance is reused for every reduction of a parse.
+    """
+    __slots__ = ('values', 'tokens', 'base', 'length', 'right', 'result', 'lexer', 'slice')
+
+    def __init__(self, values, tokens, lexer):
+        self.values = values  # Values of the stack symbols
+        self.tokens = tokens  # Tokens of the stack symbols (None for nonterminals)
+        self.base = 0  # Stack index of the first right-hand side symbol
+        self.length = 0
+        self.right = ()
+        self.result = None
+        self.lexer = lexer
+        self.slice = SymbolView(self)
+
+    def __getitem__(self, n):
+        return self.values[self.base + n - 1] if n else self.result
+
+    def __setitem__(self, n, value):
+        if n:
+            self.values[self.base + n - 1] = value
+        else:
+            self.result = value
+
+    def __len__(self):
+        return self.length + 1
+
+    def lineno(self, n):
+        token = self.tokens[self.base + n - 1] if n else None
+        return token.lineno if token is not None else 0  # Nonterminals have no position
+
+    def lexpos(self, n):
+        token = self.tokens[self.base + n - 1] if n else None
+        return token.lexpos if token is not None else 0
+
+
+class SymbolView:
+    """
+    The symbols of the rule being reduced: tokens for terminals, Symbol objects for nonterminals.
+    """
+    __slots__ = ('production',)
+
+    def __init__(self, production):
+        self.production = production
+
+    def __getitem__(self, n):
+        production = self.production
+        if n == 0:
+            return Symbol(None, production.result)
+        token = production.tokens[production.base + n - 1]
+        if token is None:
+            return Symbol(production.right[n - 1], production.values[production.base + n - 1])
+        return token
+
+
+class TableParser:
+    """
+    A drop-in replacement for the PLY parser object of parser.py that runs on dense tables.
+    """
+    def __init__(self, tables=None):
+        self.tables = tables or build_tables()
+        # The driver reads lists: indexing an array creates an int object per read.
+        self._action = self.tables.action.tolist()
+        self._goto = self.tables.goto.tolist()
+        self._defaults = self.tables.defaults.tolist()
+
+    def parse(self, input=None, lexer=None, tokenfunc=None, **kwargs):
+        """
+        Parses a program, with the same arguments and result as the PLY parser's parse().
+
+        Args:
+            input (str, optional): The source code; when None, the lexer's current input is parsed.
+            lexer (optional): The lexer. Defaults to the module-level lexer of lexer.py.
+            tokenfunc (callable, optional): The token source. Defaults to lexer.token.
+
+        Returns:
+            Program: The root of the AST, or None if the program could not be parsed.
+        """
+        lexer = lexer or default_lexer
+        if input is not None:
+            lexer.input(input)
+        get_token = tokenfunc or lexer.token
+        tables = self.tables
+        action, goto, defaults, rules = self._action, self._goto, self._defaults, tables.rules
+        columns, width, goto_width = tables.columns, tables.width, tables.goto_width
+        end_column = columns[END]
+
+        history = []  # Every token read, for replaying into the PLY parser
+        states = [0]
+        values = [None]
+        tokens = [None]
+        production = Production(values, tokens, lexer)
+        push_state, push_value, push_token = states.append, values.append, tokens.append
+        state = 0
+        lookahead = None
+        column = 0
+        while True:
+            t = defaults[state]
+            if not t:
+                if lookahead is None:
+                    lookahead = get_token()
+                    if lookahead is None:
+                        column = end_column
+                    else:
+                        history.append(lookahead)
+                        column = columns.get(lookahead.type, -1)
+                t = action[state * width + column] if column >= 0 else ERROR
+            if 0 < t < ERROR:
+                # Shift
+                push_state(t)
+                push_value(lookahead.value)
+                push_token(lookahead)
+                state = t
+                lookahead = None
+                continue
+            if t < 0:
+                length, left, kind, function, right = rules[-t]
+                if kind == PASS and length == 1:
+                    # A unit rule: the value stays, only the state changes.
+                    state = goto[states[-2] * goto_width + left]
+                    states[-1] = state
+                    tokens[-1] = None
+                    continue
+                if kind == CALL:
+                    production.base = len(states) - length
+                    production.length = length
+                    production.right = right
+                    production.result = None
+                    try:
+                        function(production)
+                    except SyntaxError:
+                        break  # A grammar function asked for error recovery
+                    value = production.result
+                else:
+                    value = values[-length] if kind == PASS else None
+                if length:
+                    del states[-length:]
+                    del values[-length:]
+                    del tokens[-length:]
+                state = goto[states[-1] * goto_width + left]
+                push_state(state)
+                push_value(value)
+                push_token(None)
+                continue
+            if t == 0:
+                return values[-1]
+            break  # Syntax error
+
+        replayed = iter(history)
+
+        def replay():
+            for token in replayed:
+                return token
+            return get_token()
+        return grammar.parser.parse(lexer=lexer, tokenfunc=replay)
+
+
+table_parser = None  # Built on first use (see get_table_parser)
+
+
+def get_table_parser():
+    """
+    Returns the shared TableParser, building its tables on first use.
+    """
+    global table_parser
+    if table_parser is None:
+        table_parser = TableParser()
+    return table_parser
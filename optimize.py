@@ -0,0 +1,371 @@
+# optimize.py
+import math
+from array import array
+
+from ir import CONST, COPY, CAST, DIV, GET_GLOBAL, SET_GLOBAL, CALL, JUMP, BRANCH, BINARY, USES_A, \
+    USES_B, FLOATING_TYPES, TERMINATORS, ExecutionError, fold
+
+# --- Optimizations on SSA Form ---
+#
+# optimize_function() runs, in order:
+#   - sparse conditional constant propagation, which also folds branches on constants and
+#     removes the code they make unreachable;
+#   - copy propagation, which also removes phi functions whose operands are all the same;
+#   - dead-code elimination, which keeps the instructions with effects (stores to globals,
+#     calls, terminators and integer divisions that may trap) and what they depend on;
+#   - control-flow simplification, which bypasses empty blocks and merges straight-line chains.
+# The result computes the same values and effects as the input (see ir.fold).
+
+UNKNOWN = object()  # Lattice top: no value seen yet
+VARYING = object()  # Lattice bottom: not a constant
+
+
+def same_constant(a, b):
+    """
+    Returns True if two constants are the same (distinguishing 0.0 from -0.0; NaN is never the same).
+    """
+    if type(a) is not type(b) or a != b:
+        return False
+    return not isinstance(a, float) or math.copysign(1.0, a) == math.copysign(1.0, b)
+
+
+def operands(function, op, a, b):
+    """
+    Returns the values used by an instruction.
+    """
+    values = []
+    if op in USES_A and a >= 0:
+        values.append(a)
+    if op in USES_B:
+        values.append(b)
+    elif op == CALL:
+        values.extend(function.argument_lists[b])
+    return values
+
+
+def remove_instructions(block, keep):
+    """
+    Rebuilds the code of a block with only the instructions for which keep(op, dest, a, b) is true.
+    """
+    code = array('q')
+    for instruction in block.instructions():
+        if keep(*instruction):
+            code.extend(instruction)
+    block.code = code
+
+
+# --- Constant Propagation ---
+
+def propagate_constants(function):
+    """
+    Sparse conditional constant propagation (Wegman and Zadeck): finds the values that are
+    constant on every executable path, replaces their definitions with constants and removes
+    the branches and blocks that can never execute.
+
+    Args:
+        function (Function): The function, in SSA form.
+
+    Returns:
+        bool: True if the function changed.
+    """
+    types = function.types
+    state = [UNKNOWN] * len(types)
+    for param in function.params:
+        state[param] = VARYING
+    users = [[] for _ in types]  # Blocks that use each value
+    for block in function.blocks:
+        for _, values in block.phis:
+            for value in values:
+                users[value].append(block)
+        for op, _, a, b in block.instructions():
+            for value in operands(function, op, a, b):
+                users[value].append(block)
+
+    executable = {function.entry.index}
+    edges = set()  # Executable edges (source index, target index)
+    pending = [function.entry]
+    queued = {function.entry.index}
+
+    def update(value, new):
+        old = state[value]
+        if old is VARYING or new is UNKNOWN or (old is not UNKNOWN and new is not VARYING and same_constant(old, new)):
+            return
+        state[value] = new if old is UNKNOWN else VARYING
+        for user in users[value]:
+            if user.index in executable and user.index not in queued:
+                queued.add(user.index)
+                pending.append(user)
+
+    def mark_edge(source, target):
+        if (source.index, target.index) in edges:
+            return
+        edges.add((source.index, target.index))
+        executable.add(target.index)
+        if target.index not in queued:
+            queued.add(target.index)
+            pending.append(target)
+
+    while pending:
+        block = pending.pop()
+        queued.discard(block.index)
+        for dest, values in block.phis:
+            result = UNKNOWN
+            for predecessor, value in zip(block.predecessors, values):
+                if (predecessor.index, block.index) not in edges or state[value] is UNKNOWN:
+                    continue
+                if state[value] is VARYING or (result is not UNKNOWN and not same_constant(result, state[value])):
+                    result = VARYING
+                    break
+                result = state[value]
+            update(dest, result)
+        for op, dest, a, b in block.instructions():
+            if op == CONST:
+                update(dest, function.constants[a])
+            elif op in BINARY or op == COPY or op == CAST:
+                inputs = [state[a]] if op in (COPY, CAST) else [state[a], state[b]]
+                if any(value is VARYING for value in inputs):
+                    update(dest, VARYING)
+                elif all(value is not UNKNOWN for value in inputs):
+                    try:
+                        update(dest, fold(op, types[dest], *inputs))
+                    except ExecutionError:
+                        update(dest, VARYING)  # Left for the evaluation to report
+            elif op in (GET_GLOBAL, CALL):
+                if dest >= 0:
+                    update(dest, VARYING)
+            elif op == JUMP:
+                mark_edge(block, block.successors[0])
+            elif op == BRANCH:
+                condition = state[a]
+                if condition is VARYING:
+                    mark_edge(block, block.successors[0])
+                    mark_edge(block, block.successors[1])
+                elif condition is not UNKNOWN:
+                    mark_edge(block, block.successors[0 if condition else 1])
+
+    # Rewrite: constants replace their definitions, and branches on constants become jumps.
+    changed = False
+    for block in function.blocks:
+        if block.index not in executable:
+            continue
+        prologue = array('q')
+        phis = []
+        for phi in block.phis:
+            value = state[phi[0]]
+            if value is UNKNOWN or value is VARYING:
+                phis.append(phi)
+            else:
+                prologue.extend((CONST, phi[0], function.constant(value), -1))
+        block.phis = phis
+        code = array('q')
+        for op, dest, a, b in block.instructions():
+            if op in BINARY or op == COPY or op == CAST:
+                value = state[dest]
+                if value is not UNKNOWN and value is not VARYING:
+                    op, a, b = CONST, function.constant(value), -1
+                    changed = True
+            elif op == BRANCH and state[a] is not UNKNOWN and state[a] is not VARYING:
+                taken = block.successors[0 if state[a] else 1]
+                for successor in block.successors:
+                    if successor is not taken:
+                        successor.remove_predecessor(block)
+                block.successors = [taken]
+                op, a = JUMP, -1
+                changed = True
+            code.extend((op, dest, a, b))
+        block.code = prologue + code
+        changed = changed or len(prologue) > 0
+    count = len(function.blocks)
+    function.remove_unreachable()
+    return changed or len(function.blocks) != count
+
+
+# --- Copy Propagation ---
+
+def propagate_copies(function):
+    """
+    Replaces the uses of copies (and of casts to the same type) with their source, and removes
+    phi functions whose operands are all the same value (or the phi itself).
+
+    Args:
+        function (Function): The function, in SSA form.
+
+    Returns:
+        bool: True if the function changed.
+    """
+    types = function.types
+    replacement = {}
+
+    def find(value):
+        root = value
+        while root in replacement:
+            root = replacement[root]
+        while value != root:  # Path compression
+            following = replacement[value]
+            replacement[value] = root
+            value = following
+        return root
+
+    changed = True
+    while changed:
+        changed = False
+        for block in function.blocks:
+            phis = []
+            for dest, values in block.phis:
+                sources = {find(value) for value in values} - {dest}
+                if len(sources) == 1:
+                    replacement[dest] = sources.pop()
+                    changed = True
+                else:
+                    phis.append([dest, values])
+            block.phis = phis
+            for op, dest, a, b in block.instructions():
+                if (op == COPY or (op == CAST and types[dest] == types[find(a)])) and dest not in replacement \
+                        and find(a) != dest:  # A copy of a phi that only merges the copy itself
+                    replacement[dest] = find(a)
+                    changed = True
+    if not replacement:
+        return False
+    for block in function.blocks:
+        remove_instructions(block, lambda op, dest, a, b: dest not in replacement or op not in (COPY, CAST))
+    function.map_values(find)
+    return True
+
+
+# --- Dead-Code Elimination ---
+
+def eliminate_dead_code(function):
+    """
+    Removes the instructions and phi functions whose values are never used by an instruction
+    with effects (a store to a global, a call, a terminator or a division that may trap).
+
+    Args:
+        function (Function): The function, in SSA form.
+
+    Returns:
+        bool: True if the function changed.
+    """
+    types = function.types
+    constants = {}  # Values defined by CONST
+    definitions = {}  # Maps each value to the values its definition uses
+    critical = []
+    for block in function.blocks:
+        for dest, values in block.phis:
+            definitions[dest] = values
+        for op, dest, a, b in block.instructions():
+            if op == CONST:
+                constants[dest] = function.constants[a]
+            used = operands(function, op, a, b)
+            if dest >= 0:
+                definitions[dest] = used
+            if op in TERMINATORS or op in (SET_GLOBAL, CALL):
+                critical.extend(used)
+    # Integer divisions by a value that may be zero keep their error.
+    for block in function.blocks:
+        for op, dest, a, b in block.instructions():
+            if op == DIV and types[dest] not in FLOATING_TYPES and not constants.get(b):
+                critical.extend((dest, a, b))
+
+    live = set()
+    pending = critical
+    while pending:
+        value = pending.pop()
+        if value not in live:
+            live.add(value)
+            pending.extend(definitions.get(value, ()))
+
+    changed = False
+    for block in function.blocks:
+        size = len(block.code) + len(block.phis)
+        block.phis = [phi for phi in block.phis if phi[0] in live]
+        remove_instructions(block, lambda op, dest, a, b: dest < 0 or dest in live or op == CALL)
+        changed = changed or len(block.code) + len(block.phis) != size
+    return changed
+
+
+# --- Control-Flow Simplification ---
+
+def simplify_cfg(function):
+    """
+    Bypasses blocks that only jump to a block without phi functions, then merges each block
+    that ends with a jump into a successor that has no other predecessor.
+
+    Args:
+        function (Function): The function, in SSA form.
+
+    Returns:
+        bool: True if the function changed.
+    """
+    changed = False
+    for block in function.blocks:
+        if block is function.entry or block.phis or len(block.code) != 4 or block.code[0] != JUMP:
+            continue
+        target = block.successors[0]
+        if target is block or target.phis:
+            continue
+        for predecessor in list(block.predecessors):
+            if target in predecessor.successors:
+                continue  # Would duplicate an edge
+            predecessor.successors[predecessor.successors.index(block)] = target
+            block.predecessors.remove(predecessor)
+            target.predecessors.append(predecessor)
+            changed = True
+
+    merged = set()
+    for block in function.blocks:
+        if block.index in merged:
+            continue
+        while block.terminated and block.code[-4] == JUMP:
+            successor = block.successors[0]
+            if successor is block or successor is function.entry or len(successor.predecessors) != 1:
+                break
+            code = block.code[:-4]
+            for dest, values in successor.phis:
+                code.extend((COPY, dest, values[0], -1))
+            block.code = code + successor.code
+            block.successors = successor.successors
+            for target in block.successors:
+                target.predecessors[target.predecessors.index(successor)] = block
+            successor.successors, successor.predecessors = [], []
+            merged.add(successor.index)
+            changed = True
+    count = len(function.blocks)
+    function.remove_unreachable()
+    return changed or len(function.blocks) != count
+
+
+def optimize_function(function, rounds=4):
+    """
+    Optimizes a function in SSA form, repeating the passes until nothing changes (at most 'rounds' times).
+
+    Args:
+        function (Function): The function.
+        rounds (int, optional): Maximum number of rounds. Defaults to 4.
+
+    Returns:
+        Function: The same function.
+    """
+    for _ in range(rounds):
+        changed = propagate_constants(function)
+        changed = propagate_copies(function) or changed
+        changed = eliminate_dead_code(function) or changed
+        changed = simplify_cfg(function) or changed
+        if not changed:
+            break
+    propagate_copies(function)  # Copies left by merged phi functions
+    return function
+
+
+def optimize_program(program):
+    """
+    Optimizes every function of a program in SSA form.
+
+    Args:
+        program (ir.Program): The program.
+
+    Returns:
+        ir.Program: The same program.
+    """
+    for function in program.all_functions():
+        optimize_function(function)
+    return program
@@ -0,0 +1,228 @@
+# outline.py
+import re
+
+from ply.lex import LexToken
+
+from lexer import lexer, reset_lexer, lexical_errors
+from parser import parser, syntax_errors
+from syntax_tree import FunctionDefinition, Declaration
+
+# --- Lazy Parsing ---
+#
+# parse_outline() parses only the top level of a program: global declarations and function
+# headers. While the parser reads the tokens, the body of each function definition is skipped
+# with a brace-matching scan that never builds tokens, so the parser only sees an empty
+# block. Each FunctionDefinition is then a LazyFunctionDefinition that remembers the byte
+# range of its body and parses it the first time its 'body' attribute is read, with the
+# same lexer, parser and intern table as the outline, so line numbers and columns are the
+# same as in a full parse. (Symbol ids are consistent within the program, but names first
+# seen in a body are numbered in the order the bodies are parsed.) Outline queries (see
+# outline_entries) never read the bodies; the semantic analysis reads them all.
+
+# Everything in a body that can hide or be a brace: comments, character literals ('{' and
+# '}' are valid literals) and the braces themselves. Block comments are closed with str.find,
+# as in lexer.t_COMMENT.
+BRACE_SCAN = re.compile(r"//[^\n]*|/\*|'(?:\\[^\n]|[^'\\\n])'|[{}]")
+
+
+def match_brace(code, start):
+    """
+    Finds the brace that closes a block.
+
+    Args:
+        code (str): The source code.
+        start (int): The position just after the opening brace.
+
+    Returns:
+        int: The position of the closing brace, or -1 if the block is never closed.
+    """
+    depth = 1
+    position = start
+    while True:
+        match = BRACE_SCAN.search(code, position)
+        if match is None:
+            return -1
+        text = match.group()
+        position = match.end()
+        if text == '{':
+            depth += 1
+        elif text == '}':
+            depth -= 1
+            if depth == 0:
+                return match.start()
+        elif text == '/*':
+            end = code.find('*/', position)
+            if end == -1:
+                return -1
+            position = end + 2
+
+
+def synthetic_token(type, value, lineno, lexpos, symbol_id=None):
+    """
+    Creates a token that is not read from the source (see parse_body).
+    """
+    token = LexToken()
+    token.type, token.value, token.lineno, token.lexpos = type, value, lineno, lexpos
+    if symbol_id is not None:
+        token.symbol_id = symbol_id
+    return token
+
+
+class LazyFunctionDefinition(FunctionDefinition):
+    """
+    A function definition whose body is parsed the first time it is read.
+    """
+    def __init__(self, definition, code, body_start, body_end, body_lineno, symbols):
+        """
+        Initializes the definition from the one built by the outline parse.
+
+        Args:
+            definition (FunctionDefinition): The definition built with an empty body.
+            code (str): The source code of the program.
+            body_start (int): The position of the body's opening brace.
+            body_end (int): The position just after the body's closing brace.
+            body_lineno (int): The line of the body's opening brace.
+            symbols (InternTable): The intern table of the outline.
+        """
+        super().__init__(definition.return_type, definition.name, definition.params, None, definition.symbol_id)
+        self.lineno = definition.lineno
+        self.lexpos = definition.lexpos
+        self._code = code
+        self._body_range = (body_start, body_end, body_lineno)
+        self._symbols = symbols
+        self.errors = []  # Lexical and syntax errors of the body, once it is parsed
+
+    @property
+    def body(self):
+        if self._body is None and self._body_range is not None:
+            self._body, self.errors = parse_body(self, self._code, *self._body_range, self._symbols)
+            self._body_range = None  # Parsed once, even if it has errors
+        return self._body
+
+    @body.setter
+    def body(self, value):
+        self._body = value
+
+    @property
+    def parsed(self):
+        """
+        True once the body has been parsed.
+        """
+        return self._body_range is None
+
+    def materialize(self):
+        """
+        Returns an equivalent plain FunctionDefinition (parsing the body if needed).
+        """
+        definition = FunctionDefinition(self.return_type, self.name, self.params, self.body, self.symbol_id)
+        definition.lineno, definition.lexpos = self.lineno, self.lexpos
+        return definition
+
+
+def parse_body(definition, code, start, end, lineno, symbols):
+    """
+    Parses the body of a function. The parser is fed a header for the function followed by
+    the tokens of the body, read from the full source so that positions are unchanged.
+
+    Args:
+        definition (FunctionDefinition): The function.
+        code (str): The source code of the program.
+        start (int): The position of the body's opening brace.
+        end (int): The position just after the body's closing brace.
+        lineno (int): The line of the opening brace.
+        symbols (InternTable): The intern table of the program.
+
+    Returns:
+        tuple: (Block or None, list of lexical and syntax error messages).
+    """
+    header = [
+        synthetic_token('TYPE', definition.return_type, lineno, start),
+        synthetic_token('ID', definition.name, lineno, start, definition.symbol_id),
+        synthetic_token('LPAREN', '(', lineno, start),
+        synthetic_token('RPAREN', ')', lineno, start),
+    ]
+    lexical_errors.clear()
+    syntax_errors.clear()
+    lexer.input(code)
+    lexer.lexpos = start
+    lexer.lineno = lineno
+    lexer.intern_table = symbols
+
+    def next_token():
+        if header:
+            return header.pop(0)
+        if lexer.lexpos >= end:
+            return None
+        return lexer.token()
+
+    program = parser.parse(lexer=lexer, tokenfunc=next_token)
+    errors = list(lexical_errors) + list(syntax_errors)
+    if program is None or not program.declarations:
+        return None, errors
+    return program.declarations[0].body, errors
+
+
+def parse_outline(code):
+    """
+    Parses the global declarations and function headers of a program, leaving the function
+    bodies to be parsed on demand.
+
+    Args:
+        code (str): The source code.
+
+    Returns:
+        tuple: (program, errors) where program is a Program whose function definitions are
+        LazyFunctionDefinition nodes (None if the outline has errors), and errors is a list
+        of the lexical and syntax error messages found outside the function bodies.
+    """
+    reset_lexer(lexer)
+    syntax_errors.clear()
+    lexer.input(code)
+    bodies = []  # (start, end, lineno) of each skipped body, in order
+    previous = [None]
+
+    def next_token():
+        token = lexer.token()
+        if token is not None and token.type == 'LBRACE' and previous[0] == 'RPAREN':
+            # A function body: skip to its closing brace, counting the lines in between.
+            close = match_brace(code, token.lexpos + 1)
+            if close == -1:
+                lexer.lexpos = len(code)  # Reported by the parser as a syntax error at EOF
+            else:
+                lexer.lineno += code.count('\n', token.lexpos, close)
+                lexer.lexpos = close
+                bodies.append((token.lexpos, close + 1, token.lineno))
+        previous[0] = token.type if token is not None else None
+        return token
+
+    program = parser.parse(lexer=lexer, tokenfunc=next_token)
+    errors = list(lexical_errors) + list(syntax_errors)
+    if errors or program is None:
+        return None, errors
+    symbols = lexer.intern_table
+    body_ranges = iter(bodies)
+    for index, declaration in enumerate(program.declarations):
+        if isinstance(declaration, FunctionDefinition):
+            program.declarations[index] = LazyFunctionDefinition(declaration, code, *next(body_ranges), symbols)
+    return program, []
+
+
+def outline_entries(program):
+    """
+    Lists the top-level declarations of a program, without parsing any function body.
+
+    Args:
+        program (Program): A program returned by parse_outline (or any AST).
+
+    Returns:
+        list: One dict per declaration: {'kind': 'function', 'name', 'returnType', 'params'}
+        with params as [type, name] pairs, or {'kind': 'variable', 'name', 'type'}.
+    """
+    entries = []
+    for declaration in program.declarations:
+        if isinstance(declaration, FunctionDefinition):
+            entries.append({'kind': 'function', 'name': declaration.name, 'returnType': declaration.return_type,
+                            'params': [[param.param_type, param.name] for param in declaration.params]})
+        elif isinstance(declaration, Declaration):
+            entries.append({'kind': 'variable', 'name': declaration.name, 'type': declaration.data_type})
+    return entries
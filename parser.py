@@ -1,13 +1,72 @@
+import hashlib
+import os
+import sys
 import ply.yacc as yacc
-from lexer import lexer, tokens  # Import the lexer and the defined tokens
+from lexer import lexer, tokens, find_column  # Import the lexer and the defined tokens
+from diagnostics import Diagnostics
 from syntax_tree import * # Import the AST node classes
 
 # Global flags and lists for error handling
 parsing_error = False  # Flag to indicate if a parsing error has occurred
-syntax_errors = [] # List to store the messages of syntax errors found
+syntax_errors = Diagnostics('syntax errors') # List to store the messages of syntax errors found (capped per compilation)
 
 tokens = tokens  # Re-declare tokens to be accessible within this module (though imported)
 
+# --- Node Factory ---
+
+class NodeFactory:
+    """
+    Builds the AST nodes requested by the grammar actions below.
+    The default factory creates the classes from syntax_tree directly. Alternative
+    representations (e.g., flat_ast.FlatASTBuilder) provide the same methods and are
+    installed with set_node_factory().
+    """
+    Program = Program
+    FunctionDefinition = FunctionDefinition
+    Parameter = Parameter
+    Block = Block
+    Declaration = Declaration
+    Assignment = Assignment
+    ReturnStatement = ReturnStatement
+    IfStatement = IfStatement
+    ForStatement = ForStatement
+    WhileStatement = WhileStatement
+    BinaryExpression = BinaryExpression
+    Identifier = Identifier
+    Literal = Literal
+    EmptyStatement = EmptyStatement
+    CallExpression = CallExpression
+
+    def set_position(self, node, lineno, lexpos=None):
+        """
+        Records the source position of a node.
+
+        Args:
+            node: The node returned by one of the factory methods.
+            lineno (int): The line number in the source code.
+            lexpos (int, optional): The lexical position. Left unchanged when None.
+        """
+        node.lineno = lineno
+        if lexpos is not None:
+            node.lexpos = lexpos
+
+node_factory = NodeFactory()  # The factory currently used by the grammar actions
+
+def set_node_factory(factory):
+    """
+    Installs the factory used by the grammar actions to build nodes.
+
+    Args:
+        factory: An object with the same methods as NodeFactory, or None to restore the default.
+
+    Returns:
+        The previously installed factory, so callers can restore it afterwards.
+    """
+    global node_factory
+    previous = node_factory
+    node_factory = factory if factory is not None else NodeFactory()
+    return previous
+
 # Operator precedence (lowest to highest)
 # This tuple defines the order in which operators are evaluated.
 # Operators in the same tuple have the same precedence and are evaluated left to right (unless specified otherwise).
@@ -28,7 +87,7 @@ def p_program(p):
     # Rule for the top-level program structure: it consists of a translation unit.
     # p[0] represents the result of this production (a Program node).
     # p[1] represents the result of the 'translation_unit' production.
-    p[0] = Program(p[1])
+    p[0] = node_factory.Program(p[1], p.lexer.intern_table)
 
 def p_translation_unit(p):
     '''translation_unit : external_declaration
@@ -55,7 +114,7 @@ def p_function_definition(p):
     # p[2]: ID (function name)
     # p[4]: parameter_list_opt (list of Parameter nodes)
     # p[6]: block (Block node representing the function body)
-    p[0] = FunctionDefinition(p[1], p[2], p[4], p[6])
+    p[0] = node_factory.FunctionDefinition(p[1], p[2], p[4], p[6], p.slice[2].symbol_id)
 
 def p_parameter_list_opt(p):
     '''parameter_list_opt : parameter_list
@@ -79,7 +138,7 @@ def p_parameter(p):
     # Rule for a single parameter: specifies the type and the identifier (name) of the parameter.
     # p[1]: TYPE
     # p[2]: ID
-    p[0] = Parameter(p[1], p[2])
+    p[0] = node_factory.Parameter(p[1], p[2], p.slice[2].symbol_id)
 
 # --- Blocks ---
 
@@ -87,7 +146,7 @@ def p_block(p):
     '''block : LBRACE statement_list_opt RBRACE'''
     # Rule for a block of code enclosed in curly braces: contains an optional list of statements.
     # p[2]: statement_list_opt (list of Statement nodes)
-    p[0] = Block(p[2])
+    p[0] = node_factory.Block(p[2])
 
 def p_statement_list_opt(p):
     '''statement_list_opt : statement_list
@@ -124,7 +183,7 @@ def p_statement(p):
 def p_empty_statement(p):
     '''empty_statement :'''
     # Rule for an empty statement (just a semicolon).
-    p[0] = EmptyStatement()
+    p[0] = node_factory.EmptyStatement()
 
 # --- Declaration Statements ---
 
@@ -137,10 +196,10 @@ def p_declaration_statement(p):
     # p[4]: initializer (Expression node)
     if len(p) == 3:
         # Declaration without initializer
-        p[0] = Declaration(p[1], p[2], None)
+        p[0] = node_factory.Declaration(p[1], p[2], None, p.slice[2].symbol_id)
     else:
         # Declaration with initializer
-        p[0] = Declaration(p[1], p[2], p[4])
+        p[0] = node_factory.Declaration(p[1], p[2], p[4], p.slice[2].symbol_id)
 
 def p_initializer(p):
     '''initializer : expression'''
@@ -154,7 +213,7 @@ def p_assignment_statement(p):
     # Rule for an assignment statement: assigns the value of an expression to a variable.
     # p[1]: ID (variable name)
     # p[3]: expression (Expression node)
-    p[0] = Assignment(Identifier(p[1]), p[3])  # Create an Identifier node for the left-hand side.
+    p[0] = node_factory.Assignment(node_factory.Identifier(p[1], symbol_id=p.slice[1].symbol_id), p[3])  # Create an Identifier node for the left-hand side.
 
 # --- Return Statements ---
 
@@ -162,7 +221,7 @@ def p_return_statement(p):
     '''return_statement : RETURN expression_opt'''
     # Rule for a return statement: optionally returns an expression.
     # p[2]: expression_opt (Expression node or None)
-    p[0] = ReturnStatement(p[2])
+    p[0] = node_factory.ReturnStatement(p[2])
 
 def p_expression_opt(p):
     '''expression_opt : expression
@@ -181,10 +240,10 @@ def p_if_statement(p):
     # p[7]: statement (else block, if present)
     if len(p) == 6:
         # If statement without else
-        p[0] = IfStatement(p[3], p[5], None)
+        p[0] = node_factory.IfStatement(p[3], p[5], None)
     else:
         # If statement with else
-        p[0] = IfStatement(p[3], p[5], p[7])
+        p[0] = node_factory.IfStatement(p[3], p[5], p[7])
 
 def p_for_statement(p):
     '''for_statement : FOR LPAREN for_init_opt SEMI for_condition_opt SEMI for_increment_opt RPAREN statement'''
@@ -193,7 +252,7 @@ def p_for_statement(p):
     # p[5]: for_condition_opt
     # p[7]: for_increment_opt
     # p[9]: statement (loop body)
-    p[0] = ForStatement(p[3], p[5], p[7], p[9])
+    p[0] = node_factory.ForStatement(p[3], p[5], p[7], p[9])
 
 def p_for_init_opt(p):
     '''for_init_opt : declaration_statement
@@ -219,7 +278,7 @@ def p_while_statement(p):
     # Rule for a while loop: specifies the condition and the loop body.
     # p[3]: expression (condition)
     # p[5]: statement (loop body)
-    p[0] = WhileStatement(p[3], p[5])
+    p[0] = node_factory.WhileStatement(p[3], p[5])
 
 # --- Expressions ---
 
@@ -238,7 +297,7 @@ def p_expression(p):
 def p_assignment_expression(p):
     '''assignment_expression : ID ASSIGN expression'''
     # Rule for an assignment expression.
-    p[0] = Assignment(p[1], p[3]) # Note: p[1] here is just the ID string, not wrapped in Identifier yet. It might be better to consistently use Identifier nodes.
+    p[0] = node_factory.Assignment(p[1], p[3]) # Note: p[1] here is just the ID string, not wrapped in Identifier yet. It might be better to consistently use Identifier nodes.
 
 def p_binary_expression(p):
     '''binary_expression : expression PLUS expression
@@ -257,9 +316,8 @@ def p_binary_expression(p):
     # p[2]: operator (e.g., '+', '-', '*')
     # p[1]: left operand (Expression node)
     # p[3]: right operand (Expression node)
-    p[0] = BinaryExpression(p[2], p[1], p[3])
-    if p[0]:
-        p[0].lineno = p.lineno(2) # Set the line number of the binary expression based on the operator's token.
+    p[0] = node_factory.BinaryExpression(p[2], p[1], p[3])
+    node_factory.set_position(p[0], p.lineno(2)) # Set the line number of the binary expression based on the operator's token.
 
 def p_primary_expression(p):
     '''primary_expression : ID
@@ -274,47 +332,29 @@ def p_primary_expression(p):
     if len(p) == 2:
         # Identifier or Literal
         if p.slice[1].type == 'ID':
-            p[0] = Identifier(p[1])
-            if p[0]:
-                p[0].lineno = p.lineno(1)  # Set line number for Identifier
-                p[0].lexpos = p.lexpos(1)  # Set lexpos for Identifier
+            p[0] = node_factory.Identifier(p[1], symbol_id=p.slice[1].symbol_id)
         elif p.slice[1].type == 'INT_NUM':
-            p[0] = Literal('int', p[1])
-            if p[0]:
-                p[0].lineno = p.lineno(1)
-                p[0].lexpos = p.lexpos(1)
+            p[0] = node_factory.Literal('int', p[1])
         elif p.slice[1].type == 'FLOAT_NUM':
-            p[0] = Literal('float', p[1])
-            if p[0]:
-                p[0].lineno = p.lineno(1)
-                p[0].lexpos = p.lexpos(1)
+            p[0] = node_factory.Literal('float', p[1])
         elif p.slice[1].type == 'DOUBLE_NUM':
-            p[0] = Literal('double', p[1])
-            if p[0]:
-                p[0].lineno = p.lineno(1)
-                p[0].lexpos = p.lexpos(1)
+            p[0] = node_factory.Literal('double', p[1])
         elif p.slice[1].type == 'CHAR_LIT':
-            p[0] = Literal('char', p[1])
-            if p[0]:
-                p[0].lineno = p.lineno(1)
-                p[0].lexpos = p.lexpos(1)
+            p[0] = node_factory.Literal('char', p[1])
         elif p.slice[1].type == 'BOOL_LIT':
-            p[0] = Literal('bool', p[1])
-            if p[0]:
-                p[0].lineno = p.lineno(1)
-                p[0].lexpos = p.lexpos(1)
+            p[0] = node_factory.Literal('bool', p[1])
+        if p[0] is not None:
+            node_factory.set_position(p[0], p.lineno(1), p.lexpos(1))  # Set line number and lexpos from the token
     elif len(p) == 4:
         # Parenthesized expression
         p[0] = p[2]
-        if p[0]:
-            p[0].lineno = p.lineno(1)
-            p[0].lexpos = p.lexpos(1)
+        if p[0] is not None:
+            node_factory.set_position(p[0], p.lineno(1), p.lexpos(1))
     elif len(p) == 5:
-        # Function call
-        p[0] = CallExpression(Identifier(p[1]), p[3])
-        if p[0].callee: # Access the Identifier object within CallExpression
-            p[0].callee.lineno = p.lineno(1)
-            p[0].callee.lexpos = p.lexpos(1)
+        # Function call; the callee Identifier is positioned at the function name's token.
+        callee = node_factory.Identifier(p[1], symbol_id=p.slice[1].symbol_id)
+        node_factory.set_position(callee, p.lineno(1), p.lexpos(1))
+        p[0] = node_factory.CallExpression(callee, p[3])
 
 def p_argument_list_opt(p):
     '''argument_list_opt : argument_list
@@ -348,15 +388,105 @@ def p_error(p):
     parsing_error = True
     if p:
         # If a token caused the error, extract its information.
-        column = p.lexpos - lexer.lexdata.rfind('\n', 0, p.lexpos) + 1
-        error_message = f"Syntax error at line {p.lineno}, column {column}: Unexpected token '{p.value}' of type '{p.type}'"
-        print(error_message) # Print the error message to the console.
-        syntax_errors.append(error_message) # Store the error message in the list.
+        # The column is only computed while the per-compilation cap has not been reached.
+        column = find_column(p, lexer) if not syntax_errors.full else 0
+        syntax_errors.report("Syntax error at line %d, column %d: Unexpected token '%s' of type '%s'", p.lineno, column, p.value, p.type)
         parser.errok() # Attempt error recovery by skipping the problematic token.
     else:
         # If the error occurred at the end of the input (EOF).
-        print("Syntax error at EOF") # Print the error message to the console.
-        syntax_errors.append("Syntax error at EOF") # Store the error message in the list.
+        syntax_errors.report("Syntax error at EOF") # Store the error message in the list.
 
 # --- Build the Parser ---
-parser = yacc.yacc() # Create the parser object using the grammar rules defined above.
\ No newline at end of file
+#
+# Generating the LALR tables takes tens of milliseconds, so they are pickled once to a user
+# cache directory ($COMPILE_PARSER_TABLES_DIR, by default under $XDG_CACHE_HOME or ~/.cache;
+# an empty value disables it) and read back by later processes. The file name carries a
+# digest of the grammar and token definitions, so a changed grammar gets a new file (PLY
+# also checks the grammar's signature stored with the tables). A new file is written under a
+# temporary name and renamed into place, so concurrent processes never read a partial one.
+# Nothing is written into the source tree (no parsetab.py or parser.out).
+
+GRAMMAR_FILES = ('parser.py', 'lexer.py')
+
+
+def table_cache_path():
+    """
+    Returns the path of the pickled parser tables, or None if they are not cached.
+    """
+    directory = os.environ.get('COMPILE_PARSER_TABLES_DIR')
+    if directory is None:
+        cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        directory = os.path.join(cache_home, 'interactive-code-parser')
+    elif not directory.strip():
+        return None
+    digest = hashlib.sha256()
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    for name in GRAMMAR_FILES:
+        with open(os.path.join(base_dir, name), 'rb') as file:
+            digest.update(file.read())
+    return os.path.join(directory, f"parser_tables-{digest.hexdigest()[:16]}.pickle")
+
+
+def build_parser(path=None):
+    """
+    Builds the PLY parser, reading its tables from the cache file when there is one.
+
+    Args:
+        path (str, optional): The cache file. Defaults to table_cache_path().
+
+    Returns:
+        ply.yacc.LRParser: The parser.
+    """
+    module = sys.modules[__name__]
+    path = path or table_cache_path()
+    if path is None:
+        return yacc.yacc(module=module, write_tables=False, debug=False)
+    if os.path.exists(path):
+        try:
+            return yacc.yacc(module=module, debug=False, picklefile=path)
+        except Exception:
+            pass  # A corrupt or unreadable file is replaced below
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        built = yacc.yacc(module=module, debug=False, picklefile=temporary)
+        os.replace(temporary, path)
+        return built
+    except OSError:
+        return yacc.yacc(module=module, write_tables=False, debug=False)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+parser = build_parser()
+
+# --- Parser Backends ---
+
+PARSER_BACKENDS = ('ply', 'descent', 'tables')
+
+def get_parser(backend='ply'):
+    """
+    Returns a parser object by name. All backends build the same AST and report the same
+    syntax errors; 'descent' (see descent.py) is a hand-written recursive-descent parser that
+    avoids the overhead of PLY's generic LR driver, and 'tables' (see lrtables.py) runs PLY's
+    tables re-encoded as integer arrays with a driver specialized for this grammar.
+
+    Args:
+        backend (str, optional): One of PARSER_BACKENDS. Defaults to 'ply'.
+
+    Returns:
+        An object with a parse(input=None, lexer=None, tokenfunc=None) method.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    if backend == 'ply':
+        return parser
+    if backend == 'descent':
+        from descent import descent_parser
+        return descent_parser
+    if backend == 'tables':
+        from lrtables import get_table_parser
+        return get_table_parser()
+    raise ValueError(f"Unknown parser backend: {backend!r}")
@@ -0,0 +1,250 @@
+# pipeline.py
+import gzip
+import json
+import os
+from lexer import lexer, reset_lexer, lexical_errors, tokens as token_types
+from parser import get_parser, syntax_errors
+from semantic import semantic_analyzer
+from limits import CompileLimits, LimitExceeded
+from cgen import run_program
+from syntax_tree import to_dict
+
+# The compile pipeline behind /run_code. It has no web-framework dependency, so it can
+# run in worker processes (see async_server.py) as well as inside the Flask app.
+
+# Token formats of the /run_code response (selected with the request's 'format' field):
+# 'objects' is a list of {'type', 'value'} dicts; 'columnar' sends parallel arrays, with
+# each type given as an index into 'tokenTypes' (the tokens tuple of lexer.py).
+TOKEN_FORMATS = ('objects', 'columnar')
+TOKEN_TYPE_INDEX = {name: index for index, name in enumerate(token_types)}
+
+# Processes used to check the function bodies of large programs in parallel (see
+# semantic.analyze_in_parallel); None or 1 analyzes sequentially.
+semantic_workers = int(os.environ.get('COMPILE_SEMANTIC_WORKERS', '0')) or None
+
+# The parser used by the pipeline (see parser.PARSER_BACKENDS); both build the same AST.
+parser_backend = os.environ.get('COMPILE_PARSER', 'ply')
+
+MIN_COMPRESSED_SIZE = 1024  # Smaller responses are sent uncompressed
+COMPRESS_LEVEL = 5
+
+def adjust_line_numbers(error_messages, code, lineCount, trailing_blank_lines):
+    """Adjust line numbers in error messages to account for empty lines."""
+    adjusted_messages = []
+
+    # Calculate leading blank lines, scanning line by line instead of splitting the whole source
+    leading_blank_lines = 0
+    start = 0
+    while True:
+        end = code.find('\n', start)
+        line = code[start:] if end == -1 else code[start:end]
+        if line.strip():
+            break
+        leading_blank_lines += 1
+        if end == -1:
+            break
+        start = end + 1
+
+    for error_message in error_messages:
+        if "line" in error_message:
+            try:
+                # Extract the reported line number
+                line_part = error_message.split("line ")[1]
+                reported_line = int(line_part.split(",")[0] if "," in line_part else line_part.split(":")[0] if ":" in line_part else line_part.split(" ")[0])
+
+                # Adjust the line number by adding the number of leading blank lines
+                adjusted_line = reported_line + leading_blank_lines
+
+                # Update the error message
+                adjusted_message = error_message.replace(f"line {reported_line}", f"line {adjusted_line}")
+                adjusted_messages.append(adjusted_message)
+            except (IndexError, ValueError):
+                # If we can't parse the line number, keep the original message
+                adjusted_messages.append(error_message)
+        else:
+            # If there's no line number in the message, keep it as is
+            adjusted_messages.append(error_message)
+
+    return adjusted_messages
+
+def run_code(code, line_count, limits=None, cache=None, token_format='objects', execute=False, timings=None):
+    """
+    Lexes, parses and analyzes a program and builds the /run_code response.
+
+    Args:
+        code (str): The source code.
+        line_count (int): The number of lines in the editor.
+        limits (CompileLimits, optional): Resource limits for this compilation. Defaults to CompileLimits().
+        cache (CompileCache, optional): A persistent cache of previous results. Defaults to None.
+        token_format (str, optional): One of TOKEN_FORMATS. Defaults to 'objects'.
+        execute (bool, optional): Whether to also run a valid program (see cgen.run_program) and
+            add the result to the output as 'run'. Defaults to False.
+        timings (dict, optional): Filled with the elapsed seconds of each stage that ran
+            ('lex', 'parse', 'semantic', 'run'); left empty for a cached result.
+
+    Returns:
+        dict: {'output': {...}} for a valid program, or {'error': message}.
+    """
+    if cache is None:
+        # No need to serialize the AST
+        return _compile(code, line_count, limits or CompileLimits(), token_format, execute, timings)[0]
+    return compile_code(code, line_count, limits, cache, token_format, execute, timings)[0]
+
+def compile_code(code, line_count, limits=None, cache=None, token_format='objects', execute=False, timings=None):
+    """
+    Like run_code, but also returns the serialized AST. When a cache is given, a previous
+    result for the same source, options and compiler version is reused.
+
+    Args:
+        code (str): The source code.
+        line_count (int): The number of lines in the editor.
+        limits (CompileLimits, optional): Resource limits for this compilation. Defaults to CompileLimits().
+        cache (CompileCache, optional): A persistent cache of previous results. Defaults to None.
+        token_format (str, optional): One of TOKEN_FORMATS. Defaults to 'objects'.
+        execute (bool, optional): Whether to also run a valid program. Defaults to False.
+        timings (dict, optional): Filled with the elapsed seconds of each stage (see run_code).
+
+    Returns:
+        tuple: (response, ast) where ast is the AST as returned by syntax_tree.to_dict,
+        or None if the program could not be parsed (or a resource limit was exceeded).
+    """
+    limits = limits or CompileLimits()
+    key = None
+    if cache is not None:
+        key = cache.key(code, line_count, token_format, sorted(vars(limits).items()), execute)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    response, parsed, cacheable = _compile(code, line_count, limits, token_format, execute, timings)
+    ast = to_dict(parsed) if parsed is not None else None
+    if key is not None and cacheable:
+        cache.put(key, response, ast)
+    return response, ast
+
+def _compile(code, line_count, limits, token_format='objects', execute=False, timings=None):
+    """
+    Runs the pipeline.
+
+    Returns:
+        tuple: (response, parsed AST or None, whether the result may be cached). Results of
+        resource limit breaches (including runs stopped at a limit) and unexpected errors are
+        not cached, since they may not recur.
+    """
+    # Calculate the number of trailing blank lines (without copying the source once per line)
+    stripped_code = code.rstrip('\n')
+    trailing_blank_lines = len(code) - len(stripped_code)
+    code = stripped_code
+
+    budget = limits.budget()
+    try:
+        budget.check_source(code)
+
+        # Reset the lexer state (line counter, intern table) and syntax errors
+        reset_lexer(lexer)
+        lexer.lexdata = ''
+        lexer.input(code)
+
+        # Clear any previous syntax errors
+        global syntax_errors
+        syntax_errors.clear() if hasattr(syntax_errors, 'clear') else None
+
+        # Tokenize the input code
+        budget.start_stage('lex')
+        if token_format == 'columnar':
+            types, values, offsets = [], [], []
+            while True:
+                tok = lexer.token()
+                if not tok:
+                    break
+                budget.count_token()
+                types.append(TOKEN_TYPE_INDEX[tok.type])
+                values.append(tok.value)
+                offsets.append(tok.lexpos)
+            tokens = {'format': 'columnar', 'tokenTypes': token_types, 'types': types, 'values': values, 'offsets': offsets}
+        else:
+            tokens = []
+            while True:
+                tok = lexer.token()
+                if not tok:
+                    break
+                budget.count_token()
+                tokens.append({'type': tok.type, 'value': tok.value})
+
+        # Parse the input code (this lexes the input again, so the lexer is reset first)
+        budget.start_stage('parse')
+        reset_lexer(lexer)
+        lexer.input(code)
+        parsed = get_parser(parser_backend).parse(lexer=lexer, tokenfunc=budget.token_source(lexer.token))
+
+        # Check for lexical and syntax errors
+        if lexical_errors or syntax_errors:
+            adjusted_syntax_errors = adjust_line_numbers(lexical_errors + syntax_errors, code, line_count, trailing_blank_lines)
+            return {'error': '\n'.join(adjusted_syntax_errors) + "\n❌ invalid"}, None, True
+
+        # Perform semantic analysis if parsing was successful
+        if parsed:
+            budget.check_depth(parsed)
+            budget.start_stage('semantic')
+            semantic_errors = semantic_analyzer(parsed, budget, semantic_workers)
+            if semantic_errors and len(semantic_errors) > 0:
+                adjusted_semantic_errors = adjust_line_numbers(semantic_errors, code, line_count, trailing_blank_lines)
+                return {'error': '\n'.join(adjusted_semantic_errors) + "\n❌ invalid"}, parsed, True
+
+        # Send the tokens and parsed result as 'output'
+        output = {
+            'tokens': tokens,
+            'parsed': "Valid program"  # You might want to serialize the AST here
+        }
+
+        # Run the program natively (opt-in, since it compiles and executes a binary)
+        if execute and parsed:
+            budget.start_stage('run')
+            output['run'] = run_program(parsed)
+            return {'output': output}, parsed, not output['run'].get('limitExceeded')
+
+        return {'output': output}, parsed, True
+
+    except LimitExceeded as e:
+        return {'error': f"{e}\n❌ invalid"}, None, False
+
+    except Exception as e:
+        error_message = f"Unexpected error: {str(e)}\n❌ invalid"
+        return {'error': error_message}, None, False
+
+    finally:
+        budget.end_stage()
+        if timings is not None:
+            timings.update(budget.timings)
+
+def server_timing(timings, total=None):
+    """
+    Formats stage timings as a Server-Timing header value (durations in milliseconds).
+
+    Args:
+        timings (dict): Elapsed seconds per stage, as filled by run_code.
+        total (float, optional): The elapsed seconds of the whole request, sent as 'total'.
+
+    Returns:
+        str: e.g. 'lex;dur=0.412, parse;dur=1.837, semantic;dur=0.295, total;dur=2.9'.
+    """
+    entries = list(timings.items())
+    if total is not None:
+        entries.append(('total', total))
+    return ', '.join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in entries)
+
+def encode_response(response, accept_encoding=''):
+    """
+    Serializes a /run_code response as compact JSON, gzip-compressed if the client accepts it
+    and the response is large enough to benefit.
+
+    Args:
+        response (dict): The response returned by run_code.
+        accept_encoding (str, optional): The request's Accept-Encoding header.
+
+    Returns:
+        tuple: (body bytes, content encoding or None).
+    """
+    body = json.dumps(response, separators=(',', ':')).encode('utf-8')
+    if len(body) >= MIN_COMPRESSED_SIZE and 'gzip' in accept_encoding.lower():
+        return gzip.compress(body, COMPRESS_LEVEL), 'gzip'
+    return body, None
@@ -0,0 +1,215 @@
+# project.py
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from limits import CompileLimits, LimitExceeded
+from semantic import SymbolTable, function_info, semantic_analyzer
+from syntax_tree import FunctionDefinition, Declaration, to_dict, from_dict
+
+# --- Multi-file Projects ---
+#
+# A project is a set of translation units (source files). Each unit is lexed and parsed on
+# its own, in parallel across a process pool, and exports a signature table of its global
+# functions and variables. The link stage then reports symbols defined in more than one unit
+# and analyzes each unit with the other units' exports visible through a parent scope of its
+# global scope (keyed by the unit's own symbol ids, since every unit has its own intern table).
+# Units are keyed by a hash of their content, so a rebuild only re-parses the files that changed.
+
+
+def content_hash(code):
+    """
+    Returns the hash that identifies the content of a unit.
+    """
+    return hashlib.sha256(code.encode('utf-8', 'surrogatepass')).hexdigest()
+
+
+def parse_unit(code, limits=None):
+    """
+    Lexes and parses one translation unit (runs in a worker process).
+
+    Args:
+        code (str): The source code.
+        limits (CompileLimits, optional): Resource limits. Defaults to CompileLimits().
+
+    Returns:
+        tuple: (ast, errors) where ast is the AST as returned by syntax_tree.to_dict (None if
+        the unit has errors) and errors is a list of lexical and syntax error messages.
+    """
+    from lexer import lexer, reset_lexer, lexical_errors
+    from parser import parser, syntax_errors
+    budget = (limits or CompileLimits()).budget()
+    try:
+        budget.check_source(code)
+        reset_lexer(lexer)
+        syntax_errors.clear()
+        budget.start_stage('parse')
+        lexer.input(code)
+        ast = parser.parse(lexer=lexer, tokenfunc=budget.token_source(lexer.token))
+        errors = list(lexical_errors) + list(syntax_errors)
+        if errors or ast is None:
+            return None, errors
+        budget.check_depth(ast)
+        return to_dict(ast), []
+    except LimitExceeded as e:
+        return None, [str(e)]
+
+
+def export_table(ast):
+    """
+    Builds the signature table of a unit: its global functions and variables.
+
+    Args:
+        ast (Program): The AST of the unit.
+
+    Returns:
+        dict: Maps each exported name to its symbol information (as stored in a SymbolTable).
+    """
+    exports = {}
+    for declaration in ast.declarations:
+        if isinstance(declaration, FunctionDefinition):
+            info = function_info(declaration)
+        elif isinstance(declaration, Declaration):
+            info = {'name': declaration.name, 'type': declaration.data_type, 'kind': 'variable'}
+        else:
+            continue
+        exports.setdefault(declaration.name, info)  # Redeclarations are reported by the analysis
+    return exports
+
+
+class Unit:
+    """
+    A parsed translation unit.
+    """
+    def __init__(self, path, digest, ast, errors):
+        """
+        Initializes a unit.
+
+        Args:
+            path (str): The path of the source file.
+            digest (str): The content hash of the source.
+            ast (Program or None): The AST, or None if the unit has lexical or syntax errors.
+            errors (list): The lexical and syntax error messages.
+        """
+        self.path = path
+        self.digest = digest
+        self.ast = ast
+        self.errors = errors
+        self.exports = export_table(ast) if ast is not None else {}
+
+
+class Project:
+    """
+    A set of translation units that are compiled and linked together.
+    """
+    def __init__(self, paths=(), workers=None, limits=None):
+        """
+        Initializes the project.
+
+        Args:
+            paths (iterable, optional): The source files of the project.
+            workers (int, optional): Number of processes used to parse changed units. Defaults to the CPU count.
+            limits (CompileLimits, optional): Per-unit resource limits. Defaults to CompileLimits().
+        """
+        self.paths = list(paths)
+        self.workers = workers or os.cpu_count() or 1
+        self.limits = limits or CompileLimits()
+        self.units = {}  # Maps a path to its Unit
+        self.reparsed = []  # Paths parsed by the last build
+
+    def read_sources(self):
+        """
+        Reads the source files of the project.
+
+        Returns:
+            dict: Maps each path to its source code.
+        """
+        sources = {}
+        for path in self.paths:
+            with open(path, encoding='utf-8') as file:
+                sources[path] = file.read()
+        return sources
+
+    def build(self, sources=None):
+        """
+        Parses the changed units, links the project and analyzes every unit.
+
+        Args:
+            sources (dict, optional): Maps each path to its source code. Defaults to read_sources().
+
+        Returns:
+            list: The error messages of the project, each prefixed with the path of its unit.
+        """
+        if sources is None:
+            sources = self.read_sources()
+        self.parse(sources)
+        return self.link()
+
+    def parse(self, sources):
+        """
+        Parses the units whose content changed since the last build, in parallel.
+
+        Args:
+            sources (dict): Maps each path to its source code.
+        """
+        digests = {path: content_hash(code) for path, code in sources.items()}
+        self.units = {path: unit for path, unit in self.units.items() if digests.get(path) == unit.digest}
+        changed = [path for path in sources if path not in self.units]
+        if len(changed) > 1 and self.workers > 1:
+            with ProcessPoolExecutor(min(self.workers, len(changed))) as executor:
+                results = list(executor.map(parse_unit, [sources[path] for path in changed],
+                                            [self.limits] * len(changed)))
+        else:
+            results = [parse_unit(sources[path], self.limits) for path in changed]
+        for path, (ast, errors) in zip(changed, results):
+            self.units[path] = Unit(path, digests[path], from_dict(ast) if ast is not None else None, errors)
+        self.reparsed = changed
+
+    def link(self):
+        """
+        Resolves the symbols exported by the units and analyzes each unit against them.
+
+        Returns:
+            list: The error messages of the project, each prefixed with the path of its unit.
+        """
+        errors = []
+        definitions = {}  # Maps an exported name to the first unit that defines it
+        for path in sorted(self.units):
+            unit = self.units[path]
+            errors.extend(f"{path}: {message}" for message in unit.errors)
+            for name in unit.exports:
+                if name in definitions:
+                    errors.append(f"{path}: Link Error: '{name}' is already defined in '{definitions[name].path}'.")
+                else:
+                    definitions[name] = unit
+
+        for path in sorted(self.units):
+            unit = self.units[path]
+            if unit.ast is None:
+                continue
+            try:
+                messages = semantic_analyzer(unit.ast, self.limits.budget(), imports=self.imports(unit, definitions))
+            except Exception as e:
+                messages = [f"Unexpected error: {str(e)}"]
+            errors.extend(f"{path}: {message}" for message in messages)
+        return errors
+
+    def imports(self, unit, definitions):
+        """
+        Builds the scope of symbols that a unit imports from the other units.
+
+        Args:
+            unit (Unit): The importing unit.
+            definitions (dict): Maps each exported name to the unit that defines it.
+
+        Returns:
+            SymbolTable: The imported symbols, keyed by the unit's own symbol ids.
+        """
+        imports = SymbolTable()
+        names = unit.ast.symbols or []
+        symbol_ids = {name: symbol_id for symbol_id, name in enumerate(names)}
+        for name, symbol_id in symbol_ids.items():
+            owner = definitions.get(name)
+            if owner is not None and owner is not unit and name not in unit.exports:
+                imports.symbols[symbol_id] = owner.exports[name]
+        return imports
@@ -0,0 +1,257 @@
+# replay.py
+"""
+Deterministic replay of captured /run_code traffic.
+
+Feeds the records of a capture (see capture.py) through the compile pipeline in this
+process, or to a running server with --url. Records are sent in recorded order, as fast as
+possible (--speed 0), at the recorded pace (--speed 1) or accelerated (e.g. --speed 10).
+Each response is reduced to a digest. --save stores the latencies and digests as a
+baseline, and --baseline compares a run with a stored one: the responses must be identical
+and the latency percentiles must not grow by more than --max-regression.
+
+Usage:
+    python replay.py CORPUS [--url URL] [--speed X] [--limit N] [--save FILE] [--baseline FILE]
+                     [--max-regression F] [--label NAME]
+"""
+import argparse
+import hashlib
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from capture import read_corpus
+from loadtest import git_revision, latency_summary, send_request
+
+BASELINE_VERSION = 1
+DEFAULT_MAX_REGRESSION = 0.2  # Relative growth of a latency percentile that fails a comparison
+COMPARED_PERCENTILES = ('p50', 'p95', 'p99')
+
+# --- Replay ---
+#
+# The library target runs pipeline.run_code, the function behind /run_code, so its
+# responses (and digests) are the same as the server's and a baseline recorded with one
+# target can be compared with a run on the other. It compiles one record at a time (the
+# pipeline shares the module-level lexer) and times the compile alone. Against a server,
+# paced records are sent on their schedule whatever the state of earlier ones, and latency
+# is measured from the time a record was due.
+
+
+def response_digest(response):
+    """
+    Returns a digest of a /run_code response (independent of the key order).
+    """
+    data = json.dumps(response, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(data.encode('utf-8', 'surrogatepass')).hexdigest()
+
+
+def request_body(record):
+    """
+    Returns the /run_code request body of a record.
+    """
+    return json.dumps({'code': record['code'], 'lineCount': record['lineCount'], 'format': record['format'],
+                       'run': record['run']}).encode('utf-8', 'surrogatepass')
+
+
+def due_times(records, speed):
+    """
+    Returns the offset in seconds at which each record is sent (None for all when speed is 0).
+    """
+    if not speed or not records:
+        return [None] * len(records)
+    first = records[0]['time']
+    return [(record['time'] - first) / speed for record in records]
+
+
+def replay_library(records, speed=0, limits=None):
+    """
+    Compiles the records in this process.
+
+    Args:
+        records (list): Records as returned by capture.read_corpus.
+        speed (float, optional): Pace relative to the recording (0: as fast as possible).
+        limits (CompileLimits, optional): Resource limits. Defaults to CompileLimits().
+
+    Returns:
+        list: One result per record: 'latency' (seconds), 'digest' and 'error' (always None).
+    """
+    from pipeline import run_code
+    if records:
+        run_code(records[0]['code'], records[0]['lineCount'], limits)  # Warm up
+    results = []
+    start = time.perf_counter()
+    for record, due in zip(records, due_times(records, speed)):
+        if due is not None:
+            delay = start + due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        sent = time.perf_counter()
+        response = run_code(record['code'], record['lineCount'], limits, None, record['format'], record['run'])
+        results.append({'latency': time.perf_counter() - sent, 'digest': response_digest(response), 'error': None})
+    return results
+
+
+def replay_http(records, base_url, speed=0, max_in_flight=64):
+    """
+    Sends the records to a server's /run_code.
+
+    Args:
+        records (list): Records as returned by capture.read_corpus.
+        base_url (str): The server, e.g. 'http://127.0.0.1:5000'.
+        speed (float, optional): Pace relative to the recording (0: one request at a time,
+            as fast as possible).
+        max_in_flight (int, optional): Paced requests in flight at most. Defaults to 64.
+
+    Returns:
+        list: One result per record: 'latency' (seconds), 'digest' (None if the request
+        failed) and 'error'.
+    """
+    results = [None] * len(records)
+
+    def send(index, due):
+        outcome = send_request(base_url, 'replay', request_body(records[index]), keep_response=True)
+        results[index] = {'latency': time.perf_counter() - due, 'error': outcome['error'],
+                          'digest': response_digest(outcome['response']) if 'response' in outcome else None}
+
+    if records:
+        send_request(base_url, 'replay', request_body(records[0]))  # Warm up
+    start = time.perf_counter()
+    if not speed:
+        for index in range(len(records)):
+            send(index, time.perf_counter())
+        return results
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        for index, due in enumerate(due_times(records, speed)):
+            delay = start + due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(send, index, start + due)
+    return results
+
+
+# --- Baselines ---
+
+def build_report(results, target, speed, label=None):
+    """
+    Builds the report of a replay (also the format of a baseline).
+
+    Returns:
+        dict: label, target, speed, the number of records and of failed requests, the
+        latency summary (ms), and the latency (ms) and response digest of each record.
+    """
+    return {
+        'version': BASELINE_VERSION,
+        'label': label or git_revision(),
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'target': target,
+        'speed': speed,
+        'records': len(results),
+        'errors': sum(result['error'] is not None for result in results),
+        'latency': latency_summary([result['latency'] for result in results if result['error'] is None]),
+        'latencies': [round(result['latency'] * 1000, 4) for result in results],
+        'digests': [result['digest'] for result in results],
+    }
+
+
+def compare_with_baseline(report, baseline, max_regression=DEFAULT_MAX_REGRESSION):
+    """
+    Compares a replay with a baseline replay of the same corpus.
+
+    Args:
+        report (dict): The report of the current replay (see build_report).
+        baseline (dict): The baseline report.
+        max_regression (float, optional): Largest acceptable relative growth of p50, p95
+            and p99. Defaults to 0.2.
+
+    Returns:
+        dict: 'output_mismatches' (indexes of records whose responses differ), 'latency'
+        ({percentile: {'baseline', 'current', 'change'}}), 'median_ratio' (the median of
+        the per-record latency ratios, current over baseline), 'regressions' (the
+        percentiles that grew too much) and 'ok'.
+    """
+    count = min(len(report['digests']), len(baseline['digests']))
+    mismatches = [index for index in range(count) if report['digests'][index] != baseline['digests'][index]]
+    latency, regressions = {}, []
+    for name in COMPARED_PERCENTILES:
+        current, previous = report['latency'][name], baseline['latency'][name]
+        change = (current - previous) / previous if current is not None and previous else None
+        latency[name] = {'baseline': previous, 'current': current, 'change': change}
+        if change is not None and change > max_regression:
+            regressions.append(name)
+    ratios = sorted(new / old for new, old in zip(report['latencies'], baseline['latencies']) if old)
+    return {
+        'records': count,
+        'record_count_differs': len(report['digests']) != len(baseline['digests']),
+        'output_mismatches': mismatches,
+        'latency': latency,
+        'median_ratio': ratios[len(ratios) // 2] if ratios else None,
+        'regressions': regressions,
+        'ok': not mismatches and not regressions and len(report['digests']) == len(baseline['digests']),
+    }
+
+
+def _milliseconds(value):
+    return '-' if value is None else f"{value:.2f} ms"
+
+
+def format_comparison(comparison, baseline_label=None):
+    """
+    Formats a comparison as text.
+    """
+    lines = [f"Against {baseline_label or 'the baseline'} ({comparison['records']} records):"]
+    if comparison['record_count_differs']:
+        lines.append("    the corpus has a different number of records")
+    mismatches = comparison['output_mismatches']
+    if mismatches:
+        shown = ', '.join(map(str, mismatches[:10])) + (', ...' if len(mismatches) > 10 else '')
+        lines.append(f"    {len(mismatches)} responses differ (records {shown})")
+    else:
+        lines.append("    all responses are identical")
+    for name, values in comparison['latency'].items():
+        change = '-' if values['change'] is None else f"{values['change'] * 100:+.1f}%"
+        flag = '  REGRESSION' if name in comparison['regressions'] else ''
+        lines.append(f"    {name}: {_milliseconds(values['baseline'])} -> {_milliseconds(values['current'])} ({change}){flag}")
+    if comparison['median_ratio'] is not None:
+        lines.append(f"    median per-record latency ratio: {comparison['median_ratio']:.3f}")
+    return '\n'.join(lines)
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description="Replays captured /run_code traffic.")
+    argument_parser.add_argument('corpus', help="A capture directory (COMPILE_CAPTURE_DIR) or segment file.")
+    argument_parser.add_argument('--url', default=None, help="Replay against a running server instead of in-process.")
+    argument_parser.add_argument('--speed', type=float, default=0.0,
+                                 help="Pace relative to the recording (0: as fast as possible).")
+    argument_parser.add_argument('--limit', type=int, default=None, help="Replay only the first N records.")
+    argument_parser.add_argument('--save', default=None, help="Write the replay as a baseline to this file.")
+    argument_parser.add_argument('--baseline', default=None, help="A baseline to compare with.")
+    argument_parser.add_argument('--max-regression', type=float, default=DEFAULT_MAX_REGRESSION,
+                                 help="Largest acceptable relative growth of p50/p95/p99.")
+    argument_parser.add_argument('--label', default=None, help="Release name (default: the git revision).")
+    args = argument_parser.parse_args()
+
+    records = read_corpus(args.corpus)[:args.limit]
+    if not records:
+        argument_parser.error(f"no records in {args.corpus}")
+    if args.url:
+        results = replay_http(records, args.url, args.speed)
+    else:
+        results = replay_library(records, args.speed)
+    report = build_report(results, args.url or 'library', args.speed, args.label)
+    latency = report['latency']
+    print(f"{report['records']} records, {report['errors']} failed: p50 {_milliseconds(latency['p50'])}, "
+          f"p95 {_milliseconds(latency['p95'])}, p99 {_milliseconds(latency['p99'])}, max {_milliseconds(latency['max'])}")
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(report, file)
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        comparison = compare_with_baseline(report, baseline, args.max_regression)
+        print(format_comparison(comparison, baseline.get('label')))
+        sys.exit(0 if comparison['ok'] else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,33 @@
+import gc
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from cfg import build_cfg, check_assignments, check_returns
+from diagnostics import Diagnostics, logger
 from syntax_tree import Program, FunctionDefinition, Block, Declaration, Assignment, ReturnStatement, IfStatement, \
     ForStatement, WhileStatement, BinaryExpression, Identifier, Literal, EmptyStatement, CallExpression
 
 
+def symbol_key(node):
+    """
+    Returns the key under which a named node (Identifier, Declaration, Parameter,
+    FunctionDefinition) is stored in a SymbolTable: its interned symbol id when the
+    lexer assigned one, otherwise its name.
+
+    Args:
+        node: The named node.
+
+    Returns:
+        int or str: The symbol table key.
+    """
+    return node.symbol_id if node.symbol_id is not None else node.name
+
+
 class SymbolTable:
     """
     Manages symbols (variables, functions) within different scopes of the program.
-    Supports nested scopes through a parent table.
+    Supports nested scopes through a parent table. Symbols are keyed by symbol_key(),
+    and each symbol's information keeps its 'name' for error messages.
     """
     def __init__(self, parent=None):
         """
@@ -14,16 +36,16 @@ class SymbolTable:
         Args:
             parent (SymbolTable, optional): The parent scope's symbol table. Defaults to None.
         """
-        self.symbols = {}  # Dictionary to store symbols (name: info) in the current scope.
+        self.symbols = {}  # Dictionary to store symbols (key: info) in the current scope.
         self.parent = parent  # Reference to the parent scope's symbol table.
         self.undeclared_reported = set()  # Keeps track of undeclared variables to avoid repeated errors.
 
     def get(self, name):
         """
-        Retrieves the information associated with a symbol name.
+        Retrieves the information associated with a symbol.
 
         Args:
-            name (str): The name of the symbol.
+            name (int or str): The key of the symbol (see symbol_key).
 
         Returns:
             dict or None: The symbol's information (e.g., {'type': 'int', 'kind': 'variable'}),
@@ -40,14 +62,14 @@ class SymbolTable:
         Adds a new symbol to the current scope.
 
         Args:
-            name (str): The name of the symbol.
+            name (int or str): The key of the symbol (see symbol_key).
             value (dict): The information associated with the symbol.
 
         Raises:
             SemanticError: If the symbol is already declared in the current scope.
         """
         if name in self.symbols:
-            raise SemanticError(f"'{name}' already declared in this scope")
+            raise SemanticError(f"'{value.get('name', name)}' already declared in this scope")
         self.symbols[name] = value
 
     def update(self, name, value):
@@ -55,7 +77,7 @@ class SymbolTable:
         Updates the information of an existing symbol. Searches in the current and parent scopes.
 
         Args:
-            name (str): The name of the symbol to update.
+            name (int or str): The key of the symbol to update (see symbol_key).
             value (dict): The new information for the symbol.
 
         Raises:
@@ -66,7 +88,7 @@ class SymbolTable:
         elif self.parent:
             self.parent.update(name, value)
         else:
-            raise SemanticError(f"'{name}' not declared")
+            raise SemanticError(f"'{value.get('name', name)}' not declared")
 
 
 class SemanticError(Exception):
@@ -125,11 +147,12 @@ def get_expression_type(expression, current_scope):
     if isinstance(expression, Literal):
         return expression.type
     elif isinstance(expression, Identifier):
-        info = current_scope.get(expression.name)
+        key = symbol_key(expression)
+        info = current_scope.get(key)
         if info:
             return info['type']
-        elif expression.name not in current_scope.undeclared_reported:
-            current_scope.undeclared_reported.add(expression.name)
+        elif key not in current_scope.undeclared_reported:
+            current_scope.undeclared_reported.add(key)
             raise SemanticError(f"Semantic Error: '{expression.name}' not declared before use.")
         return None
     elif isinstance(expression, BinaryExpression):
@@ -164,19 +187,18 @@ def get_expression_type(expression, current_scope):
     return None
 
 
-def semantic_analyzer(ast):
+def make_visitor(errors, budget=None):
     """
-    Performs semantic analysis on the Abstract Syntax Tree (AST).
+    Creates the functions that perform the semantic checks.
 
     Args:
-        ast: The root node of the Abstract Syntax Tree.
+        errors (list): The list that receives the semantic error messages.
+        budget (limits.Budget, optional): Resource budget ticked once per visited node. Defaults to None.
 
     Returns:
-        list: A list of semantic error messages found during the analysis.
+        tuple: (visit, check_function). visit(node, scope) checks any node; check_function(node, scope)
+        checks a FunctionDefinition whose name has already been declared in scope.
     """
-    errors = []# List to store semantic errors.
-    global_scope = SymbolTable()  # Create the global scope symbol table.
-
     def visit(node, current_scope):
         """
         Recursively visits nodes of the AST to perform semantic checks.
@@ -186,74 +208,17 @@ def semantic_analyzer(ast):
             current_scope (SymbolTable): The symbol table for the current scope.
         """
         nonlocal errors
+        if budget is not None:
+            budget.tick()
 
         if isinstance(node, Program):
             # Visit each declaration in the program.
             for declaration in node.declarations:
                 visit(declaration, current_scope)
         elif isinstance(node, FunctionDefinition):
-            # Add the function to the current scope.
-            current_scope.set(node.name, {'type': node.return_type, 'kind': 'function', 'params': node.params})
-            # Create a new scope for the function's body.
-            function_scope = SymbolTable(current_scope)
-            # Check if the 'main' function has parameters (which is not allowed).
-            if node.name == 'main' and node.params:
-                errors.append(f"Semantic Error: Function 'main' should not have parameters.")
-
-            # Add function parameters to the function's scope.
-            for param in node.params:
-                function_scope.set(param.name, {'type': param.param_type, 'kind': 'variable'})
-
-            has_return = False  # Flag to track if a non-void function has a return statement.
-
-            def check_return(n):
-                """
-                Helper function to recursively check for return statements in a function body.
-                """
-                nonlocal has_return
-                if isinstance(n, ReturnStatement) and n.value is not None:
-                    has_return = True
-                elif isinstance(n, Block):
-                    if n.statements:
-                        for stmt in n.statements:
-                            check_return(stmt)
-                elif isinstance(n, IfStatement):
-                    check_return(n.then_block)
-                    if n.else_block:
-                        check_return(n.else_block)
-                elif isinstance(n, (ForStatement, WhileStatement)):
-                    check_return(n.body)
-
-            # Check if a non-void function has a return statement.
-            if node.return_type != 'void':
-                check_return(node.body)
-                if not has_return:
-                    errors.append(f"Semantic Error: Non-void function '{node.name}' must return a value.")
-
-            # Check for return statement with a value in a void 'main' function.
-            if node.name == 'main' and node.return_type == 'void':
-                def check_void_main_return(n):
-                    """
-                    Helper function to check for return statements with values in a void 'main' function.
-                    """
-                    nonlocal errors
-                    if isinstance(n, ReturnStatement) and n.value is not None:
-                        errors.append(f"Semantic Error: Function 'main' must have return type 'int'.")
-                    elif isinstance(n, Block):
-                        for stmt in n.statements:
-                            check_void_main_return(stmt)
-                    elif isinstance(n, IfStatement):
-                        check_void_main_return(n.then_block)
-                        if n.else_block:
-                            check_void_main_return(n.else_block)
-                    elif isinstance(n, (ForStatement, WhileStatement)):
-                        check_void_main_return(n.body)
-
-                check_void_main_return(node.body)
-
-            # Visit the function's body with the function's scope.
-            visit(node.body, function_scope)
-
+            # Add the function to the current scope, then check it.
+            current_scope.set(symbol_key(node), function_info(node))
+            check_function(node, current_scope)
         elif isinstance(node, Block):
             # Create a new scope for the block, inheriting from the current scope.
             block_scope = SymbolTable(current_scope)
@@ -263,11 +228,11 @@ def semantic_analyzer(ast):
                     visit(statement, block_scope)
         elif isinstance(node, Declaration):
             # Check if the variable is already declared in the current scope.
-            if current_scope.get(node.name):
+            if current_scope.get(symbol_key(node)):
                 errors.append(f"Semantic Error: '{node.name}' already declared.")
             else:
                 # Add the variable to the current scope.
-                current_scope.set(node.name, {'type': node.data_type, 'kind': 'variable'})
+                current_scope.set(symbol_key(node), {'name': node.name, 'type': node.data_type, 'kind': 'variable'})
                 # Check type compatibility if there's an initializer.
                 if node.initializer:
                     initializer_type = get_expression_type(node.initializer, current_scope)
@@ -281,7 +246,7 @@ def semantic_analyzer(ast):
             try:
                 # Check if the left-hand side variable is declared.
                 get_expression_type(node.lvalue, current_scope)
-                var_info = current_scope.get(node.lvalue.name)
+                var_info = current_scope.get(symbol_key(node.lvalue))
                 if var_info:
                     # Check type compatibility between the variable and the assigned expression.
                     expr_type = get_expression_type(node.rvalue, current_scope)
@@ -337,11 +302,216 @@ def semantic_analyzer(ast):
         elif isinstance(node, CallExpression):
             # Check if the called function is declared.
             function_name = node.callee.name
-            info = current_scope.get(function_name)
+            info = current_scope.get(symbol_key(node.callee))
             if not info or info['kind'] != 'function':
                 errors.append(f"Semantic Error: Function '{function_name}' not declared.")
 
-    # Start the semantic analysis from the root of the AST (Program node) with the global scope.
-    visit(ast, global_scope)
-    print("Errors:", errors)
-    return errors
\ No newline at end of file
+    def check_function(node, current_scope):
+        """
+        Checks a function definition: its signature, its return statements, its body and
+        the assignment of its local variables (see cfg.py).
+        """
+        # Create a new scope for the function's body.
+        function_scope = SymbolTable(current_scope)
+        # Check if the 'main' function has parameters (which is not allowed).
+        if node.name == 'main' and node.params:
+            errors.append(f"Semantic Error: Function 'main' should not have parameters.")
+
+        # Add function parameters to the function's scope.
+        for param in node.params:
+            function_scope.set(symbol_key(param), {'name': param.name, 'type': param.param_type, 'kind': 'variable'})
+
+        # Check the return statements on the control-flow graph of the body.
+        graph = build_cfg(node)
+        errors.extend(check_returns(graph))
+
+        # Visit the function's body with the function's scope.
+        visit(node.body, function_scope)
+
+        # Check that local variables are assigned before they are read.
+        errors.extend(check_assignments(graph))
+
+    return visit, check_function
+
+
+def function_info(node):
+    """
+    Returns the symbol information of a function definition.
+    """
+    return {'name': node.name, 'type': node.return_type, 'kind': 'function', 'params': node.params}
+
+
+def semantic_analyzer(ast, budget=None, workers=None, imports=None):
+    """
+    Performs semantic analysis on the Abstract Syntax Tree (AST).
+
+    Args:
+        ast: The root node of the Abstract Syntax Tree.
+        budget (limits.Budget, optional): Resource budget ticked once per visited node. Defaults to None.
+        workers (int, optional): Number of processes in which the function bodies of large
+            programs are checked in parallel (see analyze_in_parallel). Defaults to None (sequential).
+        imports (SymbolTable, optional): Symbols defined elsewhere (e.g., in the other files of a
+            project, see project.py), used as the parent of the global scope. Defaults to None.
+
+    Returns:
+        list: A list of semantic error messages found during the analysis.
+    """
+    errors = Diagnostics('semantic errors')  # List to store semantic errors (capped per compilation).
+    if workers is not None and workers > 1 and isinstance(ast, Program) and parallel_available() and \
+            sum(isinstance(declaration, FunctionDefinition) for declaration in ast.declarations) >= PARALLEL_MIN_FUNCTIONS:
+        analyze_in_parallel(ast, errors, workers, budget, imports)
+    else:
+        global_scope = SymbolTable(imports)  # Create the global scope symbol table.
+        visit, _ = make_visitor(errors, budget)
+        # Start the semantic analysis from the root of the AST (Program node) with the global scope.
+        visit(ast, global_scope)
+    logger.debug("Semantic analysis found %d errors", len(errors))
+    return errors
+
+# --- Parallel Analysis ---
+#
+# Function bodies only read the global scope, so once the global symbols are known they can
+# be checked independently. Phase one declares the global variables and functions in source
+# order, recording the position of each declaration; phase two checks the function bodies in
+# forked worker processes, which inherit the AST and the global scope, so a task is just a
+# range of functions (pickling the AST would cost more than analyzing it). A body must only
+# see the globals declared before it (and itself), as in the sequential analysis, so each one
+# gets a view of the global scope limited to its position. The results are merged in source
+# order, and the first exception in source order (e.g., a redeclared function) is raised,
+# exactly as the sequential analysis would. The workers must be forked after phase one, so
+# each analysis starts its own pool; a process running other threads (e.g., a threaded
+# web server) analyzes sequentially, since forking it could copy a lock held by another
+# thread into the workers.
+
+PARALLEL_MIN_FUNCTIONS = 256  # Smaller programs are analyzed sequentially
+PARALLEL_TASKS_PER_WORKER = 4
+
+_phase_one = None  # (symbols, positions, functions, budget, imports), inherited by the forked workers
+
+
+class GlobalScopeView(SymbolTable):
+    """
+    Read-only view of the global scope as it was when a given declaration was analyzed.
+    """
+    def __init__(self, symbols, positions, position, parent=None):
+        """
+        Initializes the view.
+
+        Args:
+            symbols (dict): All global symbols (key: info).
+            positions (dict): Maps each global symbol key to the position of its declaration.
+            position (int): Only symbols declared at or before this position are visible.
+            parent (SymbolTable, optional): The parent of the global scope. Defaults to None.
+        """
+        super().__init__(parent)
+        self.symbols = symbols
+        self.positions = positions
+        self.position = position
+
+    def get(self, name):
+        if name in self.symbols and self.positions[name] <= self.position:
+            return self.symbols[name]
+        elif self.parent:
+            return self.parent.get(name)
+        return None
+
+    def set(self, name, value):
+        raise SemanticError("The global scope cannot be changed while checking a function body")
+
+
+def check_functions(start, end):
+    """
+    Phase two task, run in a forked worker: checks functions start to end-1 of phase one.
+
+    Returns:
+        list: (position, messages, exception or None) for each checked function. The task
+        stops at the first exception, since later functions would not be reached.
+    """
+    symbols, positions, functions, budget, imports = _phase_one
+    results = []
+    for position, node in functions[start:end]:
+        messages = Diagnostics('semantic errors')
+        _, check_function = make_visitor(messages, budget)
+        try:
+            check_function(node, GlobalScopeView(symbols, positions, position, imports))
+        except Exception as error:
+            results.append((position, list(messages), error))
+            break
+        results.append((position, list(messages), None))
+    return results
+
+
+def parallel_available():
+    """
+    Returns True if worker processes can be forked safely: on this platform, and while no
+    other thread is running.
+    """
+    return 'fork' in multiprocessing.get_all_start_methods() and threading.active_count() == 1
+
+
+def analyze_in_parallel(ast, errors, workers, budget=None, imports=None):
+    """
+    Analyzes a Program in two phases, checking the function bodies in forked worker processes.
+
+    Args:
+        ast (Program): The root of the AST.
+        errors (list): The list that receives the semantic error messages, in source order.
+        workers (int): The number of worker processes.
+        budget (limits.Budget, optional): Resource budget. Defaults to None.
+        imports (SymbolTable, optional): The parent of the global scope. Defaults to None.
+    """
+    global _phase_one
+    # Phase one: declare the globals in source order.
+    global_scope = SymbolTable(imports)
+    positions = {}
+    results = {}  # Maps a position to its (messages, exception)
+    functions = []
+    for position, declaration in enumerate(ast.declarations):
+        messages = []
+        try:
+            if isinstance(declaration, FunctionDefinition):
+                if budget is not None:
+                    budget.tick()
+                global_scope.set(symbol_key(declaration), function_info(declaration))
+                functions.append((position, declaration))
+            else:
+                visit, _ = make_visitor(messages, budget)
+                visit(declaration, global_scope)
+        except Exception as error:
+            results[position] = (messages, error)
+            break  # Nothing after this point is analyzed
+        finally:
+            # A top-level declaration only ever declares its own name.
+            key = symbol_key(declaration)
+            if key in global_scope.symbols and key not in positions:
+                positions[key] = position
+        results[position] = (messages, None)
+
+    # Phase two: check the function bodies, a contiguous range of functions per task.
+    task_size = max(1, -(-len(functions) // (workers * PARALLEL_TASKS_PER_WORKER)))
+    _phase_one = (global_scope.symbols, positions, functions, budget, imports)
+    # Keep the workers' garbage collector off the inherited objects (no copy-on-write). A
+    # caller that froze already (e.g., a fork server template) keeps its freeze.
+    froze = gc.get_freeze_count() == 0
+    if froze:
+        gc.freeze()
+    try:
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(workers, mp_context=context) as executor:
+            futures = [executor.submit(check_functions, start, start + task_size)
+                       for start in range(0, len(functions), task_size)]
+            for future in futures:
+                for position, messages, error in future.result():
+                    results[position] = (messages, error)
+    finally:
+        if froze:
+            gc.unfreeze()
+        _phase_one = None
+
+    # Merge the results in source order.
+    for position in sorted(results):
+        messages, error = results[position]
+        for message in messages:
+            errors.append(message)
+        if error is not None:
+            raise error
@@ -2,6 +2,7 @@ document.addEventListener('DOMContentLoaded', function() {
     const codeEditor = document.getElementById('code-editor');
     const lineNumbers = document.getElementById('line-numbers');
     const runButton = document.getElementById('run-button');
+    const executeCheckbox = document.getElementById('execute-checkbox');
     const output = document.getElementById('output');
 
     // Initialize line numbers
@@ -47,7 +48,9 @@ document.addEventListener('DOMContentLoaded', function() {
             },
             body: JSON.stringify({
                 code: code,
-                lineCount: lineCount
+                lineCount: lineCount,
+                format: 'columnar', // Compact token encoding (decoded by decodeTokens)
+                run: executeCheckbox.checked // Also run the program (natively) only when asked to
             })
         })
         .then(response => response.json())
@@ -61,13 +64,26 @@ document.addEventListener('DOMContentLoaded', function() {
 
                 // If you want to display tokens or AST information
                 if (data.output && data.output.tokens) {
-                    const tokenCount = data.output.tokens.length;
+                    const tokens = decodeTokens(data.output.tokens);
+                    const tokenCount = tokens.length;
                     resultText += `\n\nTokens found: ${tokenCount}`;
 
                     // Add semantic analysis success message
                     resultText += "\n\nSemantic analysis: No errors found";
                 }
 
+                // Result of running the program
+                if (data.output && data.output.run) {
+                    const run = data.output.run;
+                    if (run.error) {
+                        resultText += `\n\nRuntime error: ${run.error}`;
+                    } else if (run.returnValue !== null && run.returnValue !== undefined) {
+                        resultText += `\n\nReturn value: ${run.returnValue}`;
+                    } else {
+                        resultText += "\n\nProgram finished";
+                    }
+                }
+
                 output.textContent = resultText;
             }
         })
@@ -80,6 +96,24 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
+    // Decodes the tokens of a /run_code response into a list of {type, value, offset} objects.
+    // The columnar format sends each type as an index into tokenTypes, with the values and
+    // offsets in parallel arrays; the older format is already a list of {type, value} objects.
+    function decodeTokens(tokens) {
+        if (tokens.format !== 'columnar') {
+            return tokens;
+        }
+        const decoded = new Array(tokens.types.length);
+        for (let i = 0; i < tokens.types.length; i++) {
+            decoded[i] = {
+                type: tokens.tokenTypes[tokens.types[i]],
+                value: tokens.values[i],
+                offset: tokens.offsets[i]
+            };
+        }
+        return decoded;
+    }
+
     // Add keyboard shortcut (Ctrl+Enter or Cmd+Enter) to run code
     codeEditor.addEventListener('keydown', function(e) {
         if ((e.ctrlKey || e.metaKey) && e.key === 'Enter') {
@@ -0,0 +1,237 @@
+# stream_lexer.py
+import codecs
+import mmap
+import re
+
+import lexer as lexer_module
+from lexer import reset_lexer
+
+# --- Streaming Lexer ---
+#
+# Tokenizes a source that arrives in chunks (a file object, an mmap or any iterable of
+# strings/bytes) without holding the whole text in memory. Incoming text is buffered until
+# it can be cut at a "safe" newline: one that is outside block comments and character
+# literals, so no token spans the cut. Each safe segment is lexed by a clone of the PLY
+# lexer and its tokens are yielded lazily with lexpos values relative to the whole source.
+
+DEFAULT_CHUNK_SIZE = 1 << 16  # 64 KiB
+
+# Scanner states
+CODE = 0  # Between tokens
+LINE_COMMENT = 1  # Inside a // comment
+BLOCK_COMMENT = 2  # Inside a /* ... */ comment
+
+_INTERESTING = re.compile(r"[\n/']")  # Characters that may start or end a comment/literal
+_CHAR_LITERAL = re.compile(lexer_module.t_CHAR_LIT.__doc__, re.VERBOSE)  # Same pattern (and flags) as the lexer rule
+_CHAR_LOOKAHEAD = 4  # Longest character literal, e.g. '\n'
+
+
+def read_chunks(source, chunk_size=DEFAULT_CHUNK_SIZE, encoding='utf-8'):
+    """
+    Iterates over the text of a source in chunks.
+
+    Args:
+        source: A str, bytes, a file object or mmap (anything with read()), or an iterable of str/bytes chunks.
+        chunk_size (int): The size of each read.
+        encoding (str): The encoding used to decode byte chunks.
+
+    Yields:
+        str: Decoded text chunks.
+    """
+    if isinstance(source, (str, bytes)):
+        source = [source]
+    if hasattr(source, 'read'):
+        chunks = iter(lambda: source.read(chunk_size), source.read(0))
+    else:
+        chunks = iter(source)
+    decoder = codecs.getincrementaldecoder(encoding)()
+    for chunk in chunks:
+        if isinstance(chunk, (bytes, bytearray)):
+            chunk = decoder.decode(chunk)
+        if chunk:
+            yield chunk
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+class StreamLexer:
+    """
+    Lexer over a chunked source. It can be passed to parser.parse() as the lexer (together
+    with tokenfunc=stream.token) or iterated with tokens().
+    """
+    def __init__(self, source, chunk_size=DEFAULT_CHUNK_SIZE, encoding='utf-8', lexer=None):
+        """
+        Initializes the streaming lexer.
+
+        Args:
+            source: The source to tokenize (see read_chunks).
+            chunk_size (int): The size of each read from the source.
+            encoding (str): The encoding used to decode byte chunks.
+            lexer: The PLY lexer to clone. Defaults to the module-level lexer from lexer.py.
+        """
+        self.inner = (lexer or lexer_module.lexer).clone()
+        reset_lexer(self.inner)
+        self.intern_table = self.inner.intern_table
+        self.lexdata = ''  # Text of the segment currently being lexed
+        self.chunk_base = 0  # Offset of that segment in the whole source
+        self._chunks = read_chunks(source, chunk_size, encoding)
+        self._pieces = []  # Buffered text that can't be cut yet
+        self._tail = ''  # Up to a few trailing characters the scanner couldn't classify yet
+        self._state = CODE
+        self._next_base = 0  # Offset of the first buffered character
+        self._generator = None
+
+    @classmethod
+    def from_path(cls, path, **kwargs):
+        """
+        Creates a streaming lexer over a memory-mapped file.
+
+        Args:
+            path (str): The path of the source file.
+            **kwargs: Passed to the constructor.
+
+        Returns:
+            StreamLexer: The lexer. Its file is closed once the stream is exhausted.
+        """
+        def mapped_chunks(chunk_size=kwargs.get('chunk_size', DEFAULT_CHUNK_SIZE)):
+            with open(path, 'rb') as file:
+                try:
+                    mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                except ValueError:
+                    return  # Empty files can't be mapped
+                with mapped:
+                    for start in range(0, len(mapped), chunk_size):
+                        yield mapped[start:start + chunk_size]
+        return cls(mapped_chunks(), **kwargs)
+
+    @property
+    def lineno(self):
+        return self.inner.lineno
+
+    def _scan(self, text, final):
+        """
+        Scans newly buffered text for safe cut points, updating the scanner state.
+
+        Args:
+            text (str): The text to scan (the previous tail plus a new chunk).
+            final (bool): True if no more text will follow.
+
+        Returns:
+            tuple: (index just after the last safe newline or -1, index where the undecided tail starts).
+        """
+        state = self._state
+        cut = -1
+        pos = 0
+        length = len(text)
+        while pos < length:
+            if state == CODE:
+                match = _INTERESTING.search(text, pos)
+                if not match:
+                    break
+                index = match.start()
+                char = text[index]
+                if char == '\n':
+                    cut = pos = index + 1
+                elif char == '/':
+                    if index + 1 == length:
+                        if final:
+                            break
+                        self._state = state
+                        return cut, index
+                    following = text[index + 1]
+                    if following == '/':
+                        state, pos = LINE_COMMENT, index + 2
+                    elif following == '*':
+                        state, pos = BLOCK_COMMENT, index + 2
+                    else:
+                        pos = index + 1
+                else:  # A quote: either a character literal or an illegal character
+                    literal = _CHAR_LITERAL.match(text, index)
+                    if literal:
+                        pos = literal.end()
+                    elif length - index < _CHAR_LOOKAHEAD and not final:
+                        self._state = state
+                        return cut, index
+                    else:
+                        pos = index + 1
+            elif state == LINE_COMMENT:
+                index = text.find('\n', pos)
+                if index == -1:
+                    break
+                state = CODE
+                cut = pos = index + 1
+            else:
+                index = text.find('*/', pos)
+                if index == -1:
+                    self._state = state
+                    # A trailing '*' may be the first half of the terminator
+                    undecided = length - 1 if text.endswith('*') and not final else length
+                    return cut, max(undecided, pos)
+                state, pos = CODE, index + 2
+        self._state = state
+        return cut, length
+
+    def _segments(self):
+        """
+        Yields (offset, text) segments of the source that can be lexed independently.
+        """
+        for chunk in self._chunks:
+            text = self._tail + chunk
+            cut, undecided = self._scan(text, False)
+            self._tail = text[undecided:]
+            if cut == -1:
+                self._pieces.append(text[:undecided])
+                continue
+            segment = ''.join(self._pieces) + text[:cut]
+            self._pieces = [text[cut:undecided]]
+            base = self._next_base
+            self._next_base += len(segment)
+            yield base, segment
+        segment = ''.join(self._pieces) + self._tail
+        self._pieces = []
+        self._tail = ''
+        if segment:
+            yield self._next_base, segment
+
+    def tokens(self):
+        """
+        Lazily yields the tokens of the whole source. Token lexpos values are offsets in the
+        whole source, and each token's 'lexer' attribute refers to this StreamLexer.
+        """
+        inner = self.inner
+        for base, segment in self._segments():
+            self.lexdata = segment
+            self.chunk_base = base
+            inner.input(segment)
+            while True:
+                tok = inner.token()
+                if not tok:
+                    break
+                tok.lexpos += base
+                tok.lexer = self
+                yield tok
+
+    def token(self):
+        """
+        Returns the next token, or None at the end of the source (PLY's lexer protocol).
+        """
+        if self._generator is None:
+            self._generator = self.tokens()
+        return next(self._generator, None)
+
+
+def parse_stream(source, **kwargs):
+    """
+    Parses a chunked source, feeding the parser lazily from a StreamLexer.
+
+    Args:
+        source: The source to parse (see read_chunks), or a StreamLexer.
+        **kwargs: Passed to the StreamLexer constructor.
+
+    Returns:
+        Program: The root of the AST (or None if parsing failed).
+    """
+    import parser as parser_module
+    stream = source if isinstance(source, StreamLexer) else StreamLexer(source, **kwargs)
+    return parser_module.parser.parse(lexer=stream, tokenfunc=stream.token)
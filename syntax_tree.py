@@ -21,21 +21,23 @@ class Program(Node):
     """
     Represents the root of the AST, containing a list of top-level declarations.
     """
-    def __init__(self, declarations):
+    def __init__(self, declarations, symbols=None):
         """
         Initializes a Program object.
 
         Args:
             declarations (list): A list of external declarations (e.g., FunctionDefinition, Declaration).
+            symbols (InternTable, optional): The intern table that issued the symbol ids in this tree. Defaults to None.
         """
         super().__init__()
         self.declarations = declarations
+        self.symbols = symbols
 
 class FunctionDefinition(Node):
     """
     Represents the definition of a function.
     """
-    def __init__(self, return_type, name, params, body):
+    def __init__(self, return_type, name, params, body, symbol_id=None):
         """
         Initializes a FunctionDefinition object.
 
@@ -44,28 +46,32 @@ class FunctionDefinition(Node):
             name (str): The name of the function.
             params (list): A list of Parameter objects representing the function's parameters.
             body (Block): A Block object representing the function's body.
+            symbol_id (int, optional): The interned id of the function name. Defaults to None.
         """
         super().__init__()
         self.return_type = return_type
         self.name = name
         self.params = params
         self.body = body
+        self.symbol_id = symbol_id
 
 class Parameter(Node):
     """
     Represents a parameter in a function definition.
     """
-    def __init__(self, param_type, name):
+    def __init__(self, param_type, name, symbol_id=None):
         """
         Initializes a Parameter object.
 
         Args:
             param_type (str): The data type of the parameter (e.g., 'int', 'float').
             name (str): The name of the parameter.
+            symbol_id (int, optional): The interned id of the parameter name. Defaults to None.
         """
         super().__init__()
         self.param_type = param_type
         self.name = name
+        self.symbol_id = symbol_id
 
 class Block(Node):
     """
@@ -85,7 +91,7 @@ class Declaration(Node):
     """
     Represents a variable declaration.
     """
-    def __init__(self, data_type, name, initializer):
+    def __init__(self, data_type, name, initializer, symbol_id=None):
         """
         Initializes a Declaration object.
 
@@ -93,11 +99,13 @@ class Declaration(Node):
             data_type (str): The data type of the variable (e.g., 'int', 'char').
             name (str): The name of the variable.
             initializer (Node, optional): An Expression node representing the initial value. Defaults to None.
+            symbol_id (int, optional): The interned id of the variable name. Defaults to None.
         """
         super().__init__()
         self.data_type = data_type
         self.name = name
         self.initializer = initializer
+        self.symbol_id = symbol_id
 
 class Assignment(Node):
     """
@@ -205,7 +213,7 @@ class Identifier(Node):
     """
     Represents an identifier (e.g., a variable name).
     """
-    def __init__(self, name, lineno=None, lexpos=None):
+    def __init__(self, name, lineno=None, lexpos=None, symbol_id=None):
         """
         Initializes an Identifier object.
 
@@ -213,9 +221,11 @@ class Identifier(Node):
             name (str): The name of the identifier.
             lineno (int, optional): The line number in the source code. Defaults to None.
             lexpos (int, optional): The starting lexical position in the source code. Defaults to None.
+            symbol_id (int, optional): The interned id of the name (see lexer.InternTable). Defaults to None.
         """
         super().__init__(lineno, lexpos)
         self.name = name
+        self.symbol_id = symbol_id
 
 class Literal(Node):
     """
@@ -259,4 +269,68 @@ class CallExpression(Node):
         """
         super().__init__()
         self.callee = callee
-        self.arguments = arguments
\ No newline at end of file
+        self.arguments = arguments
+
+
+# --- Serialization ---
+#
+# to_dict/from_dict convert an AST to and from plain JSON-compatible data, so that a
+# parsed program can be stored (see compile_cache.py) and restored in another process.
+
+NODE_TYPES = {cls.__name__: cls for cls in (
+    Program, FunctionDefinition, Parameter, Block, Declaration, Assignment, ReturnStatement, IfStatement,
+    ForStatement, WhileStatement, BinaryExpression, Identifier, Literal, EmptyStatement, CallExpression,
+)}
+
+def to_dict(value):
+    """
+    Converts an AST (or any value found in one) into JSON-compatible data.
+    Each node becomes a dict with its class name under 'node' and its attributes;
+    the intern table of a Program is stored as its list of names.
+
+    Args:
+        value: A Node, a list of nodes, or a plain value (str, int, float, bool, None).
+
+    Returns:
+        The JSON-compatible data.
+    """
+    if isinstance(value, list):
+        return [to_dict(item) for item in value]
+    if not isinstance(value, Node):
+        return value
+    if hasattr(value, 'materialize'):
+        value = value.materialize()  # A lazily parsed node (see outline.py)
+    data = {'node': type(value).__name__}
+    for name, attribute in vars(value).items():
+        if name == 'symbols' and attribute is not None:
+            data[name] = list(getattr(attribute, 'names', attribute))
+        else:
+            data[name] = to_dict(attribute)
+    return data
+
+def from_dict(data):
+    """
+    Rebuilds an AST from the data produced by to_dict. A Program's symbols are restored
+    as a list of names, which supports the same symbol id lookups as the intern table.
+
+    Args:
+        data: The data produced by to_dict.
+
+    Returns:
+        The rebuilt Node (or list, or plain value).
+
+    Raises:
+        ValueError: If the data names an unknown node type.
+    """
+    if isinstance(data, list):
+        return [from_dict(item) for item in data]
+    if not isinstance(data, dict):
+        return data
+    cls = NODE_TYPES.get(data.get('node'))
+    if cls is None:
+        raise ValueError(f"Unknown AST node type: {data.get('node')!r}")
+    node = cls.__new__(cls)
+    for name, attribute in data.items():
+        if name != 'node':
+            setattr(node, name, attribute if name == 'symbols' else from_dict(attribute))
+    return node
@@ -0,0 +1,234 @@
+import unittest
+from lexer import lexer, reset_lexer, InternTable
+from parser import parser
+from semantic import semantic_analyzer
+
+
+def lex_all(code):
+    lexer.input(code)
+    tokens = []
+    while True:
+        tok = lexer.token()
+        if not tok:
+            break
+        tokens.append(tok)
+    return tokens
+
+
+class InternTableTest(unittest.TestCase):
+    def setUp(self):
+        reset_lexer(lexer)
+
+    def test_identifiers_share_symbol_ids_and_strings(self):
+        tokens = [tok for tok in lex_all("int total = 0; total = total + count;") if tok.type == 'ID']
+        totals = [tok for tok in tokens if tok.value == 'total']
+        self.assertEqual(len(totals), 3)
+        self.assertEqual(len({tok.symbol_id for tok in totals}), 1)
+        self.assertTrue(all(tok.value is totals[0].value for tok in totals))
+        count = [tok for tok in tokens if tok.value == 'count'][0]
+        self.assertNotEqual(count.symbol_id, totals[0].symbol_id)
+        self.assertEqual(lexer.intern_table[count.symbol_id], 'count')
+
+    def test_reset_starts_a_new_table(self):
+        lex_all("int a; int b;")
+        self.assertEqual(len(lexer.intern_table), 2)
+        reset_lexer(lexer)
+        self.assertIsInstance(lexer.intern_table, InternTable)
+        self.assertEqual(len(lexer.intern_table), 0)
+
+    def test_ast_nodes_carry_symbol_ids(self):
+        code = "int add(int a, int b) { int c = a + b; return c; }"
+        ast = parser.parse(code, lexer=lexer)
+        function = ast.declarations[0]
+        self.assertIs(ast.symbols, lexer.intern_table)
+        self.assertEqual(ast.symbols[function.symbol_id], 'add')
+        declaration = function.body.statements[0]
+        returned = function.body.statements[1].value
+        self.assertEqual(declaration.symbol_id, returned.symbol_id)
+        self.assertEqual(function.params[0].symbol_id, declaration.initializer.left.symbol_id)
+        self.assertEqual(semantic_analyzer(ast), [])
+
+
+class StreamLexerTest(unittest.TestCase):
+    samples = [
+        "int x; /* multi\n line */ int y = 'a';\n// comment /* not\nint z = '\\n'; char q = '/';\n",
+        "int a = 1; /* spans\n\n several lines */ int b = a / 2;\n",
+        "x = '/*'; int c;\n int d; */\n",
+        "int main() { int x; x = 10; return x; }",
+    ]
+
+    def reference(self, code):
+        reference_lexer = lexer.clone()
+        reset_lexer(reference_lexer)
+        reference_lexer.input(code)
+        tokens = []
+        while True:
+            tok = reference_lexer.token()
+            if not tok:
+                break
+            tokens.append((tok.type, tok.value, tok.lineno, tok.lexpos))
+        return tokens
+
+    def test_tokens_match_across_chunk_boundaries(self):
+        import io
+        from stream_lexer import StreamLexer
+        for code in self.samples:
+            expected = self.reference(code)
+            for chunk_size in (1, 2, 3, 5, 64):
+                stream = StreamLexer(io.StringIO(code), chunk_size=chunk_size)
+                tokens = [(tok.type, tok.value, tok.lineno, tok.lexpos) for tok in stream.tokens()]
+                self.assertEqual(tokens, expected, (code, chunk_size))
+            stream = StreamLexer(io.BytesIO(code.encode('utf-8')), chunk_size=3)
+            self.assertEqual([(tok.type, tok.value, tok.lineno, tok.lexpos) for tok in stream.tokens()], expected)
+
+    def test_parse_memory_mapped_file(self):
+        import os
+        import tempfile
+        import parser as parser_module
+        from stream_lexer import StreamLexer, parse_stream
+        code = "int add(int a, int b) {\n    return a + b;\n}\nint main() {\n    int x = 1\n    return x;\n}\n"
+        with tempfile.NamedTemporaryFile('w', suffix='.c', delete=False) as file:
+            file.write(code)
+        try:
+            parser_module.syntax_errors.clear()
+            parse_stream(StreamLexer.from_path(file.name, chunk_size=8))
+            self.assertEqual(parser_module.syntax_errors[0],
+                             "Syntax error at line 6, column 6: Unexpected token 'return' of type 'RETURN'")
+        finally:
+            parser_module.syntax_errors.clear()
+            os.unlink(file.name)
+
+
+class CommentScanningTest(unittest.TestCase):
+    def setUp(self):
+        reset_lexer(lexer)
+
+    def test_unterminated_block_comment_is_reported(self):
+        from lexer import lexical_errors
+        tokens = lex_all("int a;\n/* never closed\nint b;\n")
+        self.assertEqual([tok.type for tok in tokens], ['TYPE', 'ID', 'SEMI'])
+        self.assertEqual(lexical_errors, ["Lexical error at line 2: Unterminated block comment"])
+        self.assertEqual(lexer.lineno, 4)
+
+    def test_block_comment_counts_lines(self):
+        tokens = lex_all("int a; /* one\ntwo\nthree */ int b;")
+        self.assertEqual(tokens[-2].value, 'b')
+        self.assertEqual(tokens[-2].lineno, 3)
+
+    def test_escaped_quote_character_literal(self):
+        tokens = lex_all("char c = '\\''; char d = '\\\\';")
+        literals = [tok.value for tok in tokens if tok.type == 'CHAR_LIT']
+        self.assertEqual(literals, ["'", "\\"])
+
+    def test_worst_case_corpus_scales_linearly(self):
+        import time
+        from benchmark import worst_case_lexer_inputs, lex_count
+        for name in worst_case_lexer_inputs(1):
+            timings = []
+            for size in (4000, 16000):
+                code = worst_case_lexer_inputs(size)[name]
+                start = time.perf_counter()
+                lex_count(code)
+                timings.append(time.perf_counter() - start)
+            # Quadrupling the input must not take anywhere near 16x longer.
+            self.assertLess(timings[1], 10 * timings[0] + 0.05, name)
+
+    def test_random_inputs_never_raise(self):
+        import random
+        from benchmark import lex_count
+        generator = random.Random(29)
+        alphabet = "/*'\\\n ab1."
+        for _ in range(300):
+            code = ''.join(generator.choice(alphabet) for _ in range(generator.randint(0, 40)))
+            lex_count(code)
+
+
+class DiagnosticsTest(unittest.TestCase):
+    def setUp(self):
+        reset_lexer(lexer)
+        self.addCleanup(reset_lexer, lexer)
+
+    def test_illegal_runs_are_skipped_at_once(self):
+        from lexer import lexical_warnings
+        tokens = lex_all("int a;\n\x00\x01\x02@@ int b; % char c;")
+        self.assertEqual([tok.value for tok in tokens], ['int', 'a', ';', 'int', 'b', ';', 'char', 'c', ';'])
+        self.assertEqual(list(lexical_warnings), ["Illegal characters '\x00\x01\x02@@' at line 2",
+                                                  "Illegal character '%' at line 2"])
+
+    def test_reset_clears_errors_and_warnings(self):
+        from lexer import lexical_errors, lexical_warnings
+        lex_all("int a; @\n/* never closed\n")
+        self.assertTrue(lexical_errors and lexical_warnings)
+        reset_lexer(lexer)
+        self.assertEqual((list(lexical_errors), list(lexical_warnings)), ([], []))
+
+    def test_import_leaves_logging_alone(self):
+        import os
+        import subprocess
+        import sys
+        script = ("import logging, sys, lexer\n"
+                  "compiler = logging.getLogger('compiler')\n"
+                  "print(compiler.handlers, compiler.propagate, 'logging.handlers' in sys.modules)")
+        output = subprocess.run([sys.executable, '-c', script], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.split(), ['[]', 'True', 'False'])
+
+    def test_messages_are_capped_and_nothing_is_printed(self):
+        import contextlib
+        import io
+        from diagnostics import MAX_DIAGNOSTICS
+        from pipeline import run_code
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            result = run_code("int main() { return 0; }\n" + "x\x00 ;\n" * 1000, 1)
+        self.assertEqual(output.getvalue(), "")
+        messages = result['error'].split('\n')
+        self.assertEqual(len(messages), MAX_DIAGNOSTICS + 2)
+        self.assertEqual(messages[-2], f"Too many syntax errors; only the first {MAX_DIAGNOSTICS} are reported")
+
+
+class IncrementalLexerTest(unittest.TestCase):
+    source = "int main() {\n  int x = 1; /* a comment */\n  char c = 'a';\n  return x + 2.5e3;\n}\n"
+
+    def assert_matches_full_lex(self, buffer):
+        from incremental_lexer import IncrementalLexer
+        expected = [(tok.type, tok.value, tok.lineno, tok.lexpos) for tok in IncrementalLexer(buffer.text).tokens]
+        self.assertEqual([(tok.type, tok.value, tok.lineno, tok.lexpos) for tok in buffer.tokens], expected)
+
+    def test_local_edit_relexes_a_few_tokens(self):
+        from incremental_lexer import IncrementalLexer
+        buffer = IncrementalLexer(self.source * 50)
+        offset = buffer.text.index('x = 1') + 1
+        change = buffer.edit(offset, 0, 'yz')
+        self.assertLessEqual(buffer.relexed, 4)
+        self.assertIn('xyz', [tok.value for tok in change.added])
+        self.assert_matches_full_lex(buffer)
+
+    def test_opening_and_closing_block_comments(self):
+        from incremental_lexer import IncrementalLexer
+        buffer = IncrementalLexer(self.source)
+        buffer.edit(buffer.text.index('*/'), 2, '')  # The comment now runs to the end
+        self.assertEqual([tok.value for tok in buffer.tokens[-3:]], ['=', 1, ';'])
+        self.assert_matches_full_lex(buffer)
+        buffer.edit(buffer.text.index("char"), 0, '*/ ')  # Closed again, before 'char'
+        self.assert_matches_full_lex(buffer)
+        buffer.edit(buffer.text.index('2.5e3') + 4, 0, '\n/')  # Splits the number, adds a line
+        self.assert_matches_full_lex(buffer)
+
+    def test_random_edits_match_a_full_relex(self):
+        import random
+        from incremental_lexer import IncrementalLexer
+        rng = random.Random(7)
+        pieces = ['/*', '*/', '//', '\n', ' ', 'x', '1', '.', 'e', '+', "'", '=', ';', 'int', '\\', '*']
+        buffer = IncrementalLexer(self.source * 4)
+        for step in range(300):
+            offset = rng.randint(0, len(buffer.text))
+            deleted = min(rng.randint(0, 3), len(buffer.text) - offset)
+            buffer.edit(offset, deleted, ''.join(rng.choice(pieces) for _ in range(rng.randint(0, 3))))
+            if step % 7 == 0:  # Reading the tokens settles the pending shifts
+                self.assert_matches_full_lex(buffer)
+        self.assert_matches_full_lex(buffer)
+
+
+if __name__ == '__main__':
+    unittest.main()
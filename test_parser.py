@@ -429,3 +429,544 @@ class ParserTest(unittest.TestCase):
         lexer.input(code)
         ast = parser.parse(code, lexer=lexer)
         self.assertIsNotNone(ast) # Check if parsing was successful
+
+
+class FlatASTTest(unittest.TestCase):
+    def test_semantic_analysis_matches_object_ast(self):
+        from flat_ast import parse_flat
+        for code in ParserTest.code_snippets:
+            lexer.input(code)
+            ast = parser.parse(code, lexer=lexer)
+            flat = parse_flat(code, lexer=lexer)
+            if ast is None:
+                continue
+            self.assertEqual(semantic_analyzer(flat.view()), semantic_analyzer(ast), code)
+
+    def test_columns_and_visitor(self):
+        from flat_ast import parse_flat, FlatVisitor
+        flat = parse_flat("int add(int a, int b) { return a + b; }", lexer=lexer)
+        self.assertEqual(flat.kind_of(flat.root), 'Program')
+        kinds = [flat.kind_of(node) for node in flat.walk()]
+        self.assertEqual(kinds, ['Program', 'FunctionDefinition', 'Parameter', 'Parameter', 'Block',
+                                 'ReturnStatement', 'BinaryExpression', 'Identifier', 'Identifier'])
+
+        class NameCollector(FlatVisitor):
+            def __init__(self, ast):
+                super().__init__(ast)
+                self.names = []
+
+            def visit_Identifier(self, node):
+                self.names.append(self.ast.names[self.ast.name[node]])
+
+        collector = NameCollector(flat)
+        collector.visit(flat.root)
+        self.assertEqual(collector.names, ['a', 'b'])
+
+    def test_default_factory_restored(self):
+        from flat_ast import parse_flat
+        parse_flat("int x = 1;", lexer=lexer)
+        ast = parser.parse("int x = 1;", lexer=lexer)
+        self.assertIsInstance(ast, Program)
+
+
+class ControlFlowTest(unittest.TestCase):
+    def analyze(self, code):
+        lexer.lineno = 1
+        return list(semantic_analyzer(parser.parse(code, lexer=lexer)))
+
+    def test_every_path_must_return(self):
+        self.assertEqual(self.analyze("int f(int n) { if (n > 0) { return 1; } }"),
+                         ["Semantic Error: Not all paths of non-void function 'f' return a value."])
+        self.assertEqual(self.analyze("int f(int n) { if (n > 0) { return 1; } else { return 2; } }"), [])
+        self.assertEqual(self.analyze("int f(int n) { while (true) { if (n > 1) { return n; } } }"), [])
+        self.assertEqual(self.analyze("int f(int n) { while (n > 0) { return n; } }"),
+                         ["Semantic Error: Not all paths of non-void function 'f' return a value."])
+
+    def test_use_before_assignment(self):
+        self.assertEqual(self.analyze("int f() { int x; return x; }"),
+                         ["Semantic Error: 'x' is used before it is assigned."])
+        self.assertEqual(self.analyze("int f(int n) { int x; if (n > 0) { x = 1; } return x; }"),
+                         ["Semantic Error: 'x' may be used before it is assigned."])
+        self.assertEqual(self.analyze("int f(int n) { int x; if (n > 0) { x = 1; } else { x = 2; } return x; }"), [])
+        # The variable of the inner block is out of scope at the return.
+        self.assertEqual(self.analyze("int f() { { int x = 1; x = x + 1; } int x; return x; }"),
+                         ["Semantic Error: 'x' is used before it is assigned."])
+
+    def test_data_flow_analyses(self):
+        from cfg import build_cfg, live_variables, reaching_definitions
+        lexer.lineno = 1
+        ast = parser.parse("int f(int n) { int s = 0; while (n > 0) { s = s + n; n = n - 1; } return s; }", lexer=lexer)
+        cfg = build_cfg(ast.declarations[0])
+        self.assertEqual([node.name for node in cfg.variables], ['n', 's'])
+        live_in, live_out = live_variables(cfg)
+        self.assertEqual(live_in[cfg.entry.index], 0)  # Parameters are defined on entry
+        self.assertEqual(live_out[cfg.entry.index], 0b11)
+        reaching, _ = reaching_definitions(cfg)
+        # Both definitions of s (the initializer and the assignment in the loop) reach the return.
+        block, _ = cfg.returns[0]
+        s_definitions = {definition for definition, (variable, _) in enumerate(cfg.definitions) if variable == 1}
+        self.assertEqual({d for d in s_definitions if reaching[block.index] >> d & 1}, s_definitions)
+        self.assertEqual(len(s_definitions), 2)
+
+
+class ParallelSemanticTest(unittest.TestCase):
+    def analyze(self, code, workers):
+        import semantic
+        from unittest import mock
+        lexer.lineno = 1
+        ast = parser.parse(code, lexer=lexer)
+        with mock.patch.object(semantic, 'PARALLEL_MIN_FUNCTIONS', 2):
+            try:
+                return list(semantic_analyzer(ast, workers=workers))
+            except Exception as error:
+                return type(error).__name__, str(error)
+
+    def test_matches_sequential_analysis(self):
+        functions = [f"int f{n}(int a) {{ return a + g{n % 7}; }}" for n in range(40)]
+        functions[5] = "int f5() { int q = true; return q; }"
+        functions[9] = "int g9 = 1;"
+        functions[12] = "int f12() { f30(1); return 1; }"  # f30 is declared later
+        functions[20] = "void h() { x = 1; }"
+        code = "int g0 = 0; int g1 = 1; int g2 = 2;\n" + "\n".join(functions)
+        sequential = self.analyze(code, None)
+        self.assertIn("Semantic Error: Function 'f30' not declared.", sequential)
+        self.assertEqual(self.analyze(code, 3), sequential)
+        # The first exception in source order is raised, as in the sequential analysis.
+        functions[30] = "int f3(int a) { return a; }"
+        code = "\n".join(functions)
+        self.assertEqual(self.analyze(code, 3), ('SemanticError', "'f3' already declared in this scope"))
+        self.assertEqual(self.analyze(code, 3), self.analyze(code, None))
+
+    def test_callers_gc_freeze_is_kept(self):
+        import gc
+        code = "\n".join(f"int f{n}(int a) {{ return a; }}" for n in range(8))
+        gc.freeze()
+        try:
+            self.assertEqual(self.analyze(code, 2), [])
+            self.assertGreater(gc.get_freeze_count(), 0)
+        finally:
+            gc.unfreeze()
+
+    def test_sequential_while_other_threads_run(self):
+        import semantic
+        import threading
+        from unittest import mock
+        code = "\n".join(f"int f{n}(int a) {{ return a; }}" for n in range(8))
+        release = threading.Event()
+        thread = threading.Thread(target=release.wait)
+        thread.start()
+        try:
+            with mock.patch.object(semantic, 'analyze_in_parallel') as parallel:
+                self.assertEqual(self.analyze(code, 2), [])
+            parallel.assert_not_called()
+        finally:
+            release.set()
+            thread.join()
+
+
+class SerializationTest(unittest.TestCase):
+    def test_round_trip_preserves_semantics(self):
+        import json
+        for code in ParserTest.code_snippets:
+            lexer.input(code)
+            ast = parser.parse(code, lexer=lexer)
+            if ast is None:
+                continue
+            data = json.loads(json.dumps(to_dict(ast)))
+            restored = from_dict(data)
+            self.assertEqual(to_dict(restored), data)
+            self.assertEqual(semantic_analyzer(restored), semantic_analyzer(ast), code)
+
+
+class ProjectTest(unittest.TestCase):
+    sources = {
+        'a.c': "int add(int x, int y) { return x + y; }\nint total = 0;\n",
+        'b.c': "int main() { add(1, 2); total = 1; return 0; }\n",
+    }
+
+    def setUp(self):
+        from lexer import reset_lexer
+        self.addCleanup(reset_lexer, lexer)
+
+    def test_links_calls_and_globals_across_files(self):
+        from project import Project
+        project = Project(workers=2)
+        self.assertEqual(project.build(dict(self.sources)), [])
+        # Without a.c, the call and the global are unresolved.
+        self.assertEqual(Project(workers=1).build({'b.c': self.sources['b.c']}), [
+            "b.c: Semantic Error: Function 'add' not declared.",
+            "b.c: Semantic Error: 'total' not declared before use.",
+        ])
+
+    def test_duplicate_definitions_are_link_errors(self):
+        from project import Project
+        sources = dict(self.sources, **{'c.c': "int add(int a, int b) { return a; }\n"})
+        self.assertEqual(Project(workers=1).build(sources),
+                         ["c.c: Link Error: 'add' is already defined in 'a.c'."])
+
+    def test_rebuild_reparses_only_changed_files(self):
+        from project import Project
+        project = Project(workers=1)
+        sources = dict(self.sources)
+        project.build(sources)
+        self.assertEqual(project.reparsed, ['a.c', 'b.c'])
+        sources['b.c'] = "int main() { add(1, 2); mul(3); return 0; }\n"
+        self.assertEqual(project.build(sources), ["b.c: Semantic Error: Function 'mul' not declared."])
+        self.assertEqual(project.reparsed, ['b.c'])
+        del sources['a.c']
+        project.build(sources)
+        self.assertEqual(project.reparsed, [])
+        self.assertEqual(sorted(project.units), ['b.c'])
+
+
+class OutlineTest(unittest.TestCase):
+    code = ("int count = 0;\n"
+            "int add(int x, double y) {\n    // '}' in a comment\n    char c = '}';\n    { return x; }\n}\n"
+            "void main() {\n    int z = add(1, 2.0);\n}\n")
+
+    def setUp(self):
+        from lexer import reset_lexer
+        self.addCleanup(reset_lexer, lexer)
+
+    def test_outline_does_not_parse_bodies(self):
+        from outline import outline_entries, parse_outline
+        program, errors = parse_outline(self.code)
+        self.assertEqual(errors, [])
+        self.assertEqual(outline_entries(program), [
+            {'kind': 'variable', 'name': 'count', 'type': 'int'},
+            {'kind': 'function', 'name': 'add', 'returnType': 'int', 'params': [['int', 'x'], ['double', 'y']]},
+            {'kind': 'function', 'name': 'main', 'returnType': 'void', 'params': []},
+        ])
+        self.assertFalse(any(declaration.parsed for declaration in program.declarations[1:]))
+
+    def test_bodies_parse_on_demand_like_a_full_parse(self):
+        from lexer import reset_lexer
+        from outline import parse_outline
+        program, _ = parse_outline(self.code)
+        body = program.declarations[2].body
+        self.assertIsInstance(body.statements[0], Declaration)
+        self.assertEqual(body.statements[0].initializer.arguments[0].lineno, 8)
+        self.assertIs(program.declarations[2].body, body)
+        reset_lexer(lexer)
+        full = parser.parse(self.code, lexer=lexer)
+        self.assertEqual(semantic_analyzer(program), semantic_analyzer(full))
+        self.assertEqual(to_dict(program)['declarations'][1]['node'], 'FunctionDefinition')
+
+    def test_errors_in_a_body_are_found_when_it_is_parsed(self):
+        from outline import parse_outline
+        program, errors = parse_outline("int f() {\n  int x = ;\n  return 1;\n}\nint main() { return f(); }")
+        self.assertEqual(errors, [])
+        function = program.declarations[0]
+        function.body
+        self.assertEqual(function.errors[0], "Syntax error at line 2, column 12: Unexpected token ';' of type 'SEMI'")
+        self.assertEqual(parse_outline("int f() { return 1;\nint g;")[1], ["Syntax error at EOF"])
+
+
+class DescentParserTest(unittest.TestCase):
+    class ComparingParser:
+        """
+        Parses every input with both backends, records any difference and returns PLY's result.
+        """
+        def __init__(self, backend='descent'):
+            self.backend = backend
+            self.count = 0
+            self.differences = []
+
+        def parse(self, input=None, lexer=lexer, **kwargs):
+            import copy
+            from lexer import lexical_errors
+            from parser import get_parser, parser as ply_parser, syntax_errors
+            if input is None:
+                input = lexer.lexdata[lexer.lexpos:]
+            lineno, table = lexer.lineno, copy.deepcopy(lexer.intern_table)
+            before = list(lexical_errors), list(syntax_errors)
+            results = []
+            for backend in (get_parser(self.backend), ply_parser):
+                lexer.lineno, lexer.intern_table = lineno, copy.deepcopy(table)
+                lexical_errors[:], syntax_errors[:] = before
+                tree = backend.parse(input, lexer=lexer, **kwargs)
+                results.append((to_dict(tree), list(lexical_errors), list(syntax_errors)))
+            self.count += 1
+            if results[0] != results[1]:
+                self.differences.append(input)
+            return tree
+
+    def test_matches_ply_on_the_parser_tests(self):
+        from unittest import mock
+        comparing = self.ComparingParser()
+        result = unittest.TestResult()
+        with mock.patch(__name__ + '.parser', comparing):
+            unittest.defaultTestLoader.loadTestsFromTestCase(ParserTest).run(result)
+        self.assertTrue(result.wasSuccessful(), result.failures + result.errors)
+        self.assertGreater(comparing.count, 50)
+        self.assertEqual(comparing.differences, [])
+
+    def test_conflict_resolutions(self):
+        from descent import descent_parser
+        lexer.lineno = 1
+        program = descent_parser.parse("void f() { x = a + b; x = y = 1; if (a) if (b) ; else ; }", lexer=lexer)
+        binary, statement, branch = program.declarations[0].body.statements
+        self.assertEqual(binary.left.lvalue, 'x')  # '(x = a) + b'
+        self.assertIsInstance(statement.lvalue, Identifier)
+        self.assertEqual(statement.rvalue.lvalue, 'y')
+        self.assertIsNone(branch.else_block)
+        self.assertIsNotNone(branch.then_block.else_block)
+
+    def test_errors_and_deep_nesting_fall_back_to_ply(self):
+        from descent import descent_parser
+        from parser import syntax_errors
+        code = "int main() { int x = ; }"
+        errors = []
+        for backend in (parser, descent_parser):
+            syntax_errors.clear()
+            lexer.lineno = 1
+            self.assertIsNone(backend.parse(code, lexer=lexer))
+            errors.append(list(syntax_errors))
+        self.assertEqual(errors[0], errors[1])
+        self.assertEqual(errors[1][0], "Syntax error at line 1, column 23: Unexpected token ';' of type 'SEMI'")
+        syntax_errors.clear()
+        nested = "(" * 2000 + "1" + ")" * 2000
+        program = descent_parser.parse(f"int x = {nested};", lexer=lexer)
+        self.assertEqual(program.declarations[0].initializer.value, 1)
+
+
+class TableParserTest(unittest.TestCase):
+    def test_matches_ply_on_the_parser_tests(self):
+        from unittest import mock
+        comparing = DescentParserTest.ComparingParser('tables')
+        result = unittest.TestResult()
+        with mock.patch(__name__ + '.parser', comparing):
+            unittest.defaultTestLoader.loadTestsFromTestCase(ParserTest).run(result)
+        self.assertTrue(result.wasSuccessful(), result.failures + result.errors)
+        self.assertGreater(comparing.count, 50)
+        self.assertEqual(comparing.differences, [])
+
+    def test_ply_tables_are_cached(self):
+        import os
+        import tempfile
+        from parser import build_parser
+        code = "int main() { int x = (1 + 2); return x; }"
+        expected = to_dict(parser.parse(code, lexer=lexer))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'tables', 'parser_tables.pickle')
+            build_parser(path)
+            self.assertEqual(os.listdir(os.path.dirname(path)), ['parser_tables.pickle'])
+            self.assertEqual(to_dict(build_parser(path).parse(code, lexer=lexer)), expected)
+            with open(path, 'wb') as file:
+                file.write(b'corrupt')
+            self.assertEqual(to_dict(build_parser(path).parse(code, lexer=lexer)), expected)
+            self.assertGreater(os.path.getsize(path), len(b'corrupt'))  # Rewritten
+
+    def test_tables_encode_ply_actions(self):
+        from lrtables import build_tables, reduction_kind, ERROR, PASS, NONE, CALL
+        import parser as grammar
+        tables = build_tables()
+        for state, actions in parser.action.items():
+            row = tables.action[state * tables.width:(state + 1) * tables.width]
+            self.assertEqual({name: row[column] for name, column in tables.columns.items() if row[column] != ERROR},
+                             actions)
+        self.assertEqual(reduction_kind(grammar.p_expression), PASS)
+        self.assertEqual(reduction_kind(grammar.p_empty), NONE)
+        self.assertEqual(reduction_kind(grammar.p_binary_expression), CALL)
+
+    def test_errors_fall_back_to_ply(self):
+        from lrtables import get_table_parser
+        from parser import syntax_errors
+        code = "int main() { int x = ; return 1 }"
+        errors = []
+        for backend in (parser, get_table_parser()):
+            syntax_errors.clear()
+            lexer.lineno = 1
+            self.assertIsNone(backend.parse(code, lexer=lexer))
+            errors.append(list(syntax_errors))
+        self.assertEqual(errors[0], errors[1])
+        self.assertTrue(errors[1])
+
+
+class FuzzTest(unittest.TestCase):
+    def test_generated_programs_parse(self):
+        import random
+        import fuzz
+        rng, syntax = random.Random(0), fuzz.Grammar()
+        for _ in range(30):
+            code = fuzz.generate_program(rng, syntax)
+            self.assertIsNotNone(fuzz.observe_reference(code)['ast'], code)
+
+    def test_engines_agree(self):
+        import fuzz
+        self.assertEqual(fuzz.run_campaign(40, seed=3), [])
+
+    def test_analysis_engines_agree(self):
+        import fuzz
+        # The same ill-typed subexpression on two lines: each error must keep its own line.
+        code = "int main() {\n  int i = 0;\n  bool b = true;\n  i = (i + b);\n  i = (i + b);\n  return i;\n}\n"
+        reference = fuzz.observe_reference(code)['errors']
+        self.assertEqual([error[:len("Type error at line 4")] for error in reference],
+                         ["Type error at line 4", "Type error at line 5"])
+        engines = {name: fuzz.ENGINES[name] for name in ('parallel', 'flat', 'hashcons')}
+        self.assertEqual(fuzz.differences(code, engines), [])
+
+    def test_mismatch_is_minimized(self):
+        import fuzz
+
+        def off_by_one(code):  # Reads the integer 7 as 8
+            observation = fuzz.observe_reference(code)
+            observation['tokens'] = [(kind, 8 if (kind, value) == ('INT_NUM', 7) else value, line, position)
+                                     for kind, value, line, position in observation['tokens']]
+            return observation
+
+        code = "int f(int a) { return a; }\nint main() {\n  int x = f(7);\n  return x;\n}\n"
+        found = fuzz.differences(code, {'buggy': off_by_one})
+        self.assertEqual([(name, field) for name, field, _, _ in found], [('buggy', 'tokens')])
+        minimized = fuzz.minimize(code, lambda candidate: bool(fuzz.differences(candidate, {'buggy': off_by_one})))
+        self.assertEqual(minimized, "7")
+
+
+class IRTest(unittest.TestCase):
+    # Assignments are parenthesized: the grammar parses 'x = a + b' as '(x = a) + b'.
+    programs = [
+        "int main() { int x = 2; int y = x * 3; return y + 1; }",
+        "int fact(int n) { if (n <= 1) { return 1; } else { return n * fact(n - 1); } } int main() { return fact(10); }",
+        "int main() { int s = 0; int i = 0; while (i < 10) { s = (s + i); i = (i + 1); } return s; }",
+        "int g = 5; void bump() { g = (g + 1); } int main() { bump(); bump(); return g; }",
+        "int main() { int a = 7; int b = 0; if (a > 3 && b == 0) { b = 1; } else { b = 2; } return b; }",
+        "double main() { int a = 7; return a / 2.0; }",
+        "int main() { int n = -100; int c = 0; while (n < -1) { n = (n / 2); c = (c + 1); } return c; }",
+        "char main() { int big = 2000000000; int wrapped = big + big; char c = 'A'; return c; }",
+    ]
+
+    def build(self, code, level):
+        from ir import lower, to_ssa
+        from optimize import optimize_program
+        lexer.lineno = 1
+        ast = parser.parse(code, lexer=lexer)
+        self.assertEqual(list(semantic_analyzer(ast)), [], code)
+        program = lower(ast)
+        if level >= 1:
+            for function in program.all_functions():
+                to_ssa(function)
+        if level >= 2:
+            optimize_program(program)
+        return program
+
+    def test_optimizations_preserve_results(self):
+        from ir import execute
+        expected = [7, 3628800, 45, 7, 1, 3.5, 6, 65]
+        for code, result in zip(self.programs, expected):
+            sizes = []
+            for level in range(3):
+                program = self.build(code, level)
+                self.assertEqual(execute(program), result, code)
+                sizes.append(program.size())
+            self.assertLessEqual(sizes[2], sizes[0], code)
+
+    def test_ssa_form(self):
+        from ir import LOAD, STORE
+        program = self.build(self.programs[2], 1)
+        function = program.functions['main']
+        self.assertFalse(any(op in (LOAD, STORE) for block in function.blocks for op, _, _, _ in block.instructions()))
+        self.assertEqual(len(function.blocks[1].phis), 2)  # s and i merge at the loop header
+        definitions = [dest for block in function.blocks for dest, _ in block.phis] + \
+                      [dest for block in function.blocks for _, dest, _, _ in block.instructions() if dest >= 0]
+        self.assertEqual(len(definitions), len(set(definitions)))
+
+    def test_constants_fold_to_a_single_return(self):
+        from ir import CONST, RETURN
+        program = self.build(self.programs[0], 2)
+        function = program.functions['main']
+        self.assertEqual(len(function.blocks), 1)
+        self.assertEqual([op for op, _, _, _ in function.blocks[0].instructions()], [CONST, RETURN])
+
+    def test_division_by_zero_is_not_removed(self):
+        from ir import ExecutionError, execute
+        program = self.build("int main() { int z = 0; int q = 5 / z; return 1; }", 2)
+        with self.assertRaises(ExecutionError):
+            execute(program)
+
+    def test_empty_statements(self):
+        from ir import execute
+        code = "int main() { int x = 3; ; if (x > 0) ; else ; while ((x = (x - 1)) > 0) ; return x; }"
+        for level in range(3):
+            self.assertEqual(execute(self.build(code, level)), 0)
+
+
+class HashConsTest(unittest.TestCase):
+    code = ("int b(int x, int y) { return x; }\n"
+            "int main() {\n"
+            "    int i = 0;\n"
+            "    i = (i + 1); i = (i + 1);\n"
+            "    while (i < 10) { i = (i + 1); }\n"
+            "    return b(b(i, 1), b(i, 1));\n"
+            "}\n")
+
+    def parse_both(self, code, backend='ply'):
+        from lexer import reset_lexer
+        from parser import get_parser
+        from hashcons import parse_hash_consed
+        reset_lexer(lexer)
+        plain = get_parser(backend).parse(code, lexer=lexer)
+        reset_lexer(lexer)
+        consed, factory = parse_hash_consed(code, lexer=lexer, backend=backend)
+        return plain, consed, factory
+
+    def test_occurrences_match_plain_tree(self):
+        from hashcons import POSITION_FIELDS
+
+        def walk(value):  # Source-order walk of a plain tree
+            if isinstance(value, list):
+                for item in value:
+                    yield from walk(item)
+            elif isinstance(value, Node):
+                yield type(value).__name__, value.lineno, value.lexpos
+                for name, child in vars(value).items():
+                    if name not in POSITION_FIELDS:
+                        yield from walk(child)
+
+        def strip(data):
+            if isinstance(data, list):
+                return [strip(item) for item in data]
+            if isinstance(data, dict):
+                return {key: strip(value) for key, value in data.items() if key not in POSITION_FIELDS}
+            return data
+
+        for backend in ('ply', 'descent', 'tables'):
+            plain, consed, factory = self.parse_both(self.code, backend)
+            occurrences = [(type(node).__name__, lineno, lexpos) for node, lineno, lexpos in factory.occurrences(consed)]
+            self.assertEqual(occurrences, list(walk(plain)), backend)
+            self.assertEqual(strip(to_dict(consed)), strip(to_dict(plain)), backend)
+
+    def test_identical_subtrees_are_shared(self):
+        _, consed, factory = self.parse_both(self.code)
+        statements = consed.declarations[1].body.statements
+        self.assertIs(statements[1], statements[2])
+        call = statements[4].value
+        self.assertIs(call.arguments[0], call.arguments[1])
+        self.assertGreater(factory.shared, 0)
+        self.assertEqual(statements[1].rvalue.left.lineno, 4)  # A shared node keeps its first position
+        # Binary expressions are only shared on the same line (diagnostics report their line).
+        in_loop = statements[3].body.statements[0]
+        self.assertIsNot(in_loop, statements[1])
+        self.assertIs(in_loop.rvalue.left, statements[1].rvalue.left)
+        self.assertEqual(in_loop.rvalue.lineno, 5)
+        self.assertEqual(factory.structural_hash(in_loop), factory.structural_hash(statements[1]))
+
+    def test_structural_hashes(self):
+        _, first, first_factory = self.parse_both("int main() { int x = 1; return (x + 2); }")
+        _, second, second_factory = self.parse_both("int f() { int x = 7; return (x + 2); }")
+        _, third, third_factory = self.parse_both("int main() { int x = 1; return (x + 3); }")
+        returned = [program.declarations[0].body.statements[1] for program in (first, second, third)]
+        self.assertEqual(first_factory.structural_hash(returned[0]), second_factory.structural_hash(returned[1]))
+        self.assertNotEqual(first_factory.structural_hash(returned[0]), third_factory.structural_hash(returned[2]))
+        self.assertNotEqual(first_factory.structural_hash(first), second_factory.structural_hash(second))
+
+    def test_semantic_analysis_matches_plain_tree(self):
+        repeated_error = ("int main() {\n    int i = 0;\n    bool b = true;\n    int x;\n"
+                          "    x = (i + b);\n    x = (i + b);\n    return x;\n}\n")
+        _, consed, _ = self.parse_both(repeated_error)
+        self.assertEqual([message[:20] for message in semantic_analyzer(consed)],
+                         ["Type error at line 5", "Type error at line 6"])
+        for code in ParserTest.code_snippets + [self.code]:
+            plain, consed, _ = self.parse_both(code)
+            if plain is None:
+                continue
+            self.assertEqual(semantic_analyzer(consed), semantic_analyzer(plain), code)
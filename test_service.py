@@ -0,0 +1,486 @@
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+import app as app_module
+import cgen
+import pipeline
+from coalesce import AsyncSingleFlight, SingleFlight
+from compile_cache import CompileCache
+from limits import CompileLimits
+
+
+class ServiceTest(unittest.TestCase):
+    def setUp(self):
+        self.client = app_module.app.test_client()
+        self.original_limits = app_module.compile_limits
+        self.original_cache = app_module.compile_cache
+        app_module.compile_cache = None
+
+    def tearDown(self):
+        app_module.compile_limits = self.original_limits
+        app_module.compile_cache = self.original_cache
+
+    def run_code(self, code, **extra):
+        response = self.client.post('/run_code', json=dict({'code': code, 'lineCount': code.count('\n') + 1}, **extra))
+        return response.get_json()
+
+    def test_valid_program(self):
+        result = self.run_code("int main() { int x; x = 10; return x; }")
+        self.assertIn('output', result)
+        self.assertEqual(result['output']['parsed'], "Valid program")
+
+    def test_source_size_limit(self):
+        app_module.compile_limits = CompileLimits(max_source_bytes=100)
+        result = self.run_code("int x = 1;\n" * 50)
+        self.assertTrue(result['error'].startswith("Resource limit exceeded: source is"))
+
+    def test_token_limit(self):
+        app_module.compile_limits = CompileLimits(max_tokens=50)
+        result = self.run_code("int x = 1;\n" * 20)
+        self.assertTrue(result['error'].startswith("Resource limit exceeded: more than 50 tokens"))
+
+    def test_depth_limit_prevents_deep_recursion(self):
+        app_module.compile_limits = CompileLimits(max_tokens=None)
+        nested = "(1 + " * 3000 + "1" + ")" * 3000
+        result = self.run_code(f"int main() {{ int x = 1 + {nested}; return x; }}")
+        self.assertIn("nested more than 200 levels deep", result['error'])
+
+    def test_stage_timeout(self):
+        app_module.compile_limits = CompileLimits(stage_timeout=1e-9)
+        result = self.run_code("int x = 1;\n" * 200)
+        self.assertIn("stage took longer than", result['error'])
+
+    def test_columnar_tokens_match_objects(self):
+        import gzip
+        import json
+        from lexer import tokens as token_types
+        code = ''.join(f"int v{index} = {index};\n" for index in range(60))
+        objects = self.run_code(code)['output']['tokens']
+        response = self.client.post('/run_code', json={'code': code, 'lineCount': 60, 'format': 'columnar'},
+                                    headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        tokens = json.loads(gzip.decompress(response.data))['output']['tokens']
+        self.assertEqual(tokens['tokenTypes'], list(token_types))
+        decoded = [{'type': tokens['tokenTypes'][kind], 'value': value}
+                   for kind, value in zip(tokens['types'], tokens['values'])]
+        self.assertEqual(decoded, objects)
+        self.assertTrue(code[tokens['offsets'][-2]:].startswith('59;'))
+
+    def test_columnar_without_gzip(self):
+        response = self.client.post('/run_code', json={'code': "int x = 1;", 'lineCount': 1, 'format': 'columnar'})
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(response.get_json()['output']['tokens']['values'], ['int', 'x', '=', 1, ';'])
+
+    def test_metrics_endpoint(self):
+        self.run_code("int main() { return 0; }")
+        text = self.client.get('/metrics').get_data(as_text=True)
+        self.assertIn("# TYPE compile_coalescing_ratio gauge", text)
+        self.assertRegex(text, r"compile_requests_total [1-9]")
+
+    def test_server_timing_header(self):
+        from loadtest import parse_server_timing
+        response = self.client.post('/run_code', json={'code': "int main() { return 0; }", 'lineCount': 1})
+        timings = parse_server_timing(response.headers['Server-Timing'])
+        self.assertEqual(list(timings), ['lex', 'parse', 'semantic', 'total'])
+        self.assertGreaterEqual(timings['total'], timings['parse'])
+
+
+class CoalesceTest(unittest.TestCase):
+    def test_concurrent_identical_calls_share_one_execution(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def compile_once():
+            calls.append(1)
+            release.wait(5)
+            return {'output': 'shared'}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flight.do('key', compile_once))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        while flight.requests < 8:
+            threading.Event().wait(0.001)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'output': 'shared'}] * 8)
+        self.assertEqual((flight.executions, flight.coalesced), (1, 7))
+        # Once the call has finished, the same key runs again.
+        flight.do('key', lambda: None)
+        self.assertEqual(flight.executions, 2)
+
+    def test_errors_are_shared_and_async_variant(self):
+        flight = AsyncSingleFlight()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        async def run():
+            return await asyncio.gather(*(flight.do('key', failing) for _ in range(3)), return_exceptions=True)
+
+        results = asyncio.run(run())
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertEqual((flight.requests, flight.executions), (3, 1))
+
+
+class CompileCacheTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'cache.sqlite')
+
+    def test_results_are_reused_across_instances(self):
+        code = "int main() { int x; x = 10; return x; }"
+        response, ast = pipeline.compile_code(code, 1, cache=CompileCache(self.path))
+        self.assertEqual(ast['node'], 'Program')
+        # A new instance (as in another worker process) hits without compiling.
+        with mock.patch('pipeline._compile', side_effect=AssertionError("not cached")):
+            self.assertEqual(pipeline.compile_code(code, 1, cache=CompileCache(self.path)), (response, ast))
+
+    def test_version_change_and_limit_errors_miss(self):
+        code = "int main() { return 0; }"
+        pipeline.compile_code(code, 1, cache=CompileCache(self.path))
+        self.assertEqual(CompileCache(self.path, version='changed grammar').count(), 1)
+        with mock.patch('pipeline._compile', wraps=pipeline._compile) as compile_function:
+            pipeline.compile_code(code, 1, cache=CompileCache(self.path, version='changed grammar'))
+            self.assertEqual(compile_function.call_count, 1)
+        # Resource limit breaches are not stored.
+        cache = CompileCache(self.path)
+        pipeline.compile_code(code, 1, CompileLimits(max_tokens=2), cache)
+        self.assertEqual(cache.count(), 2)
+
+    def test_version_covers_the_modules_of_the_pipeline(self):
+        import subprocess
+        import sys
+        from compile_cache import BASE_DIR, VERSIONED_FILES
+        script = ("import os, sys, parser, pipeline\n"
+                  "[parser.get_parser(backend) for backend in parser.PARSER_BACKENDS]\n"
+                  "pipeline.run_code('int main() { return 1; }', 1, execute=True)\n"
+                  "print(' '.join(os.path.basename(module.__file__) for module in list(sys.modules.values())\n"
+                  "               if os.path.dirname(os.path.abspath(getattr(module, '__file__', None) or '/')) == os.getcwd()))\n")
+        environment = dict(os.environ, NATIVE_CACHE_DIR=os.path.dirname(self.path), COMPILE_CACHE_PATH=self.path)
+        loaded = subprocess.run([sys.executable, '-c', script], cwd=BASE_DIR, env=environment, capture_output=True,
+                                text=True, check=True).stdout.split()
+        self.assertIn('pipeline.py', loaded)
+        self.assertEqual(sorted(set(loaded) - set(VERSIONED_FILES)), [])
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = CompileCache(self.path, max_bytes=2000)
+        for index in range(50):
+            cache.put(f'key{index}', {'output': os.urandom(40).hex()})
+            cache.get('key0')  # Keep the first entry in use
+        self.assertLessEqual(cache.total_bytes(), 2000)
+        self.assertLess(cache.count(), 50)
+        self.assertIsNotNone(cache.get('key0'))
+        self.assertIsNone(cache.get('key1'))
+
+
+class NativeRunTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        patcher = mock.patch.dict(os.environ, {'NATIVE_CACHE_DIR': directory.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_run_code_reports_return_value(self):
+        code = "int f(int n) { if (n < 2) { return 1; } return (n * f((n - 1))); } int main() { return f(5); }"
+        run = pipeline.run_code(code, 1, execute=True)['output']['run']
+        self.assertEqual(run['returnValue'], 120)
+        self.assertNotIn('run', pipeline.run_code(code, 1)['output'])
+
+    def test_run_code_with_empty_statements(self):
+        for code in ("int main() { ; return 0; }", "int main() { int x = 1; if (x > 0) ; return x; }",
+                     "int main() { int x = 3; while ((x = (x - 1)) > 0) ; return x; }"):
+            run = pipeline.run_code(code, 1, execute=True)['output']['run']
+            self.assertNotIn('error', run, code)
+
+    @unittest.skipUnless(cgen.find_compiler(), "no C compiler")
+    def test_native_matches_evaluator(self):
+        from ir import ExecutionError, build_ir, execute
+        from lexer import lexer, reset_lexer
+        from parser import parser
+        programs = [
+            "int main() { int x = 2147483647; return (x + 1); }",
+            "char main() { int x = 300; char c = x; return c; }",
+            "double main() { double x = 1.5; float y = 2; return ((x * y) / 4); }",
+            "int main() { int i = 0; int s = 0; while (i < 10) { s = (s + (i / 3)); i = (i + 1); } return s; }",
+            "int main() { int z = 0; return (7 / z); }",
+            "int main() { double d = (1.0 / 0.0); int x = d; return x; }",
+        ]
+        for code in programs:
+            reset_lexer(lexer)
+            ast = parser.parse(code, lexer=lexer)
+            result = cgen.run_program(ast)
+            self.assertEqual(result['engine'], 'native')
+            try:
+                self.assertEqual(result.get('returnValue'), execute(build_ir(ast)), code)
+            except ExecutionError as e:
+                self.assertEqual(result.get('error'), str(e), code)
+        # Every distinct program was compiled once into the binary cache.
+        self.assertEqual(len(os.listdir(self.directory)), len(programs))
+
+    @unittest.skipUnless(cgen.find_compiler(), "no C compiler")
+    def test_time_limit(self):
+        from lexer import lexer, reset_lexer
+        from parser import parser
+        reset_lexer(lexer)
+        ast = parser.parse("int main() { int i = 0; while (true) { i = (i + 1); } return i; }", lexer=lexer)
+        result = cgen.run_program(ast, cgen.RunLimits(cpu_seconds=1, wall_seconds=3))
+        self.assertEqual(result['error'], "Time limit exceeded")
+        self.assertTrue(result['limitExceeded'])
+
+
+class AsyncServerTest(unittest.TestCase):
+    def start_server(self, **kwargs):
+        from async_server import AsyncCompileServer
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        environment = mock.patch.dict(os.environ, {'COMPILE_CACHE_PATH': os.path.join(directory.name, 'cache.sqlite')})
+        environment.start()
+        self.addCleanup(environment.stop)
+        server = AsyncCompileServer(port=0, workers=1, **kwargs)
+        loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(server.start())
+            started.set()
+            loop.run_forever()
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        started.wait(30)
+
+        def stop():
+            asyncio.run_coroutine_threadsafe(server.drain(), loop).result(30)
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(5)
+        self.addCleanup(stop)
+        return server
+
+    def post(self, server, code):
+        import http.client
+        import json
+        connection = http.client.HTTPConnection('127.0.0.1', server.port, timeout=30)
+        connection.request('POST', '/run_code', json.dumps({'code': code, 'lineCount': 1}),
+                           {'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        result = response.status, json.loads(response.read())
+        connection.close()
+        return result
+
+    def test_compiles_in_worker_pool(self):
+        server = self.start_server()
+        status, result = self.post(server, "int main() { int x; x = 10; return x; }")
+        self.assertEqual(status, 200)
+        self.assertEqual(result['output']['parsed'], "Valid program")
+        status, result = self.post(server, "int main() { return y; }")
+        self.assertIn("'y' not declared before use", result['error'])
+
+    def test_backpressure_returns_503(self):
+        server = self.start_server(max_pending=0)
+        status, result = self.post(server, "int main() { return 0; }")
+        self.assertEqual(status, 503)
+
+    def test_invalid_content_length_returns_400(self):
+        import socket
+        server = self.start_server()
+        for length in ('abc', '-5'):
+            with socket.create_connection(('127.0.0.1', server.port), timeout=30) as connection:
+                connection.sendall(f"POST /run_code HTTP/1.1\r\nContent-Length: {length}\r\n\r\n".encode('latin-1'))
+                self.assertTrue(connection.recv(4096).startswith(b"HTTP/1.1 400 "), length)
+
+    def test_dead_worker_returns_503(self):
+        import signal
+        from async_server import _ping
+        server = self.start_server()
+        os.kill(server.executor.submit(_ping).result(30), signal.SIGKILL)
+        status, result = self.post(server, "int main() { return 0; }")
+        self.assertEqual(status, 503)
+        status, result = self.post(server, "int main() { return 0; }")  # Served by a new pool
+        self.assertEqual(status, 200)
+
+    def test_fork_server_workers(self):
+        server = self.start_server(fork_server=True, max_requests=2)
+        for _ in range(3):
+            status, result = self.post(server, "int main() { int x; x = 10; return x; }")
+            self.assertEqual(result['output']['parsed'], "Valid program")
+        self.assertGreaterEqual(server.executor.workers_recycled, 1)
+
+
+class ForkServerTest(unittest.TestCase):
+    def test_recycles_workers_and_reports_errors(self):
+        from forkserver import ForkServerExecutor, WorkerCrashed
+        executor = ForkServerExecutor(1, max_requests=2, preload=('pipeline',))
+        self.addCleanup(executor.shutdown)
+        pids = [executor.submit(os.getpid).result(30) for _ in range(5)]
+        self.assertNotIn(os.getpid(), pids)
+        self.assertEqual(len(set(pids)), 3)  # Two calls per worker
+        self.assertEqual((executor.workers_started, executor.workers_recycled), (3, 2))
+        with self.assertRaises(ValueError):
+            executor.submit(int, 'x').result(30)
+        with self.assertRaises(WorkerCrashed):
+            executor.submit(os._exit, 1).result(30)
+        self.assertEqual(executor.submit(len, 'abc').result(30), 3)  # A new worker replaces the lost one
+
+
+class CompilerAPITest(unittest.TestCase):
+    def test_import_is_cheap(self):
+        import subprocess
+        import sys
+        heavy = ('flask', 'ply', 'lexer', 'parser', 'semantic', 'cgen', 'syntax_tree', 'limits', 'diagnostics')
+        script = f"import sys, compiler; print(','.join(m for m in {heavy!r} if m in sys.modules))"
+        output = subprocess.run([sys.executable, '-c', script], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), '')  # Nothing heavy is imported
+
+    def test_compile_source(self):
+        from compiler import CompileOptions, compile_source
+        result = compile_source("int main() { int x = 1; return x; }")
+        self.assertTrue(result.ok)
+        self.assertEqual([token.type for token in result.tokens[:3]], ['TYPE', 'ID', 'LPAREN'])
+        self.assertEqual(result.ast.declarations[0].name, 'main')
+        self.assertEqual(result.to_dict()['tokens'][1], {'type': 'ID', 'value': 'main', 'line': 1, 'position': 4})
+        result = compile_source("int main() { int x = ; return y; }", {'parser': 'tables'})
+        self.assertFalse(result.ok)
+        self.assertIsNone(result.ast)
+        self.assertEqual(len(result.tokens), 13)  # Every token, including those after the error
+        self.assertIn("column 23", result.errors[0])
+        result = compile_source("int main() { return y; }", CompileOptions(analyze=False))
+        self.assertTrue(result.ok)
+        self.assertEqual(compile_source("int main() { return y; }").errors,
+                         ["Semantic Error: 'y' not declared before use."])
+        with self.assertRaises(ValueError):
+            compile_source("", {'parser': 'yacc'})
+
+    def test_deep_nesting_is_a_diagnostic(self):
+        from compiler import compile_source
+        from limits import CompileLimits
+        code = "int main() { return " + "(1 + " * 3000 + "1" + ")" * 3000 + "; }"
+        result = compile_source(code, {'limits': CompileLimits(max_ast_depth=None)})
+        self.assertIsNone(result.ast)
+        self.assertEqual(result.errors, ["Resource limit exceeded: program is nested too deeply to compile"])
+
+
+class LoadTestTest(unittest.TestCase):
+    def setUp(self):
+        import loadtest
+        self.original_cache = app_module.compile_cache
+        app_module.compile_cache = None
+        self.server, self.url = loadtest.start_local_server()
+        self.addCleanup(self.server.shutdown)
+
+    def tearDown(self):
+        app_module.compile_cache = self.original_cache
+
+    def test_closed_loop_report(self):
+        import loadtest
+        mix = loadtest.parse_mix('template=2,small,invalid')
+        report = loadtest.run_load_test(self.url, 'closed', [1, 2], duration=0.3, mix=mix, slo_p99=10000)
+        self.assertEqual([step['level'] for step in report['steps']], [1, 2])
+        for step in report['steps']:
+            self.assertGreater(step['succeeded'], 0)
+            self.assertEqual(step['error_rate'], 0.0)
+            self.assertEqual(step['invalid'], step['kinds'].get('invalid', {}).get('count', 0))
+            self.assertLessEqual(step['latency']['p50'], step['latency']['p99'])
+            self.assertIn('parse', step['stages'])
+            self.assertTrue(step['meets_slo'])
+        self.assertEqual(report['summary']['slo_capacity'], report['summary']['peak_throughput'])
+        report['comparison'] = loadtest.compare_reports(report, report)
+        self.assertEqual([row['throughput']['change'] for row in report['comparison']], [0.0, 0.0])
+        self.assertIn("<table>", loadtest.format_html(report))
+        self.assertIn("Peak throughput", loadtest.format_text(report))
+
+    def test_open_loop_and_errors(self):
+        import loadtest
+        report = loadtest.run_load_test(self.url, 'open', [20], duration=0.3, mix={'template': 1}, slo_p99=0.001)
+        step = report['steps'][0]
+        self.assertGreater(step['requests'], 0)
+        self.assertFalse(step['meets_slo'])
+        self.assertIsNone(report['summary']['slo_capacity'])
+        outcome = loadtest.send_request('http://127.0.0.1:9', 'template', b'{}')  # Nothing listens on port 9
+        self.assertEqual(outcome['status'], 0)
+        self.assertIsNotNone(outcome['error'])
+        with self.assertRaises(ValueError):
+            loadtest.parse_mix('huge=1')
+
+
+class CaptureReplayTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.original_capture = app_module.traffic_capture
+        self.original_cache = app_module.compile_cache
+        app_module.compile_cache = None
+
+    def tearDown(self):
+        import shutil
+        app_module.traffic_capture = self.original_capture
+        app_module.compile_cache = self.original_cache
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_anonymize_keeps_structure(self):
+        from capture import anonymize_source
+        code = "int total = 1; // secret\nint add(int x) { /* note\n */ return x + total; }\nint main() { return add(2) @; }"
+        anonymized = anonymize_source(code)
+        self.assertEqual(anonymized, "int v1 = 1; //\nint v2(int v3) { /*\n*/ return v3 + v1; }\n"
+                                     "int main() { return v2(2) @; }")
+        original, renamed = pipeline.run_code(code, 3), pipeline.run_code(anonymized, 3)
+        self.assertEqual([token['type'] for token in renamed['output']['tokens']],
+                         [token['type'] for token in original['output']['tokens']])
+
+    def test_rotating_corpus(self):
+        import gzip
+        from capture import TrafficCapture, read_corpus, segment_names
+        capture = TrafficCapture(self.directory, max_file_bytes=1, max_files=2)
+        for index in range(5):
+            capture.record(f"int x{index};", 1)
+            capture.flush()
+        names = segment_names(self.directory)
+        self.assertEqual(len(names), 2)
+        self.assertEqual([record['code'] for record in read_corpus(self.directory)], ["int x3;", "int x4;"])
+        # A segment cut short (e.g. by a crash) keeps its complete records
+        path = os.path.join(self.directory, names[-1])
+        with open(path, 'ab') as file:
+            file.write(gzip.compress(b'{"time": 1e12, "code": "int y;", "lineCount": 1, "format": "objects", "run": false}\n')[:30])
+        self.assertEqual(len(read_corpus(self.directory)), 2)
+
+    def test_capture_and_replay(self):
+        import loadtest
+        import replay
+        from capture import TrafficCapture, read_corpus
+        app_module.traffic_capture = TrafficCapture(self.directory)
+        client = app_module.app.test_client()
+        for code in ("int main() { return 0; }", "int main() { return x; }", "int x = ;"):
+            client.post('/run_code', json={'code': code, 'lineCount': 1})
+        client.post('/run_code', json={'code': "int y;", 'lineCount': 1, 'format': 'columnar'})
+        app_module.traffic_capture.flush()
+        records = read_corpus(self.directory)
+        self.assertEqual([record['format'] for record in records], ['objects'] * 3 + ['columnar'])
+
+        baseline = replay.build_report(replay.replay_library(records), 'library', 0, 'baseline')
+        server, url = loadtest.start_local_server()
+        self.addCleanup(server.shutdown)
+        report = replay.build_report(replay.replay_http(records, url, speed=100), url, 100)
+        self.assertEqual(report['errors'], 0)
+        comparison = replay.compare_with_baseline(report, baseline, max_regression=float('inf'))
+        self.assertEqual(comparison['output_mismatches'], [])
+        self.assertTrue(comparison['ok'])
+        report['digests'][2] = 'changed'
+        comparison = replay.compare_with_baseline(report, baseline, max_regression=float('inf'))
+        self.assertEqual(comparison['output_mismatches'], [2])
+        self.assertFalse(comparison['ok'])
+        self.assertIn("1 responses differ (records 2)", replay.format_comparison(comparison))
+
+
+if __name__ == '__main__':
+    unittest.main()